@@ -0,0 +1,216 @@
+"""End-to-end batch pipeline throughput with local stand-ins for the browser, Gemini and the embedding model.
+
+Synthetic chapters are served by a local HTTP server and fetched by
+ChapterScraper in http mode. Rewrites and reviews go to the fake model,
+with a fixed latency per call, and embeddings come from the hashing
+stand-in. A run therefore needs no network, browser, API key or model
+download. Each book size runs in a fresh process, so the peak RSS it
+reports is its own.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_e2e --sizes 10 100 1000 --model-latency 0.2
+    python -m benchmarks.bench_e2e --output before.json
+    python -m benchmarks.bench_e2e --baseline before.json   # after a change
+"""
+import argparse
+import json
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from benchmarks.bench_ingest import WORDS
+from config import Config
+from utils.helpers import format_table, percentile
+
+
+def make_chapter(number, paragraphs):
+    """Deterministic chapter HTML, generated per request so a large book costs no memory"""
+    rng = random.Random(number)
+    body = "".join(
+        "<p>" + " ".join(rng.choice(WORDS) for _ in range(rng.randint(40, 120))).capitalize() + ".</p>"
+        for _ in range(paragraphs)
+    )
+    return (f"<html><head><title>Chapter {number}</title></head><body><nav>Contents</nav>"
+            f"<div id='content'><h1>Chapter {number}</h1>{body}</div></body></html>")
+
+
+class ChapterHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        name = os.path.basename(self.path)
+        if not (name.startswith("chapter-") and name.endswith(".html")):
+            self.send_error(404)
+            return
+        body = make_chapter(int(name[len("chapter-"):-len(".html")]), self.server.paragraphs).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_server(paragraphs):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), ChapterHandler)
+    server.daemon_threads = True
+    server.paragraphs = paragraphs
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def peak_rss_mb():
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def run_book(size, args):
+    """Push a size-chapter book through BookPipeline; returns throughput and latency figures"""
+    workdir = tempfile.mkdtemp(prefix="bench_e2e_")
+    # Keep caches, metrics and screenshots out of the working tree, and let the fake model run unthrottled
+    Config.AI_METRICS_PATH = os.path.join(workdir, "ai_metrics.jsonl")
+    Config.AI_PARTIAL_DIR = os.path.join(workdir, "partials")
+    Config.EMBEDDING_CACHE_PATH = os.path.join(workdir, "embeddings.sqlite3")
+    Config.SCREENSHOT_DIR = os.path.join(workdir, "screenshots")
+    Config.FAKE_MODEL_LATENCY = args.model_latency
+    Config.AI_REQUESTS_PER_MINUTE = 10 ** 9
+    Config.AI_TOKENS_PER_MINUTE = 10 ** 12
+    Config.AI_MAX_CONCURRENCY = max(Config.AI_MAX_CONCURRENCY, args.ai_concurrency)
+
+    from modules.ai_processor import AIProcessor
+    from modules.fake_embeddings import HashingEmbeddingFunction
+    from modules.pipeline import STAGES, BookPipeline
+    from modules.scraper import ChapterScraper
+    from modules.version_db import VersionDB
+    from modules.workflow_state import WorkflowState
+
+    server = start_server(args.paragraphs)
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+    try:
+        pipeline = BookPipeline(
+            ChapterScraper(fetch_mode="http", use_cache=False),
+            AIProcessor(use_cache=False, backend="fake"),
+            VersionDB(path=os.path.join(workdir, "db"), embedding_func=HashingEmbeddingFunction()),
+            skip_human=True,
+            scrape_concurrency=args.scrape_concurrency,
+            ai_concurrency=args.ai_concurrency,
+            state=WorkflowState(":memory:")
+        )
+        results = pipeline.run([
+            {"url": f"{base}/book/chapter-{i}.html", "chapter_name": f"Chapter{i}"} for i in range(1, size + 1)
+        ])
+    finally:
+        server.shutdown()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    done = [r for r in results if r["status"] == "done"]
+    stages = {}
+    for stage in STAGES + ["total"]:
+        values = [r["latency"] if stage == "total" else r["timings"][stage]
+                  for r in done if stage == "total" or stage in r["timings"]]
+        if values:
+            stages[stage] = {"p50": percentile(values, 50), "p99": percentile(values, 99)}
+    return {
+        "size": size,
+        "done": len(done),
+        "failed": len(results) - len(done),
+        "elapsed": pipeline.elapsed,
+        "chapters_per_s": len(done) / (pipeline.elapsed or 1e-9),
+        "stages": stages,
+        "peak_rss_mb": peak_rss_mb()
+    }
+
+
+def run_in_subprocess(size, argv):
+    result = subprocess.run(
+        [sys.executable, "-m", "benchmarks.bench_e2e", "--one", str(size)] + argv,
+        stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, check=False
+    )
+    if result.returncode != 0:
+        sys.stderr.write(result.stderr[-4000:])
+        raise SystemExit(f"{size}-chapter run failed")
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def change(new, old):
+    return f"{(new - old) / old:+.1%}" if old else "-"
+
+
+def report(runs, baseline=None):
+    baseline = {run["size"]: run for run in baseline or []}
+    headers = ["chapters", "done", "failed", "elapsed_s", "chapters/s", "peak_rss_mb"]
+    if baseline:
+        headers += ["chapters/s vs baseline", "p99 vs baseline"]
+    rows = []
+    for run in runs:
+        rss = run["peak_rss_mb"]
+        row = [run["size"], run["done"], run["failed"], f"{run['elapsed']:.2f}",
+               f"{run['chapters_per_s']:.2f}", f"{rss:.0f}" if rss is not None else "-"]
+        if baseline:
+            old = baseline.get(run["size"])
+            if old and "total" in run["stages"] and "total" in old["stages"]:
+                row += [change(run["chapters_per_s"], old["chapters_per_s"]),
+                        change(run["stages"]["total"]["p99"], old["stages"]["total"]["p99"])]
+            else:
+                row += ["-", "-"]
+        rows.append(row)
+    print(format_table(headers, rows))
+    print()
+    print(format_table(
+        ["chapters", "stage", "p50_ms", "p99_ms"],
+        [[run["size"], stage, f"{s['p50'] * 1000:.1f}", f"{s['p99'] * 1000:.1f}"]
+         for run in runs for stage, s in run["stages"].items()]
+    ))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="End-to-end pipeline benchmark with local fakes")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 1000], help="Book sizes in chapters")
+    parser.add_argument("--paragraphs", type=int, default=30, help="Paragraphs per synthetic chapter")
+    parser.add_argument("--model-latency", type=float, default=0.2, help="Seconds per fake model call")
+    parser.add_argument("--scrape-concurrency", type=int, default=Config.BATCH_SCRAPE_CONCURRENCY)
+    parser.add_argument("--ai-concurrency", type=int, default=Config.BATCH_AI_CONCURRENCY)
+    parser.add_argument("--output", help="Write the results as JSON, to compare against later")
+    parser.add_argument("--baseline", help="JSON from an earlier --output run to compare against")
+    parser.add_argument("--one", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.one:
+        print(json.dumps(run_book(args.one, args)))
+        return
+
+    passthrough = [
+        "--paragraphs", str(args.paragraphs), "--model-latency", str(args.model_latency),
+        "--scrape-concurrency", str(args.scrape_concurrency), "--ai-concurrency", str(args.ai_concurrency)
+    ]
+    runs = []
+    for size in args.sizes:
+        print(f"Running a {size}-chapter book...", flush=True)
+        runs.append(run_in_subprocess(size, passthrough))
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)["runs"]
+    print(f"\nFake model latency {args.model_latency}s per call, {args.paragraphs} paragraphs per chapter, "
+          f"concurrency scrape {args.scrape_concurrency} / AI {args.ai_concurrency}\n")
+    report(runs, baseline)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"args": vars(args), "runs": runs}, f, indent=2)
+        print(f"\nResults written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
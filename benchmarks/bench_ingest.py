@@ -0,0 +1,67 @@
+"""Compare one-at-a-time store_version calls with batched store_versions.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_ingest --count 10000 --batch-size 256
+"""
+import argparse
+import random
+import shutil
+import tempfile
+import time
+from modules.version_db import VersionDB
+
+WORDS = (
+    "the sea was calm and the island lay under a sky of hard blue while dick "
+    "watched the reef and katafa listened to the gulls over the lagoon"
+).split()
+
+
+def make_versions(count, seed=0):
+    rng = random.Random(seed)
+    return [{
+        "chapter_name": f"Chapter{i % 50}",
+        "content": " ".join(rng.choice(WORDS) for _ in range(rng.randint(150, 400))) + f" #{i}",
+        "status": rng.choice(["scraped", "ai_rewritten", "reviewed"]),
+        "author": "benchmark"
+    } for i in range(count)]
+
+
+def run(label, store, versions):
+    started = time.perf_counter()
+    store(versions)
+    elapsed = time.perf_counter() - started
+    print(f"{label:<10} {len(versions):>7} versions  {elapsed:8.2f}s  {len(versions) / elapsed:9.1f} versions/s")
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="VersionDB ingestion benchmark")
+    parser.add_argument("--count", type=int, default=10000)
+    parser.add_argument("--batch-size", type=int, default=256)
+    args = parser.parse_args()
+
+    versions = make_versions(args.count)
+    workdir = tempfile.mkdtemp(prefix="bench_ingest_")
+    try:
+        # Separate embedding caches, so the batched run cannot reuse the single run's vectors
+        single_db = VersionDB(path=f"{workdir}/single", embedding_cache_path=f"{workdir}/single_embeddings.sqlite3")
+        batched_db = VersionDB(path=f"{workdir}/batched", embedding_cache_path=f"{workdir}/batched_embeddings.sqlite3")
+
+        def store_single(batch):
+            for chapter_data in batch:
+                single_db.store_version(chapter_data)
+
+        def store_batched(batch):
+            for start in range(0, len(batch), args.batch_size):
+                batched_db.store_versions(batch[start:start + args.batch_size])
+
+        single = run("single", store_single, versions)
+        batched = run("batched", store_batched, versions)
+        print(f"speedup    {single / batched:.1f}x")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""Repeated-query search workload with and without the search caches.
+
+Queries are drawn from a small pool with a Zipf-like skew (a few popular
+queries, a long tail), and a new version is stored every --write-every
+queries so the result cache is invalidated the way it would be in a live run.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_search --versions 2000 --queries 2000 --distinct 100
+"""
+import argparse
+import random
+import shutil
+import tempfile
+import time
+from benchmarks.bench_ingest import WORDS, make_versions
+from config import Config
+from modules.search import RLSearchEnhancer
+from modules.version_db import VersionDB
+from utils.helpers import format_table, percentile
+
+
+def make_workload(count, distinct, seed=0):
+    rng = random.Random(seed)
+    pool = [" ".join(rng.sample(WORDS, rng.randint(1, 4))) for _ in range(distinct)]
+    weights = [1 / (rank + 1) for rank in range(distinct)]
+    # Each query keeps one chapter filter so repeats are true repeats
+    filters = {query: rng.choice([None, f"Chapter{rng.randrange(50)}"]) for query in pool}
+    return [(query, filters[query]) for query in rng.choices(pool, weights=weights, k=count)]
+
+
+def run(label, db, workload, write_every, mode):
+    search = RLSearchEnhancer(db)
+    latencies = []
+    started = time.perf_counter()
+    for i, (query, chapter) in enumerate(workload, 1):
+        began = time.perf_counter()
+        search.search(query, chapter, mode=mode)
+        latencies.append(time.perf_counter() - began)
+        if write_every and i % write_every == 0:
+            db.store_version({"chapter_name": "Chapter0", "content": f"new draft {i} " + query, "author": "benchmark"})
+    elapsed = time.perf_counter() - started
+
+    stats = search.cache_stats()
+    return [
+        label,
+        f"{len(workload) / elapsed:.1f}",
+        f"{percentile(latencies, 50) * 1000:.2f}",
+        f"{percentile(latencies, 99) * 1000:.2f}",
+        f"{stats['results']['hit_rate']:.0%}",
+        f"{stats['query_embeddings']['hit_rate']:.0%}",
+        stats["results"]["invalidations"]
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Search cache benchmark")
+    parser.add_argument("--versions", type=int, default=2000)
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("--distinct", type=int, default=100, help="Distinct queries in the pool")
+    parser.add_argument("--write-every", type=int, default=200, help="Store a version every N queries (0 = never)")
+    parser.add_argument("--mode", choices=["hybrid", "vector", "lexical"], default=Config.SEARCH_MODE)
+    args = parser.parse_args()
+
+    versions = make_versions(args.versions)
+    workload = make_workload(args.queries, args.distinct)
+    workdir = tempfile.mkdtemp(prefix="bench_search_")
+    rows = []
+    try:
+        for label, query_cache, result_cache in [("no cache", 0, 0), ("cached", Config.SEARCH_QUERY_CACHE_SIZE, Config.SEARCH_RESULT_CACHE_SIZE)]:
+            Config.SEARCH_QUERY_CACHE_SIZE = query_cache
+            Config.SEARCH_RESULT_CACHE_SIZE = result_cache
+            name = label.replace(" ", "_")
+            db = VersionDB(path=f"{workdir}/{name}", embedding_cache_path=f"{workdir}/{name}_embeddings.sqlite3")
+            db.store_versions(versions)
+            rows.append(run(label, db, workload, args.write_every, args.mode))
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    print(format_table(
+        ["run", "queries/s", "p50 ms", "p99 ms", "result hits", "embedding hits", "invalidations"], rows
+    ))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""Measure CLI startup: `main.py --help`, and import + component construction.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_startup --runs 10
+"""
+import argparse
+import statistics
+import subprocess
+import sys
+import time
+
+BUILD_SNIPPET = (
+    "import main;"
+    "args = main.parse_args(['https://example.org', '--chapter-name', 'Bench']);"
+    "main.build_components(args)"
+)
+
+
+def time_command(command, runs):
+    timings = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        subprocess.run(command, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=False)
+        timings.append(time.perf_counter() - started)
+    return timings
+
+
+def slowest_imports(command, top):
+    """Top cumulative import times reported by -X importtime"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime"] + command,
+        stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True, check=False
+    )
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative_us, name = line[len("import time:"):].split("|")
+        rows.append((int(cumulative_us), name.strip()))
+    return sorted(rows, reverse=True)[:top]
+
+
+def report(label, timings):
+    print(f"{label:<28} median {statistics.median(timings) * 1000:7.1f} ms   "
+          f"min {min(timings) * 1000:7.1f} ms   max {max(timings) * 1000:7.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="CLI startup benchmark")
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--top", type=int, default=10, help="Slowest imports to list")
+    args = parser.parse_args()
+
+    report("main.py --help", time_command([sys.executable, "main.py", "--help"], args.runs))
+    report("main.py (bad argument)", time_command([sys.executable, "main.py", "--bogus"], args.runs))
+    report("import + build components", time_command([sys.executable, "-c", BUILD_SNIPPET], args.runs))
+
+    print("\nSlowest imports for import + build components (cumulative):")
+    for cumulative_us, name in slowest_imports(["-c", BUILD_SNIPPET], args.top):
+        print(f"  {cumulative_us / 1000:8.1f} ms  {name}")
+
+
+if __name__ == "__main__":
+    main()
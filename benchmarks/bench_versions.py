@@ -0,0 +1,116 @@
+"""Bytes on disk and read latency of version text storage.
+
+Builds a book where every chapter goes through dozens of revisions, each
+editing a few paragraphs of the one before (plus an occasional full AI
+rewrite), and stores it three ways: plain text, every version compressed
+whole, and delta chains with periodic keyframes.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_versions --chapters 20 --revisions 40
+"""
+import argparse
+import os
+import random
+import sqlite3
+import shutil
+import tempfile
+import time
+from datetime import datetime
+from benchmarks.bench_ingest import WORDS
+from config import Config
+from modules.lineage import LineageStore
+from utils.helpers import format_table, percentile
+
+
+def make_paragraph(rng):
+    return " ".join(rng.choice(WORDS) for _ in range(rng.randint(40, 120))).capitalize() + "."
+
+
+def make_book(chapters, revisions, seed=0):
+    """(version_id, content, metadata) tuples in the order they would be stored"""
+    rng = random.Random(seed)
+    versions = []
+    for c in range(chapters):
+        paragraphs = [make_paragraph(rng) for _ in range(rng.randint(40, 80))]
+        for r in range(revisions):
+            if r == 1:
+                # The AI rewrite replaces everything
+                paragraphs = [make_paragraph(rng) for _ in paragraphs]
+            elif r > 1:
+                for i in rng.sample(range(len(paragraphs)), rng.randint(1, 4)):
+                    paragraphs[i] = make_paragraph(rng)
+            versions.append((f"Chapter{c}_{r}", "\n\n".join(paragraphs), {
+                "chapter": f"Chapter{c}",
+                "timestamp_epoch": datetime(2026, 1, 1).timestamp() + c * revisions + r,
+                "status": "scraped" if r == 0 else "ai_rewritten" if r == 1 else "reviewed",
+                "author": "benchmark"
+            }))
+    return versions
+
+
+def file_size(path):
+    conn = sqlite3.connect(path)
+    conn.execute("VACUUM")
+    conn.close()
+    return os.path.getsize(path)
+
+
+def time_reads(read, version_ids, reads, seed=1):
+    rng = random.Random(seed)
+    latencies = []
+    for version_id in rng.choices(version_ids, k=reads):
+        started = time.perf_counter()
+        read(version_id)
+        latencies.append(time.perf_counter() - started)
+    return latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Version storage benchmark")
+    parser.add_argument("--chapters", type=int, default=20)
+    parser.add_argument("--revisions", type=int, default=40)
+    parser.add_argument("--reads", type=int, default=2000)
+    args = parser.parse_args()
+
+    versions = make_book(args.chapters, args.revisions)
+    version_ids = [v[0] for v in versions]
+    raw_bytes = sum(len(v[1].encode()) for v in versions)
+    workdir = tempfile.mkdtemp(prefix="bench_versions_")
+    rows = []
+    try:
+        plain_path = os.path.join(workdir, "plain.sqlite3")
+        plain = sqlite3.connect(plain_path)
+        plain.execute("CREATE TABLE contents (version_id TEXT PRIMARY KEY, content TEXT)")
+        plain.executemany("INSERT INTO contents VALUES (?, ?)", [(v[0], v[1]) for v in versions])
+        plain.commit()
+        latencies = time_reads(
+            lambda v: plain.execute("SELECT content FROM contents WHERE version_id = ?", (v,)).fetchone(),
+            version_ids, args.reads
+        )
+        plain.close()
+        rows.append(["plain text", file_size(plain_path), "-", percentile(latencies, 50), percentile(latencies, 99)])
+
+        for label, interval in [("compressed", 1), ("delta", Config.LINEAGE_KEYFRAME_INTERVAL)]:
+            path = os.path.join(workdir, f"{label}.sqlite3")
+            store = LineageStore(path, keyframe_interval=interval, cache_size=0)
+            started = time.perf_counter()
+            store.record_many(versions)
+            write_time = time.perf_counter() - started
+            latencies = time_reads(store.content, version_ids, args.reads)
+            store.close()
+            rows.append([label, file_size(path), f"{write_time:.2f}s", percentile(latencies, 50), percentile(latencies, 99)])
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    print(f"{len(versions)} versions ({args.chapters} chapters x {args.revisions} revisions), "
+          f"{raw_bytes / 1e6:.1f} MB of text")
+    print(format_table(
+        ["storage", "bytes on disk", "vs plain", "write", "read p50 ms", "read p99 ms"],
+        [[label, size, f"{size / rows[0][1]:.1%}", write, f"{p50 * 1000:.3f}", f"{p99 * 1000:.3f}"]
+         for label, size, write, p50, p99 in rows]
+    ))
+
+
+if __name__ == "__main__":
+    main()
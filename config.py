@@ -7,16 +7,104 @@ class Config:
     # Playwright settings
     HEADLESS = True
     SCREENSHOT_DIR = "screenshots"
+    SCREENSHOT_POLICY = "viewport"  # "off", "viewport" or "full"
+    SCREENSHOT_FORMAT = "jpeg"  # "png", "jpeg" or "webp" (webp needs Pillow)
+    SCREENSHOT_QUALITY = 70
+    SCRAPER_POOL_SIZE = 4  # Browser contexts kept open
+    SCRAPER_PER_HOST_LIMIT = 2  # Parallel pages per site
+    SCRAPER_RECYCLE_AFTER = 50  # Pages served before a context is replaced
+    SCRAPER_FETCH_MODE = "browser"  # "http" tries a plain fetch first, browser as fallback
+    SCRAPER_USER_AGENT = "Mozilla/5.0 (compatible; BookPublicationBot/1.0)"
+    SCRAPER_BLOCK_RESOURCES = True
+    SCRAPER_BLOCKED_RESOURCES = ["image", "media", "font"]
+    SCRAPER_BLOCKED_HOSTS = [
+        "google-analytics.com",
+        "googletagmanager.com",
+        "doubleclick.net",
+        "facebook.net",
+        "hotjar.com",
+        "intake-analytics.wikimedia.org"
+    ]
+    
+    # Scrape cache
+    SCRAPE_CACHE_ENABLED = True
+    SCRAPE_CACHE_PATH = "cache/scrape_cache.sqlite3"
+    SCRAPE_CACHE_TTL = 7 * 24 * 3600  # Seconds before an entry must be re-scraped
+    SCRAPE_CACHE_MAX_ENTRIES = 5000
+    SCRAPE_CACHE_MAX_BYTES = 500 * 1024 * 1024
     
     # Gemini API
     GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
     WRITER_TEMPERATURE = 0.7
     REVIEWER_TEMPERATURE = 0.3
+    AI_BACKEND = os.getenv("AI_BACKEND", "gemini")  # "fake" uses a local offline stand-in
+    AI_REQUESTS_PER_MINUTE = 15
+    AI_TOKENS_PER_MINUTE = 1000000
+    AI_MAX_CONCURRENCY = 8  # Model calls in flight at once
+    AI_MAX_RETRIES = 5
+    AI_BACKOFF_BASE = 1.0  # Seconds, doubled per retry with full jitter
+    AI_BACKOFF_MAX = 60.0
+    FAKE_MODEL_LATENCY = 0.5
+    FAKE_MODEL_FAILURE_RATE = 0.0
+    AI_CHUNK_THRESHOLD_TOKENS = 6000  # Longer chapters are rewritten in sections
+    AI_CHUNK_TOKENS = 3000  # Budget per section
+    AI_CHUNK_CONTEXT_TOKENS = 200  # Neighbouring text shown for continuity
+    AI_PARTIAL_DIR = "cache/partials"  # Streamed text and finished sections of rewrites that were cut off
+    AI_METRICS_PATH = "logs/ai_metrics.jsonl"  # One JSON line per model call
+    AI_CACHE_ENABLED = True
+    AI_CACHE_PATH = "cache/llm_responses.sqlite3"
+    AI_CACHE_MAX_ENTRIES = 10000
+    AI_CACHE_MEMORY_ENTRIES = 256
     
     # ChromaDB
     DB_PATH = "chroma_db"
     COLLECTION_NAME = "book_versions"
+    DB_BATCH_SIZE = 1000  # Max versions per Chroma upsert
+    DB_FLUSH_SIZE = 64  # Buffered writer flushes at this many versions...
+    DB_FLUSH_INTERVAL = 5.0  # ...or this many seconds after the first one
+    EMBEDDING_CACHE_PATH = "cache/embeddings.sqlite3"
+    EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "sentence-transformers")  # "hashing" uses a local offline stand-in
+    HASHING_EMBEDDING_DIM = 384
+    PASSAGE_COLLECTION_NAME = "book_passages"
+    PASSAGE_TOKENS = 200  # Stays under MiniLM's 256-token input limit
+    PASSAGE_OVERLAP_TOKENS = 40
+    PASSAGE_CANDIDATES = 4  # Passage hits fetched per requested version
+    LINEAGE_KEYFRAME_INTERVAL = 10  # Versions per delta chain before text is stored whole again
+    LINEAGE_CACHE_SIZE = 64  # Reconstructed version texts kept in memory
     
     # RL Search
     SEARCH_LEARNING_RATE = 0.01
-    SEARCH_MEMORY_SIZE = 1000
\ No newline at end of file
+    SEARCH_MEMORY_SIZE = 1000
+    SEARCH_EVENTS_PATH = "state/search_events.jsonl"  # Durable log of result selections
+    SEARCH_WEIGHTS_PATH = "state/search_weights.json"  # Weights checkpoint, reloaded at startup
+    SEARCH_BATCH_SIZE = 32  # Selections per mini-batch weight update
+    SEARCH_EPOCHS = 20  # Gradient steps per mini-batch
+    SEARCH_L2 = 0.001
+    SEARCH_MODE = os.getenv("SEARCH_MODE", "hybrid")  # hybrid, vector or lexical
+    SEARCH_RRF_K = 60  # Reciprocal rank fusion constant
+    SEARCH_QUERY_CACHE_SIZE = 512  # Query embeddings kept in memory (0 disables)
+    SEARCH_RESULT_CACHE_SIZE = 256  # Search results kept until the next write (0 disables)
+    
+    # Batch processing
+    WORKFLOW_STATE_PATH = "state/workflow.sqlite3"  # Per-chapter checkpoints for --resume
+    BATCH_SCRAPE_CONCURRENCY = 4
+    BATCH_AI_CONCURRENCY = 4
+    BATCH_STORE_CONCURRENCY = 1
+
+    # Worker pools (main.py workers)
+    JOB_QUEUE_PATH = "state/jobs.sqlite3"
+    JOB_LEASE_SECONDS = 900  # A claimed job is handed out again if not finished by then
+    JOB_MAX_ATTEMPTS = 3
+    WORKER_SCRAPE_PROCESSES = 2
+    WORKER_AI_PROCESSES = 4
+    WORKER_INDEX_PROCESSES = 1
+    WORKER_INDEX_BATCH = 32  # Chapters embedded and stored per index batch
+    WORKER_POLL_INTERVAL = 1.0
+
+    # Human review queue (main.py review)
+    REVIEW_QUEUE_PATH = "state/reviews.sqlite3"
+    REVIEW_LEASE_SECONDS = 1800  # A claimed chapter goes back to the queue if not submitted by then
+    REVIEW_SERVER_HOST = "127.0.0.1"
+    REVIEW_SERVER_PORT = 8080
+    REVIEW_PAGE_ROWS = 40  # Side-by-side diff rows per review page
+    REVIEW_DIFF_CONTEXT = 2  # Unchanged lines shown around each change
\ No newline at end of file
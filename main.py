@@ -1,75 +1,138 @@
-from modules.scraper import ChapterScraper
-from modules.ai_processor import AIProcessor
-from modules.version_db import VersionDB
-from modules.search import RLSearchEnhancer
-from modules.interface import HumanReviewInterface
+# Only light imports here so --help and argument errors return immediately;
+# the workflow modules are imported once there is real work to do
 from config import Config
 from utils.logger import logger
 import argparse
+import sys
 
-def main():
-    # Initialize components
-    scraper = ChapterScraper()
-    ai = AIProcessor()
-    db = VersionDB()
-    search = RLSearchEnhancer(db)
-    interface = HumanReviewInterface(ai, db)
-    
-    # Parse arguments
-    parser = argparse.ArgumentParser(description="Book Publication Workflow")
-    parser.add_argument("url", help="URL of the chapter to process")
-    parser.add_argument("--chapter-name", help="Name of the chapter", required=True)
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Book Publication Workflow",
+        epilog="Worker pools: main.py enqueue | workers | queue; human review: main.py review "
+               "(see main.py <command> --help)"
+    )
+    parser.add_argument("url", nargs="?", help="URL of the chapter (or table of contents with --toc) to process")
+    parser.add_argument("--chapter-name", help="Name of the chapter")
     parser.add_argument("--skip-human", help="Skip human review", action="store_true")
-    args = parser.parse_args()
-    
+    parser.add_argument("--review-queue", action="store_true",
+                        help="Queue the chapter for `main.py review` instead of reviewing it here (always on in batch mode)")
+    parser.add_argument("--fetch-mode", choices=["browser", "http"], default=Config.SCRAPER_FETCH_MODE,
+                        help="'http' fetches static pages without a browser and falls back to it when nothing is found")
+    parser.add_argument("--no-scrape-cache", help="Always re-scrape instead of using the scrape cache", action="store_true")
+    parser.add_argument("--regenerate", help="Ignore cached model responses and call Gemini again", action="store_true")
+    parser.add_argument("--manifest", help="JSON list or text file of chapter URLs to process as a batch")
+    parser.add_argument("--toc", help="Treat URL as a table of contents and process every linked chapter", action="store_true")
+    parser.add_argument("--resume", help="Continue from saved checkpoints and skip chapters that are already done", action="store_true")
+    parser.add_argument("--scrape-concurrency", type=int, default=Config.BATCH_SCRAPE_CONCURRENCY)
+    parser.add_argument("--ai-concurrency", type=int, default=Config.BATCH_AI_CONCURRENCY)
+    parser.add_argument("--store-concurrency", type=int, default=Config.BATCH_STORE_CONCURRENCY)
+    args = parser.parse_args(argv)
+
+    if args.manifest and args.url:
+        parser.error("use either a URL or --manifest, not both")
+    if not args.manifest and not args.url:
+        parser.error("a chapter URL or --manifest is required")
+    if args.url and not args.toc and not args.chapter_name:
+        parser.error("--chapter-name is required when processing a single chapter")
+    return args
+
+def run_chapter(args, scraper, ai, db, search, interface, state):
+    checkpoint = state.checkpoint(args.chapter_name, args.url, resume=args.resume)
+    streamed = False
+    screenshot = None
     try:
+        if checkpoint.reached("done"):
+            logger.info(f"{args.chapter_name} was already finished as {checkpoint.data.get('version_id')}")
+            return
+        if checkpoint.stage:
+            logger.info(f"Resuming {args.chapter_name} after '{checkpoint.stage}'")
+        if checkpoint.reached("scraped"):
+            chapter_data = checkpoint.chapter_data(db.lineage.content)
+            if chapter_data is None:
+                logger.warning(f"Stored versions of {args.chapter_name} are missing, starting the chapter over")
+                checkpoint = state.checkpoint(args.chapter_name, args.url, resume=False)
+
         # Scrape content
-        logger.info("Starting scraping process...")
-        scraped_data = scraper.scrape_chapter(args.url, args.chapter_name)
-        
-        # Store original
-        chapter_data = {
-            "chapter_name": args.chapter_name,
-            "content": scraped_data["content"],
-            "screenshot": scraped_data["screenshot"],
-            "source_url": args.url,
-            "original_content": scraped_data["content"],
-            "status": "scraped"
-        }
-        db.store_version(chapter_data)
-        
-        # AI Rewriting
-        logger.info("Starting AI rewriting...")
-        rewritten_content = ai.rewrite_chapter(
-            scraped_data["content"],
-            style_guidelines="Modernize language while preserving original tone"
-        )
-        
-        # Store rewritten
-        chapter_data.update({
-            "content": rewritten_content,
-            "status": "ai_rewritten",
-            "author": "ai_writer"
-        })
-        db.store_version(chapter_data)
-        
+        if not checkpoint.reached("scraped"):
+            logger.info("Starting scraping process...")
+            scraped_data = scraper.scrape_chapter(args.url, args.chapter_name)
+
+            # Store original
+            chapter_data = {
+                "chapter_name": args.chapter_name,
+                "content": scraped_data["content"],
+                "screenshot": scraped_data["screenshot"],
+                "source_url": args.url,
+                "original_content": scraped_data["content"],
+                "status": "scraped"
+            }
+            # Still being taken; its path is filled in before the final version is stored
+            screenshot = scraped_data.get("screenshot_task")
+            version_id = db.store_version(chapter_data)
+            checkpoint.save("scraped", version_id=version_id, chapter_data=chapter_data)
+        original_content = chapter_data["original_content"]
+
+        # AI Rewriting - streamed straight to the reviewer when one reviews it here
+        inline_review = not args.skip_human and not args.review_queue
+        if not checkpoint.reached("ai_rewritten"):
+            logger.info("Starting AI rewriting...")
+            if inline_review:
+                streamed = True
+                rewritten_content = interface.display_stream(chapter_data, ai.rewrite_chapter_stream(
+                    original_content,
+                    style_guidelines="Modernize language while preserving original tone",
+                    regenerate=args.regenerate,
+                    chapter_name=args.chapter_name
+                ))
+            else:
+                rewritten_content = ai.rewrite_chapter(
+                    original_content,
+                    style_guidelines="Modernize language while preserving original tone",
+                    regenerate=args.regenerate,
+                    chapter_name=args.chapter_name
+                )
+
+            # Store rewritten
+            chapter_data.update({
+                "content": rewritten_content,
+                "status": "ai_rewritten",
+                "author": "ai_writer",
+                "ai_metrics": ai.metrics.chapter_summary(args.chapter_name)
+            })
+            version_id = db.store_version(chapter_data)
+            checkpoint.save("ai_rewritten", version_id=version_id, chapter_data=chapter_data)
+
         # AI Review
-        logger.info("Starting AI review...")
-        ai_feedback = ai.review_chapter(rewritten_content, scraped_data["content"])
+        if not checkpoint.reached("ai_reviewed"):
+            logger.info("Starting AI review...")
+            ai_feedback = ai.review_chapter(chapter_data["content"], original_content,
+                                            regenerate=args.regenerate, chapter_name=args.chapter_name)
+            chapter_data["ai_metrics"] = ai.metrics.chapter_summary(args.chapter_name)
+            checkpoint.save("ai_reviewed", chapter_data=chapter_data, ai_feedback=ai_feedback)
         print("\nAI Reviewer Feedback:")
-        print(ai_feedback)
-        
+        print(checkpoint.data["ai_feedback"])
+
+        attach_screenshot(screenshot, chapter_data, db, checkpoint)
+        screenshot = None
+
         # Human Review
-        if not args.skip_human:
+        if not args.skip_human and args.review_queue:
+            from modules.review_queue import ReviewQueue
+            ReviewQueue().enqueue(chapter_data, db.version_id_for(chapter_data), checkpoint.data["ai_feedback"])
+            logger.info(f"{args.chapter_name} queued for human review (main.py review)")
+            return
+        elif not args.skip_human:
             logger.info("Starting human review...")
-            interface.start_review_session(chapter_data)
+            # A resumed run may not have shown the rewrite yet
+            version_id = interface.start_review_session(chapter_data, show_content=not streamed)
         else:
             chapter_data.update({
                 "status": "auto_approved",
                 "human_feedback": "Skipped human review"
             })
-            db.store_version(chapter_data)
-            
+            version_id = db.store_version(chapter_data)
+        checkpoint.save("done", version_id=version_id)
+
         # Search demo
         logger.info("Processing complete!")
         print("\nSample search results:")
@@ -77,11 +140,209 @@ def main():
         for i, res in enumerate(results[:3], 1):
             print(f"\nResult {i}:")
             print(res["metadata"]["author"], res["metadata"]["status"])
-            print(res["content"][:200] + "...")
-            
+            print(res.get("snippet") or res["content"][:200] + "...")
+        search.log_stats()
+
     except Exception as e:
         logger.error(f"Workflow failed: {str(e)}")
+        if screenshot is not None:
+            # Keep the screenshot for the resumed run, which will not scrape again
+            try:
+                attach_screenshot(screenshot, chapter_data, db, checkpoint)
+            except Exception as attach_error:
+                logger.error(f"Screenshot not recorded: {str(attach_error)}")
+        checkpoint.fail(str(e))
+        raise
+
+def attach_screenshot(screenshot, chapter_data, db, checkpoint):
+    """Wait for the background screenshot and fill its path into the versions and checkpoint saved without it"""
+    if screenshot is None:
+        return
+    path = screenshot.result()
+    if not path:
+        return
+    chapter_data["screenshot"] = path
+    for version_id in checkpoint.version_ids():
+        db.update_metadata(version_id, {"screenshot": path})
+    checkpoint.update_chapter_data(screenshot=path)
+
+def run_batch(args, scraper, ai, db, interface, state):
+    from modules.pipeline import BookPipeline, load_manifest
+
+    try:
+        if args.manifest:
+            chapters = load_manifest(args.manifest)
+        else:
+            chapters = state.load_toc(args.url) if args.resume else None
+            if chapters is None:
+                chapters = scraper.scrape_toc(args.url)
+                state.save_toc(args.url, chapters)
+        logger.info(f"Processing {len(chapters)} chapters as a batch...")
+
+        # Reviewers work through the queue while the batch keeps going
+        from modules.review_queue import ReviewQueue
+
+        pipeline = BookPipeline(
+            scraper, ai, db, interface,
+            skip_human=args.skip_human,
+            regenerate=args.regenerate,
+            scrape_concurrency=args.scrape_concurrency,
+            ai_concurrency=args.ai_concurrency,
+            store_concurrency=args.store_concurrency,
+            state=state,
+            resume=args.resume,
+            review_queue=None if args.skip_human else ReviewQueue()
+        )
+        results = pipeline.run(chapters)
+        pipeline.report(results)
+        return results
+
+    except Exception as e:
+        logger.error(f"Batch workflow failed: {str(e)}")
         raise
 
+def build_components(args):
+    """Create the workflow components; browsers and models load lazily on first use"""
+    from modules.scraper import ChapterScraper
+    from modules.ai_processor import AIProcessor
+    from modules.version_db import VersionDB
+    from modules.interface import HumanReviewInterface
+
+    scraper = ChapterScraper(fetch_mode=args.fetch_mode, use_cache=False if args.no_scrape_cache else None)
+    ai = AIProcessor()
+    db = VersionDB()
+    interface = HumanReviewInterface(ai, db)
+    return scraper, ai, db, interface
+
+def enqueue_command(argv):
+    """main.py enqueue: queue chapters for the worker pools"""
+    parser = argparse.ArgumentParser(prog="main.py enqueue", description="Queue chapters for `main.py workers`")
+    parser.add_argument("url", nargs="?", help="Chapter URL, or table of contents with --toc")
+    parser.add_argument("--chapter-name", help="Name of the chapter")
+    parser.add_argument("--manifest", help="JSON list or text file of chapter URLs")
+    parser.add_argument("--toc", help="Treat URL as a table of contents", action="store_true")
+    parser.add_argument("--fetch-mode", choices=["browser", "http"], default=Config.SCRAPER_FETCH_MODE)
+    parser.add_argument("--skip-human", help="Auto-approve instead of waiting for human review", action="store_true")
+    args = parser.parse_args(argv)
+
+    from modules.job_queue import JobQueue
+    if args.manifest:
+        from modules.pipeline import load_manifest
+        chapters = load_manifest(args.manifest)
+    elif args.url and args.toc:
+        from modules.scraper import ChapterScraper
+        chapters = ChapterScraper(fetch_mode=args.fetch_mode).scrape_toc(args.url)
+    elif args.url and args.chapter_name:
+        chapters = [{"url": args.url, "chapter_name": args.chapter_name}]
+    else:
+        parser.error("use --manifest, URL --toc, or URL --chapter-name")
+
+    queue = JobQueue()
+    queue.enqueue_many("scrape", [
+        (c["chapter_name"], {"url": c["url"], "skip_human": args.skip_human}) for c in chapters
+    ])
+    print(f"Queued {len(chapters)} chapters in {queue.path}")
+
+def workers_command(argv):
+    """main.py workers: run scrape, AI and index worker pools over the job queue"""
+    parser = argparse.ArgumentParser(prog="main.py workers", description="Run the worker pools")
+    parser.add_argument("--scrape", type=int, default=Config.WORKER_SCRAPE_PROCESSES, help="Scrape worker processes")
+    parser.add_argument("--ai", type=int, default=Config.WORKER_AI_PROCESSES, help="AI worker processes")
+    parser.add_argument("--index", type=int, default=Config.WORKER_INDEX_PROCESSES,
+                        help="Embedding/storage worker processes (keep at 1 for one Chroma directory)")
+    parser.add_argument("--fetch-mode", choices=["browser", "http"], default=Config.SCRAPER_FETCH_MODE)
+    parser.add_argument("--no-scrape-cache", help="Always re-scrape instead of using the scrape cache", action="store_true")
+    parser.add_argument("--regenerate", help="Ignore cached model responses", action="store_true")
+    parser.add_argument("--exit-when-idle", help="Stop once every queued chapter is processed", action="store_true")
+    parser.add_argument("--status-interval", type=float, default=10.0, help="Seconds between status reports")
+    args = parser.parse_args(argv)
+
+    from modules.job_queue import JobQueue
+    from modules.workers import start_workers, supervise
+    queue = JobQueue()
+    processes = start_workers({"scrape": args.scrape, "ai": args.ai, "index": args.index}, {
+        "queue_path": queue.path,
+        "review_queue_path": Config.REVIEW_QUEUE_PATH,
+        "fetch_mode": args.fetch_mode,
+        "use_scrape_cache": False if args.no_scrape_cache else None,
+        "regenerate": args.regenerate,
+        "exit_when_idle": args.exit_when_idle,
+        "poll_interval": Config.WORKER_POLL_INTERVAL
+    })
+    supervise(processes, queue, args.status_interval)
+
+def queue_command(argv):
+    """main.py queue: show queue depth and per-stage throughput"""
+    parser = argparse.ArgumentParser(prog="main.py queue", description="Show job queue status")
+    parser.add_argument("--window", type=float, default=60.0, help="Throughput window in seconds")
+    args = parser.parse_args(argv)
+
+    from modules.job_queue import JobQueue
+    from modules.workers import format_queue_stats
+    print(format_queue_stats(JobQueue().stats(args.window)))
+
+def review_command(argv):
+    """main.py review: work through the human review queue in the terminal or a browser"""
+    parser = argparse.ArgumentParser(prog="main.py review", description="Review queued chapters")
+    parser.add_argument("--reviewer", help="Your name, recorded with each review (terminal mode)")
+    parser.add_argument("--serve", help="Serve a web UI so several editors can review at once", action="store_true")
+    parser.add_argument("--host", default=Config.REVIEW_SERVER_HOST)
+    parser.add_argument("--port", type=int, default=Config.REVIEW_SERVER_PORT)
+    parser.add_argument("--status", help="Only show the queue counts", action="store_true")
+    args = parser.parse_args(argv)
+
+    from modules.review_queue import ReviewQueue
+    queue = ReviewQueue()
+    if args.status:
+        stats = queue.stats()
+        print(f"{stats['pending']} waiting, {stats['claimed']} in review, {stats['done']} reviewed")
+        for reviewer, count in stats["by_reviewer"].items():
+            print(f"  {reviewer}: {count}")
+        return
+    if not args.serve and not args.reviewer:
+        parser.error("--reviewer is required unless --serve is given")
+
+    # Reviews only store versions, so no scraper or model is loaded
+    from modules.version_db import VersionDB
+    from modules.interface import HumanReviewInterface
+    from modules.workflow_state import WorkflowState
+    interface = HumanReviewInterface(None, VersionDB())
+    state = WorkflowState()
+    if args.serve:
+        from modules.review_server import serve_reviews
+        serve_reviews(queue, interface, state, args.host, args.port)
+    else:
+        interface.review_from_queue(queue, args.reviewer, state)
+
+COMMANDS = {
+    "enqueue": enqueue_command,
+    "workers": workers_command,
+    "queue": queue_command,
+    "review": review_command
+}
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if argv and argv[0] in COMMANDS:
+        return COMMANDS[argv[0]](argv[1:])
+
+    # Parse arguments
+    args = parse_args(argv)
+
+    # Initialize components
+    scraper, ai, db, interface = build_components(args)
+    from modules.workflow_state import WorkflowState
+    state = WorkflowState()
+
+    try:
+        if args.manifest or args.toc:
+            run_batch(args, scraper, ai, db, interface, state)
+        else:
+            from modules.search import RLSearchEnhancer
+            search = RLSearchEnhancer(db)
+            run_chapter(args, scraper, ai, db, search, interface, state)
+    finally:
+        ai.metrics.print_summary()
+
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -1,17 +1,274 @@
-import google.generativeai as genai
+import asyncio
+import concurrent.futures
+import hashlib
+import json
+import os
+import random
+import threading
+import time
 from config import Config
+from modules.chunking import context_window, split_sections, stitch
+from modules.fake_model import FakeGenerativeModel
+from modules.metrics import AIMetrics
+from modules.rate_limiter import RateLimiter
+from modules.response_cache import ResponseCache
+from utils.helpers import estimate_tokens, slugify
 from utils.logger import logger
 
+RETRYABLE_CODES = {429, 500, 502, 503, 504}
+# google.api_core exceptions, matched by name so the SDK is not imported for this
+RETRYABLE_ERRORS = {
+    "ResourceExhausted", "TooManyRequests", "ServiceUnavailable", "InternalServerError",
+    "DeadlineExceeded", "GatewayTimeout"
+}
+
+def is_retryable(error):
+    """True for quota and transient server/network errors"""
+    if isinstance(error, (ConnectionError, TimeoutError, asyncio.TimeoutError)):
+        return True
+    code = getattr(error, "code", None)
+    if callable(code):
+        code = code()
+    return code in RETRYABLE_CODES or type(error).__name__ in RETRYABLE_ERRORS
+
 class AIProcessor:
-    def __init__(self):
-        genai.configure(api_key=Config.GEMINI_API_KEY)
+    def __init__(self, use_cache=None, backend=None, requests_per_minute=None, tokens_per_minute=None):
+        self.backend = backend or Config.AI_BACKEND
         # Use stable model names
-        self.writer_model = genai.GenerativeModel('models/gemini-1.5-flash')
-        self.reviewer_model = genai.GenerativeModel('models/gemini-1.5-flash')
-    
-    def rewrite_chapter(self, original_text, style_guidelines=None):
+        self.writer_model_name = 'models/gemini-1.5-flash'
+        self.reviewer_model_name = 'models/gemini-1.5-flash'
+        # google.generativeai is imported and configured on the first model call
+        self._models = {}
+        self._models_lock = threading.Lock()
+
+        use_cache = Config.AI_CACHE_ENABLED if use_cache is None else use_cache
+        self.cache = ResponseCache() if use_cache else None
+        self.metrics = AIMetrics()
+
+        # One quota and in-flight limit shared by every call through this client
+        self.limiter = RateLimiter(requests_per_minute or Config.AI_REQUESTS_PER_MINUTE,
+                                   tokens_per_minute or Config.AI_TOKENS_PER_MINUTE)
+        self._in_flight = threading.BoundedSemaphore(Config.AI_MAX_CONCURRENCY)
+        # Async callers wait for a slot on these threads, never on the event loop's executor
+        self._slot_waiters = concurrent.futures.ThreadPoolExecutor(
+            Config.AI_MAX_CONCURRENCY, thread_name_prefix="ai-slot"
+        )
+
+    def _model(self, model_name):
+        with self._models_lock:
+            if model_name not in self._models:
+                if self.backend == "fake":
+                    self._models[model_name] = FakeGenerativeModel(model_name)
+                else:
+                    import google.generativeai as genai
+                    genai.configure(api_key=Config.GEMINI_API_KEY)
+                    self._models[model_name] = genai.GenerativeModel(model_name)
+            return self._models[model_name]
+
+    @property
+    def writer_model(self):
+        return self._model(self.writer_model_name)
+
+    @property
+    def reviewer_model(self):
+        return self._model(self.reviewer_model_name)
+
+    def _backoff(self, attempt):
+        """Full-jitter exponential backoff delay for a retry attempt"""
+        return random.uniform(0, min(Config.AI_BACKOFF_MAX, Config.AI_BACKOFF_BASE * 2 ** attempt))
+
+    def _should_retry(self, error, attempt):
+        if attempt >= Config.AI_MAX_RETRIES or not is_retryable(error):
+            return False
+        logger.warning(f"Model call failed ({str(error)}), retry {attempt + 1}/{Config.AI_MAX_RETRIES}")
+        return True
+
+    def _record_call(self, call, model_name, prompt, response, text, started, retries, **extra):
+        """Charge output tokens to the quota and record the call's metrics"""
+        usage = getattr(response, "usage_metadata", None)
+        prompt_tokens = getattr(usage, "prompt_token_count", None) or estimate_tokens(prompt)
+        output_tokens = getattr(usage, "candidates_token_count", None) or estimate_tokens(text)
+        self.limiter.record_usage(output_tokens)
+        self.metrics.record(
+            call.get("kind", ""), call.get("chapter"), model_name, prompt_tokens, output_tokens,
+            time.perf_counter() - started, retries=retries, **extra
+        )
+
+    def _record_cache_hit(self, call, model_name, started):
+        self.metrics.record(
+            call.get("kind", ""), call.get("chapter"), model_name, 0, 0,
+            time.perf_counter() - started, cache_hit=True
+        )
+
+    def _cached(self, model_name, prompt, generation_config, regenerate):
+        """Return (cache key, cached text or None)"""
+        if self.cache is None:
+            return None, None
+        key = ResponseCache.make_key(model_name, prompt, generation_config)
+        if regenerate:
+            return key, None
+        cached = self.cache.get(key)
+        if cached is not None:
+            logger.info("Using cached model response")
+        return key, cached
+
+    def _generate(self, model, model_name, prompt, generation_config, regenerate=False, call=None):
+        """Call the model, serving byte-identical requests from the response cache"""
+        call = call or {}
+        started = time.perf_counter()
+        key, cached = self._cached(model_name, prompt, generation_config, regenerate)
+        if cached is not None:
+            self._record_cache_hit(call, model_name, started)
+            return cached
+
+        attempt = 0
+        while True:
+            self.limiter.acquire(estimate_tokens(prompt))
+            try:
+                with self._in_flight:
+                    response = model.generate_content(prompt, generation_config=generation_config)
+                text = response.text
+                break
+            except Exception as e:
+                if not self._should_retry(e, attempt):
+                    raise
+                time.sleep(self._backoff(attempt))
+                attempt += 1
+
+        self._record_call(call, model_name, prompt, response, text, started, attempt)
+        if key is not None:
+            self.cache.put(key, text, model_name)
+        return text
+
+    def _generate_stream(self, model, model_name, prompt, generation_config,
+                         regenerate=False, partial_path=None, call=None):
+        """Yield response text as it is generated, saving progress to partial_path.
+
+        A stream that is cut off is continued rather than restarted: the
+        retry, or a later run that finds partial_path, yields the saved text
+        and asks the model for the rest.
+        """
+        call = call or {}
+        started = time.perf_counter()
+        key, cached = self._cached(model_name, prompt, generation_config, regenerate)
+        if cached is not None:
+            self._record_cache_hit(call, model_name, started)
+            yield cached
+            return
+
+        received = self._load_partial(partial_path)
+        if received:
+            logger.info(f"Continuing a rewrite that was cut off after {len(received)} characters")
+            yield received
+        elif partial_path:
+            os.makedirs(os.path.dirname(partial_path), exist_ok=True)
+        first_chunk = None
+
+        attempt = 0
+        while True:
+            request = self._continuation_prompt(prompt, received) if received else prompt
+            self.limiter.acquire(estimate_tokens(request))
+            parts = []
+            # Released in finally, so a consumer that stops early (GeneratorExit) frees the slot
+            self._in_flight.acquire()
+            partial = open(partial_path, "a", encoding="utf-8") if partial_path else None
+            try:
+                response = model.generate_content(
+                    request, generation_config=generation_config, stream=True
+                )
+                for chunk in response:
+                    if first_chunk is None:
+                        first_chunk = time.perf_counter() - started
+                    parts.append(chunk.text)
+                    if partial:
+                        partial.write(chunk.text)
+                        partial.flush()
+                    yield chunk.text
+                break
+            except Exception as e:
+                if not self._should_retry(e, attempt):
+                    raise
+            finally:
+                if partial:
+                    partial.close()
+                self._in_flight.release()
+                received += "".join(parts)
+            time.sleep(self._backoff(attempt))
+            attempt += 1
+
+        self._record_call(call, model_name, request, response, received, started, attempt,
+                          first_chunk_latency=round(first_chunk or 0.0, 4))
+        if key is not None:
+            self.cache.put(key, received, model_name)
+        if partial_path and os.path.exists(partial_path):
+            os.remove(partial_path)
+
+    def _partial_path(self, chapter_name, prompt):
+        if not chapter_name:
+            return None
+        # Named after the prompt, so text streamed for a different source is never continued
+        digest = hashlib.sha256(prompt.encode("utf-8")).hexdigest()[:16]
+        return os.path.join(Config.AI_PARTIAL_DIR, f"{slugify(chapter_name)}.{digest}.partial.txt")
+
+    def _load_partial(self, path):
+        """Text received by an earlier stream of the same prompt before it was cut off"""
+        if not path or not os.path.exists(path):
+            return ""
         try:
-            prompt = f"""Rewrite this chapter with a fresh creative spin while maintaining:
+            with open(path, encoding="utf-8") as f:
+                return f.read()
+        except OSError as e:
+            logger.warning(f"Ignoring unreadable stream progress {path}: {str(e)}")
+            return ""
+
+    async def _acquire_async(self):
+        """Take an in-flight slot (shared with sync callers) without blocking the event loop"""
+        if self._in_flight.acquire(blocking=False):
+            return
+        waiting = asyncio.get_running_loop().run_in_executor(self._slot_waiters, self._in_flight.acquire)
+        try:
+            await asyncio.shield(waiting)
+        except asyncio.CancelledError:
+            # The waiter still takes the slot; hand it back once it has
+            waiting.add_done_callback(lambda f: f.cancelled() or self._in_flight.release())
+            raise
+
+    async def _generate_async(self, model, model_name, prompt, generation_config,
+                              regenerate=False, call=None):
+        """Async _generate: waits on the shared quota instead of blocking a thread"""
+        call = call or {}
+        started = time.perf_counter()
+        key, cached = self._cached(model_name, prompt, generation_config, regenerate)
+        if cached is not None:
+            self._record_cache_hit(call, model_name, started)
+            return cached
+
+        attempt = 0
+        while True:
+            await self.limiter.acquire_async(estimate_tokens(prompt))
+            try:
+                await self._acquire_async()
+                try:
+                    response = await model.generate_content_async(
+                        prompt, generation_config=generation_config
+                    )
+                finally:
+                    self._in_flight.release()
+                text = response.text
+                break
+            except Exception as e:
+                if not self._should_retry(e, attempt):
+                    raise
+                await asyncio.sleep(self._backoff(attempt))
+                attempt += 1
+
+        self._record_call(call, model_name, prompt, response, text, started, attempt)
+        if key is not None:
+            self.cache.put(key, text, model_name)
+        return text
+
+    def _rewrite_prompt(self, original_text, style_guidelines):
+        return f"""Rewrite this chapter with a fresh creative spin while maintaining:
 - Original plot points
 - Character personalities
 - Key dialogues
@@ -23,19 +280,40 @@ Original Chapter:
 {original_text}
 
 Rewritten Chapter:"""
-            
-            response = self.writer_model.generate_content(
-                prompt,
-                generation_config={"temperature": Config.WRITER_TEMPERATURE}
-            )
-            return response.text
-        except Exception as e:
-            logger.error(f"AI writing failed: {str(e)}")
-            raise
 
-    def review_chapter(self, rewritten_text, original_text=None):
-        try:
-            prompt = f"""Analyze this rewritten chapter and provide detailed feedback on:
+    def _section_prompt(self, sections, index, style_guidelines):
+        before, after = context_window(sections, index, Config.AI_CHUNK_CONTEXT_TOKENS)
+        return f"""Rewrite this section of a chapter with a fresh creative spin while maintaining:
+- Original plot points
+- Character personalities
+- Key dialogues
+- Overall tone
+
+Guidelines: {style_guidelines or "Be creative but faithful to the source"}
+
+This is section {index + 1} of {len(sections)}. The surrounding text is given for continuity only - do not rewrite or repeat it.
+
+Preceding Context:
+{before or "Start of chapter"}
+
+Following Context:
+{after or "End of chapter"}
+
+Original Section:
+{sections[index]}
+
+Rewritten Section:"""
+
+    def _continuation_prompt(self, prompt, received):
+        return f"""{prompt}
+{received}
+
+The rewrite above was cut off. Continue it from exactly where it stops - do not repeat any of it.
+
+Continuation:"""
+
+    def _review_prompt(self, rewritten_text, original_text):
+        return f"""Analyze this rewritten chapter and provide detailed feedback on:
 1. Consistency with original (plot, characters)
 2. Writing quality (flow, pacing)
 3. Creativity and originality
@@ -48,12 +326,206 @@ Rewritten Chapter:
 {rewritten_text}
 
 Detailed Feedback:"""
-            
-            response = self.reviewer_model.generate_content(
+
+    def _needs_chunking(self, original_text):
+        return estimate_tokens(original_text) > Config.AI_CHUNK_THRESHOLD_TOKENS
+
+    def _chunked_text(self, result):
+        if result["failed"]:
+            raise RuntimeError(
+                f"{len(result['failed'])} of {len(result['sections'])} sections failed to rewrite: "
+                f"{result['sections'][result['failed'][0]]['error']}"
+            )
+        return result["text"]
+
+    def _sections_path(self, chapter_name):
+        if not chapter_name:
+            return None
+        return os.path.join(Config.AI_PARTIAL_DIR, f"{slugify(chapter_name)}.sections.json")
+
+    def _load_sections(self, path):
+        """Result of an earlier chunked rewrite that did not finish, if one was saved"""
+        if not path or not os.path.exists(path):
+            return None
+        try:
+            with open(path, encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable section progress {path}: {str(e)}")
+            return None
+
+    def _save_sections(self, path, result):
+        """Keep the finished sections of a failed chunked rewrite, or clear them once it succeeds"""
+        if not path:
+            return
+        if not result["failed"]:
+            if os.path.exists(path):
+                os.remove(path)
+            return
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump({"sections": [s for s in result["sections"] if s["status"] == "done"]}, f)
+        os.replace(path + ".tmp", path)
+
+    async def rewrite_chapter_chunked_async(self, original_text, style_guidelines=None,
+                                            regenerate=False, previous=None, chapter_name=None):
+        """Rewrite a long chapter section by section, all sections in parallel.
+
+        Returns {"text", "sections", "failed"}. Passing a previous result
+        re-runs only the sections that failed (or whose source changed).
+        With a chapter_name, finished sections of a failed attempt are kept
+        in AI_PARTIAL_DIR and used as the previous result of the next one.
+        """
+        sources = split_sections(original_text, Config.AI_CHUNK_TOKENS)
+        sections_path = self._sections_path(chapter_name)
+        if previous is None:
+            previous = self._load_sections(sections_path)
+        done = {}
+        if previous:
+            done = {
+                section["source"]: section for section in previous["sections"]
+                if section["status"] == "done"
+            }
+
+        async def rewrite_section(index):
+            source = sources[index]
+            if source in done:
+                return dict(done[source], index=index)
+            try:
+                text = await self._generate_async(
+                    self.writer_model,
+                    self.writer_model_name,
+                    self._section_prompt(sources, index, style_guidelines),
+                    {"temperature": Config.WRITER_TEMPERATURE},
+                    regenerate,
+                    {"kind": "rewrite_section", "chapter": chapter_name, "section": index}
+                )
+                return {"index": index, "source": source, "text": text, "status": "done", "error": ""}
+            except Exception as e:
+                logger.error(f"Section {index + 1}/{len(sources)} rewrite failed: {str(e)}")
+                return {"index": index, "source": source, "text": "", "status": "failed", "error": str(e)}
+
+        logger.info(f"Rewriting chapter in {len(sources)} sections")
+        sections = await asyncio.gather(*[rewrite_section(i) for i in range(len(sources))])
+        failed = [s["index"] for s in sections if s["status"] == "failed"]
+        result = {
+            "text": "" if failed else stitch(s["text"] for s in sections),
+            "sections": sections,
+            "failed": failed
+        }
+        self._save_sections(sections_path, result)
+        return result
+
+    def rewrite_chapter_chunked(self, original_text, style_guidelines=None, regenerate=False,
+                                previous=None, chapter_name=None):
+        return asyncio.run(self.rewrite_chapter_chunked_async(
+            original_text, style_guidelines, regenerate, previous, chapter_name
+        ))
+
+    def rewrite_chapter(self, original_text, style_guidelines=None, regenerate=False,
+                        chapter_name=None):
+        try:
+            if self._needs_chunking(original_text):
+                return self._chunked_text(self.rewrite_chapter_chunked(
+                    original_text, style_guidelines, regenerate, chapter_name=chapter_name
+                ))
+            prompt = self._rewrite_prompt(original_text, style_guidelines)
+            partial_path = self._partial_path(chapter_name, prompt)
+            if partial_path and os.path.exists(partial_path):
+                # Finish the streamed rewrite an earlier run was cut off in
+                return "".join(self._generate_stream(
+                    self.writer_model,
+                    self.writer_model_name,
+                    prompt,
+                    {"temperature": Config.WRITER_TEMPERATURE},
+                    regenerate,
+                    partial_path,
+                    {"kind": "rewrite_stream", "chapter": chapter_name}
+                ))
+            return self._generate(
+                self.writer_model,
+                self.writer_model_name,
                 prompt,
-                generation_config={"temperature": Config.REVIEWER_TEMPERATURE}
+                {"temperature": Config.WRITER_TEMPERATURE},
+                regenerate,
+                {"kind": "rewrite", "chapter": chapter_name}
+            )
+        except Exception as e:
+            logger.error(f"AI writing failed: {str(e)}")
+            raise
+
+    def review_chapter(self, rewritten_text, original_text=None, regenerate=False,
+                       chapter_name=None):
+        try:
+            return self._generate(
+                self.reviewer_model,
+                self.reviewer_model_name,
+                self._review_prompt(rewritten_text, original_text),
+                {"temperature": Config.REVIEWER_TEMPERATURE},
+                regenerate,
+                {"kind": "review", "chapter": chapter_name}
+            )
+        except Exception as e:
+            logger.error(f"AI review failed: {str(e)}")
+            raise
+
+    def rewrite_chapter_stream(self, original_text, style_guidelines=None, regenerate=False,
+                               chapter_name=None):
+        """Generator over the rewrite as it streams in.
+
+        With a chapter_name the text received so far is kept in
+        AI_PARTIAL_DIR, so a stream that is cut off (even by the end of the
+        run) is continued instead of generated again.
+        """
+        try:
+            if self._needs_chunking(original_text):
+                # Sections are generated in parallel, so the text arrives in one piece
+                yield self.rewrite_chapter(original_text, style_guidelines, regenerate, chapter_name)
+                return
+            prompt = self._rewrite_prompt(original_text, style_guidelines)
+            yield from self._generate_stream(
+                self.writer_model,
+                self.writer_model_name,
+                prompt,
+                {"temperature": Config.WRITER_TEMPERATURE},
+                regenerate,
+                self._partial_path(chapter_name, prompt),
+                {"kind": "rewrite_stream", "chapter": chapter_name}
+            )
+        except Exception as e:
+            logger.error(f"AI writing failed: {str(e)}")
+            raise
+
+    async def rewrite_chapter_async(self, original_text, style_guidelines=None, regenerate=False,
+                                    chapter_name=None):
+        try:
+            if self._needs_chunking(original_text):
+                return self._chunked_text(await self.rewrite_chapter_chunked_async(
+                    original_text, style_guidelines, regenerate, chapter_name=chapter_name
+                ))
+            return await self._generate_async(
+                self.writer_model,
+                self.writer_model_name,
+                self._rewrite_prompt(original_text, style_guidelines),
+                {"temperature": Config.WRITER_TEMPERATURE},
+                regenerate,
+                {"kind": "rewrite", "chapter": chapter_name}
+            )
+        except Exception as e:
+            logger.error(f"AI writing failed: {str(e)}")
+            raise
+
+    async def review_chapter_async(self, rewritten_text, original_text=None, regenerate=False,
+                                   chapter_name=None):
+        try:
+            return await self._generate_async(
+                self.reviewer_model,
+                self.reviewer_model_name,
+                self._review_prompt(rewritten_text, original_text),
+                {"temperature": Config.REVIEWER_TEMPERATURE},
+                regenerate,
+                {"kind": "review", "chapter": chapter_name}
             )
-            return response.text
         except Exception as e:
             logger.error(f"AI review failed: {str(e)}")
             raise
\ No newline at end of file
@@ -0,0 +1,100 @@
+import re
+from utils.helpers import estimate_tokens
+
+SCENE_BREAK = re.compile(r"^\s*(?:(?:\*\s*){3,}|(?:-\s*){3,}|(?:~\s*){3,}|#)\s*$")
+SENTENCE_END = re.compile(r"(?<=[.!?])\s+|(?<=[.!?][\"')\]])\s+")
+
+
+def split_paragraphs(text):
+    return [p.strip() for p in re.split(r"\n\s*\n", text) if p.strip()]
+
+
+def _split_long_paragraph(paragraph, max_tokens):
+    """Break a paragraph that alone exceeds the budget on sentence boundaries"""
+    pieces, current = [], ""
+    for sentence in SENTENCE_END.split(paragraph):
+        candidate = f"{current} {sentence}".strip()
+        if current and estimate_tokens(candidate) > max_tokens:
+            pieces.append(current)
+            current = sentence
+        else:
+            current = candidate
+    if current:
+        pieces.append(current)
+    return pieces
+
+
+def split_sections(text, max_tokens):
+    """Split a chapter into sections of at most max_tokens.
+
+    Sections end on paragraph boundaries, and preferably on scene breaks
+    once a section is at least half full.
+    """
+    sections, current, size = [], [], 0
+
+    def close():
+        nonlocal current, size
+        if current:
+            sections.append("\n\n".join(current))
+        current, size = [], 0
+
+    for paragraph in split_paragraphs(text):
+        if SCENE_BREAK.match(paragraph) and size >= max_tokens / 2:
+            close()
+
+        pieces = [paragraph]
+        if estimate_tokens(paragraph) > max_tokens:
+            pieces = _split_long_paragraph(paragraph, max_tokens)
+
+        for piece in pieces:
+            tokens = estimate_tokens(piece)
+            if current and size + tokens > max_tokens:
+                close()
+            current.append(piece)
+            size += tokens
+
+    close()
+    return sections
+
+
+def context_window(sections, index, context_tokens):
+    """Tail of the previous section and head of the next, for continuity"""
+    chars = context_tokens * 4
+    before = sections[index - 1][-chars:] if index > 0 else ""
+    after = sections[index + 1][:chars] if index + 1 < len(sections) else ""
+    return before, after
+
+
+def stitch(section_texts):
+    return "\n\n".join(text.strip() for text in section_texts)
+
+
+def passages_with_offsets(text, max_tokens, overlap_tokens):
+    """Overlapping passages of about max_tokens as (start, end, passage) tuples.
+
+    Windows are cut on whitespace so words are never split, and every
+    character of text falls in at least one passage.
+    """
+    size = max_tokens * 4
+    stride = max(1, (max_tokens - overlap_tokens) * 4)
+    passages = []
+    start = 0
+
+    while start < len(text):
+        # Skip leading whitespace so offsets point at real text
+        while start < len(text) and text[start].isspace():
+            start += 1
+        if start >= len(text):
+            break
+
+        end = min(len(text), start + size)
+        if end < len(text):
+            cut = text.rfind(" ", start + stride, end)
+            end = cut if cut > start else end
+        passages.append((start, end, text[start:end].strip()))
+        if end >= len(text):
+            break
+
+        next_start = text.find(" ", start + stride, end)
+        start = next_start + 1 if next_start != -1 else end
+    return passages
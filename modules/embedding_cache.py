@@ -0,0 +1,58 @@
+import os
+import sqlite3
+import threading
+import numpy as np
+from config import Config
+
+class EmbeddingCache:
+    """Persistent embedding vectors keyed by (content hash, model name)"""
+
+    def __init__(self, path=None):
+        self.path = path or Config.EMBEDDING_CACHE_PATH
+        self.stats = {"hits": 0, "misses": 0}
+        self._lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS embeddings (
+                content_hash TEXT,
+                model TEXT,
+                vector BLOB,
+                PRIMARY KEY (content_hash, model)
+            )
+        """)
+        self._conn.commit()
+
+    def get_many(self, hashes, model):
+        """Return {content_hash: vector} for the hashes that are cached"""
+        found = {}
+        unique = list(dict.fromkeys(hashes))
+        with self._lock:
+            # Stay well below SQLite's bound-parameter limit
+            for start in range(0, len(unique), 500):
+                chunk = unique[start:start + 500]
+                placeholders = ",".join("?" * len(chunk))
+                for content_hash, blob in self._conn.execute(
+                    f"SELECT content_hash, vector FROM embeddings "
+                    f"WHERE model = ? AND content_hash IN ({placeholders})",
+                    [model] + chunk
+                ):
+                    found[content_hash] = np.frombuffer(blob, dtype=np.float32).tolist()
+            self.stats["hits"] += len(found)
+            self.stats["misses"] += len(unique) - len(found)
+        return found
+
+    def put_many(self, vectors, model):
+        """Store {content_hash: vector}"""
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (content_hash, model, vector) VALUES (?, ?, ?)",
+                [(h, model, np.asarray(v, dtype=np.float32).tobytes()) for h, v in vectors.items()]
+            )
+            self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
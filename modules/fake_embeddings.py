@@ -0,0 +1,37 @@
+import hashlib
+import re
+import numpy as np
+from config import Config
+
+TOKEN_PATTERN = re.compile(r"\w+")
+
+
+class HashingEmbeddingFunction:
+    """Offline stand-in for the sentence-transformers embedding function.
+
+    Words are hashed into a fixed number of signed buckets and the counts
+    L2-normalised, so texts sharing words are close. Deterministic, no model
+    download and no PyTorch, for benchmarks and runs without network access.
+    """
+
+    def __init__(self, dim=None):
+        self.dim = dim or Config.HASHING_EMBEDDING_DIM
+        self.model_name = f"hashing-{self.dim}"
+
+    def _bucket(self, token):
+        digest = int.from_bytes(hashlib.blake2b(token.encode(), digest_size=8).digest(), "little")
+        return digest % self.dim, 1.0 if digest >> 63 else -1.0
+
+    def __call__(self, input):
+        vectors = np.zeros((len(input), self.dim), dtype=np.float32)
+        buckets = {}
+        for row, text in enumerate(input):
+            for token in TOKEN_PATTERN.findall(text.lower()):
+                if token not in buckets:
+                    buckets[token] = self._bucket(token)
+                column, sign = buckets[token]
+                vectors[row, column] += sign
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        vectors /= np.where(norms == 0, 1.0, norms)
+        # Chroma only accepts embeddings as plain lists of floats
+        return vectors.tolist()
@@ -0,0 +1,116 @@
+import asyncio
+import random
+import re
+import threading
+import time
+from config import Config
+from utils.helpers import estimate_tokens
+
+REWRITE_PROMPT = re.compile(r"Original (Chapter|Section):\n(.*)\n\s*Rewritten \1:\s*$", re.S)
+CONTINUE_PROMPT = re.compile(r"Original Chapter:\n(.*)\n\s*Rewritten Chapter:\n(.*)\n\nThe rewrite above was cut off.*Continuation:\s*$", re.S)
+
+class FakeQuotaError(Exception):
+    """Stand-in for Gemini's 429 ResourceExhausted"""
+    code = 429
+
+
+class FakeUsage:
+    def __init__(self, prompt_tokens, output_tokens):
+        self.prompt_token_count = prompt_tokens
+        self.candidates_token_count = output_tokens
+        self.total_token_count = prompt_tokens + output_tokens
+
+
+class FakeResponse:
+    def __init__(self, text, prompt):
+        self.text = text
+        self.usage_metadata = FakeUsage(estimate_tokens(prompt), estimate_tokens(text))
+
+
+class FakeChunk:
+    def __init__(self, text):
+        self.text = text
+
+
+class FakeStreamResponse:
+    """Iterable of chunks, like generate_content(stream=True)"""
+
+    def __init__(self, model, text, prompt, chunk_words=20):
+        self._model = model
+        self._words = text.split(" ")
+        self._chunk_words = chunk_words
+        self.usage_metadata = FakeUsage(estimate_tokens(prompt), estimate_tokens(text))
+
+    def __iter__(self):
+        chunks = [
+            " ".join(self._words[i:i + self._chunk_words])
+            for i in range(0, len(self._words), self._chunk_words)
+        ]
+        delay = self._model.latency / max(1, len(chunks))
+        for i, chunk in enumerate(chunks):
+            time.sleep(delay)
+            yield FakeChunk(chunk if i == len(chunks) - 1 else chunk + " ")
+
+
+class FakeGenerativeModel:
+    """Offline stand-in for genai.GenerativeModel with configurable latency and failures.
+
+    Rewrite prompts echo the original chapter (or section) back, review prompts get a fixed
+    note, so the whole workflow can run without network access. Concurrency is
+    tracked in max_in_flight.
+    """
+
+    def __init__(self, model_name="fake-model", latency=None, failure_rate=None, seed=0):
+        self.model_name = model_name
+        self.latency = Config.FAKE_MODEL_LATENCY if latency is None else latency
+        self.failure_rate = Config.FAKE_MODEL_FAILURE_RATE if failure_rate is None else failure_rate
+        self.calls = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def _respond(self, prompt):
+        match = CONTINUE_PROMPT.search(prompt)
+        if match:
+            # The echoed chapter, minus what was received before the cut
+            return match.group(1).strip()[len(match.group(2)):]
+        match = REWRITE_PROMPT.search(prompt)
+        if match:
+            return match.group(2).strip()
+        return "The rewrite is consistent with the original. Pacing and tone are good."
+
+    def _enter(self):
+        with self._lock:
+            self.calls += 1
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+            return self._random.random() < self.failure_rate
+
+    def _exit(self):
+        with self._lock:
+            self.in_flight -= 1
+
+    def generate_content(self, prompt, generation_config=None, stream=False):
+        fail = self._enter()
+        try:
+            if stream:
+                if fail:
+                    raise FakeQuotaError("429 Resource has been exhausted (fake)")
+                return FakeStreamResponse(self, self._respond(prompt), prompt)
+            time.sleep(self.latency)
+            if fail:
+                raise FakeQuotaError("429 Resource has been exhausted (fake)")
+            return FakeResponse(self._respond(prompt), prompt)
+        finally:
+            self._exit()
+
+    async def generate_content_async(self, prompt, generation_config=None):
+        fail = self._enter()
+        try:
+            await asyncio.sleep(self.latency)
+            if fail:
+                raise FakeQuotaError("429 Resource has been exhausted (fake)")
+            return FakeResponse(self._respond(prompt), prompt)
+        finally:
+            self._exit()
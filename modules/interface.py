@@ -91,46 +91,55 @@
 
 
 import os
+import shlex
+import shutil
+import subprocess
 import tempfile
+import textwrap
 from datetime import datetime
+from itertools import zip_longest
+from config import Config
 from utils.logger import logger
+from utils.text_delta import apply_delta, diff_rows, make_delta, page_rows, word_diff
+
+# Row markers of the side-by-side diff
+DIFF_MARKERS = {"equal": " ", "replace": "~", "delete": "-", "insert": "+"}
 
 class HumanReviewInterface:
     def __init__(self, ai_processor, version_db):
         self.ai = ai_processor
         self.db = version_db
         
-    def start_review_session(self, chapter_data):
+    def display_stream(self, chapter_data, chunks):
+        """Show the rewrite while it is still being generated and return the full text"""
+        print(f"\n=== Reviewing Chapter: {chapter_data['chapter_name']} ===")
+
+        print("\nOriginal Version Excerpt:")
+        print(chapter_data["original_content"][:500] + "...")
+
+        print("\nRewritten Version (streaming):")
+        parts = []
+        try:
+            for chunk in chunks:
+                parts.append(chunk)
+                print(chunk, end="", flush=True)
+        finally:
+            # Frees the model call's concurrency slot at once if printing fails
+            chunks.close()
+        print()
+        return "".join(parts)
+
+    def start_review_session(self, chapter_data, show_content=True):
         """Guide human through review process with fallback options"""
         try:
-            print(f"\n=== Reviewing Chapter: {chapter_data['chapter_name']} ===")
-            
-            # Show versions
-            print("\nOriginal Version Excerpt:")
-            print(chapter_data["original_content"][:500] + "...")
-            
-            print("\nRewritten Version:")
-            print(chapter_data["content"])
+            if show_content:
+                print(f"\n=== Reviewing Chapter: {chapter_data['chapter_name']} ===")
+                self.show_diff(chapter_data["original_content"], chapter_data["content"])
             
             # Get feedback
-            feedback = self._get_human_feedback()
+            feedback = self._get_human_feedback(chapter_data["content"])
             
-            # Apply edits if needed
-            if feedback.get("needs_edit"):
-                chapter_data["content"] = self._apply_human_edits(
-                    chapter_data["content"],
-                    feedback["edits"]
-                )
-                
-            # Store reviewed version
-            chapter_data.update({
-                "status": "reviewed",
-                "author": "human_reviewer",
-                "human_feedback": feedback,
-                "timestamp": datetime.now().isoformat()
-            })
-            
-            version_id = self.db.store_version(chapter_data)
+            version_id = self._store_review(chapter_data, feedback)
             print(f"\nReview completed! Version ID: {version_id}")
             return version_id
             
@@ -146,7 +155,116 @@ class HumanReviewInterface:
             })
             return self.db.store_version(chapter_data)
     
-    def _get_human_feedback(self):
+    def review_from_queue(self, queue, reviewer, state=None):
+        """Terminal front end for the review queue: claim and review chapters until it is empty"""
+        reviewed = 0
+        while True:
+            review = queue.claim(reviewer)
+            if review is None:
+                print(f"\nNo chapters waiting for review ({reviewed} reviewed)")
+                return reviewed
+
+            chapter_data = review["chapter_data"]
+            print(f"\n=== Reviewing Chapter: {chapter_data['chapter_name']} ===")
+            print("\nAI Reviewer Feedback:")
+            print(review["ai_feedback"])
+
+            try:
+                self.show_diff(chapter_data["original_content"], chapter_data["content"])
+                feedback = self._get_human_feedback(chapter_data["content"])
+            except KeyboardInterrupt:
+                queue.release(review["id"], reviewer)
+                print(f"\n{review['chapter']} returned to the queue")
+                return reviewed
+            feedback["reviewer"] = reviewer
+            try:
+                version_id = self.complete_review(queue, review, feedback, state)
+            except KeyError:
+                print(f"\nYour claim on {review['chapter']} expired and the review was not stored")
+                continue
+            print(f"\nReview completed! Version ID: {version_id}")
+            reviewed += 1
+
+    def show_diff(self, original, rewritten, page_size=None):
+        """Page through a side-by-side diff of the original and rewritten chapter"""
+        page_size = page_size or Config.REVIEW_PAGE_ROWS
+        rows = diff_rows(original, rewritten, context=Config.REVIEW_DIFF_CONTEXT)
+        width = (shutil.get_terminal_size().columns - 3) // 2
+        new_line_count = len(rewritten.splitlines())
+        changed = sum(row["tag"] not in ("equal", "skip") for row in rows)
+        print(f"\nOriginal (left) vs rewritten (right): {changed} changed lines, "
+              f"[-removed-] and {{+added+}} words marked")
+
+        page = 1
+        while True:
+            shown, page, pages, _ = page_rows(rows, page, page_size, new_line_count)
+            for row in shown:
+                print(self._format_row(row, width))
+            if page == pages:
+                return
+            if input(f"--- page {page}/{pages}: Enter for more, q to skip to feedback --- ").strip().lower() == "q":
+                return
+            page += 1
+
+    def _format_row(self, row, width):
+        """One diff row as two wrapped columns"""
+        if row["tag"] == "skip":
+            return f"{'':>5} ... {row['count']} unchanged lines ..."
+        old, new = row["old"] or "", row["new"] or ""
+        if row["tag"] == "replace":
+            segments = word_diff(old, new)
+            old = "".join(f"[-{t}-]" if tag == "delete" else t for tag, t in segments if tag != "insert")
+            new = "".join(f"{{+{t}+}}" if tag == "insert" else t for tag, t in segments if tag != "delete")
+        column = max(20, width - 7)
+        left = textwrap.wrap(old, column) or [""]
+        right = textwrap.wrap(new, column) or [""]
+        lines = []
+        for n, (a, b) in enumerate(zip_longest(left, right, fillvalue="")):
+            number = f"{row['new_no'] + 1:>5}" if n == 0 and row["new"] is not None else " " * 5
+            marker = DIFF_MARKERS[row["tag"]] if n == 0 else " "
+            lines.append(f"{number} {marker} {a:<{column}} | {b}")
+        return "\n".join(lines)
+
+    def complete_review(self, queue, review, feedback, state=None):
+        """Store a queued chapter's review decision and close it in the queue"""
+        try:
+            # Renewing the lease checks the claim and keeps anyone else from taking
+            # it while the version is stored; an expired claim stores nothing
+            if not queue.renew(review["id"], feedback.get("reviewer")):
+                raise KeyError(f"Review {review['id']} is not claimed by {feedback.get('reviewer')}")
+            # Edits are recorded against the AI version the reviewer was shown
+            chapter_data = dict(review["chapter_data"], parent_id=review["version_id"])
+            version_id = self._store_review(chapter_data, feedback)
+            queue.complete(review["id"], feedback.get("reviewer"), feedback, version_id)
+            if state is not None:
+                checkpoint = state.checkpoint(review["chapter"], chapter_data.get("source_url"))
+                checkpoint.save("done", version_id=version_id)
+            return version_id
+        except Exception as e:
+            logger.error(f"Storing review of {review['chapter']} failed: {str(e)}")
+            raise
+
+    def _store_review(self, chapter_data, feedback):
+        """Apply the reviewer's edits and store the reviewed version"""
+        # Edits are kept as a line patch against the AI version, not a second full copy
+        if feedback.get("needs_edit"):
+            edited = self._apply_human_edits(chapter_data["content"], feedback.pop("edits"))
+            feedback["patch"] = make_delta(chapter_data["content"], edited)
+            chapter_data["content"] = apply_delta(chapter_data["content"], feedback["patch"])
+
+        chapter_data.update({
+            "status": "reviewed",
+            "author": "human_reviewer",
+            "human_feedback": feedback,
+            "timestamp": datetime.now().isoformat()
+        })
+        # 1-5 stars as 0-1, the scale search ranking uses for its other features
+        rating = str(feedback.get("rating", "")).strip()
+        if rating.isdigit() and 1 <= int(rating) <= 5:
+            chapter_data["human_rating"] = (int(rating) - 1) / 4
+        return self.db.store_version(chapter_data)
+
+    def _get_human_feedback(self, content=""):
         """Simplified feedback collection with editor fallback"""
         print("\nProvide feedback:")
         rating = input("Rate this rewrite (1-5): ")
@@ -158,7 +276,9 @@ class HumanReviewInterface:
             "timestamp": datetime.now().isoformat()
         }
         
-        if needs_edit:
+        if needs_edit and (os.environ.get("VISUAL") or os.environ.get("EDITOR")):
+            feedback["edits"] = self._edit_in_editor(content)
+        elif needs_edit:
             print("\nEnter your edits below (press Enter then Ctrl+Z when done):")
             edits = []
             while True:
@@ -171,6 +291,19 @@ class HumanReviewInterface:
             
         return feedback
     
+    def _edit_in_editor(self, content):
+        """Open the rewrite in $VISUAL/$EDITOR and return the saved text"""
+        editor = os.environ.get("VISUAL") or os.environ.get("EDITOR")
+        fd, path = tempfile.mkstemp(suffix=".txt", prefix="review_")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                f.write(content)
+            subprocess.run(shlex.split(editor) + [path], check=True)
+            with open(path, encoding="utf-8") as f:
+                return f.read()
+        finally:
+            os.remove(path)
+
     def _apply_human_edits(self, original_text, edited_text):
         """Apply human edits to the content"""
         return edited_text if edited_text.strip() else original_text
\ No newline at end of file
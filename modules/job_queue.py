@@ -0,0 +1,179 @@
+import json
+import os
+import sqlite3
+import time
+from config import Config
+
+# Stages in pipeline order; a finished job hands its output to the next one
+QUEUE_STAGES = ["scrape", "ai", "index"]
+
+
+class JobQueue:
+    """SQLite-backed job queue shared by worker processes on one machine (no broker).
+
+    Each process opens its own JobQueue. Claims take a lease, so a job held
+    by a worker that died goes back to the queue once the lease runs out.
+    """
+
+    def __init__(self, path=None, lease_seconds=None, max_attempts=None):
+        self.path = path or Config.JOB_QUEUE_PATH
+        self.lease_seconds = lease_seconds or Config.JOB_LEASE_SECONDS
+        self.max_attempts = max_attempts or Config.JOB_MAX_ATTEMPTS
+
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        # Autocommit mode, with explicit BEGIN IMMEDIATE where claims must be atomic
+        self._conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                stage TEXT NOT NULL,
+                chapter TEXT,
+                payload TEXT,
+                status TEXT NOT NULL DEFAULT 'queued',
+                attempts INTEGER NOT NULL DEFAULT 0,
+                worker TEXT,
+                error TEXT,
+                enqueued_at REAL,
+                started_at REAL,
+                finished_at REAL,
+                lease_until REAL
+            );
+            CREATE INDEX IF NOT EXISTS jobs_claim ON jobs (stage, status, id);
+            CREATE INDEX IF NOT EXISTS jobs_finished ON jobs (stage, finished_at);
+        """)
+
+    def enqueue(self, stage, chapter, payload):
+        return self.enqueue_many(stage, [(chapter, payload)])[0]
+
+    def enqueue_many(self, stage, jobs):
+        """Queue (chapter, payload) pairs for a stage; returns their job IDs"""
+        now = time.time()
+        ids = []
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            for chapter, payload in jobs:
+                cursor = self._conn.execute(
+                    "INSERT INTO jobs (stage, chapter, payload, enqueued_at) VALUES (?, ?, ?, ?)",
+                    (stage, chapter, json.dumps(payload), now)
+                )
+                ids.append(cursor.lastrowid)
+            self._conn.execute("COMMIT")
+        except Exception:
+            self._conn.execute("ROLLBACK")
+            raise
+        return ids
+
+    def claim(self, stage, worker, limit=1):
+        """Lease up to limit of the oldest runnable jobs of a stage"""
+        now = time.time()
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            rows = self._conn.execute(
+                "SELECT id, chapter, payload, attempts FROM jobs WHERE stage = ? AND "
+                "(status = 'queued' OR (status = 'running' AND lease_until < ?)) "
+                "ORDER BY id LIMIT ?",
+                (stage, now, limit)
+            ).fetchall()
+            self._conn.executemany(
+                "UPDATE jobs SET status = 'running', worker = ?, started_at = ?, lease_until = ?, "
+                "attempts = attempts + 1 WHERE id = ?",
+                [(worker, now, now + self.lease_seconds, row[0]) for row in rows]
+            )
+            self._conn.execute("COMMIT")
+        except Exception:
+            self._conn.execute("ROLLBACK")
+            raise
+        return [{
+            "id": job_id, "stage": stage, "chapter": chapter,
+            "payload": json.loads(payload), "attempts": attempts + 1
+        } for job_id, chapter, payload, attempts in rows]
+
+    def complete(self, job, next_stage=None, next_payload=None, result=None):
+        """Mark a job done and, in the same transaction, queue its output for the next stage.
+
+        The job's payload is replaced by the (small) result, so chapter text
+        is not kept once per stage.
+        """
+        now = time.time()
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            self._conn.execute(
+                "UPDATE jobs SET status = 'done', finished_at = ?, error = NULL, payload = ? WHERE id = ?",
+                (now, json.dumps(result or {}), job["id"])
+            )
+            if next_stage:
+                self._conn.execute(
+                    "INSERT INTO jobs (stage, chapter, payload, enqueued_at) VALUES (?, ?, ?, ?)",
+                    (next_stage, job["chapter"], json.dumps(next_payload), now)
+                )
+            self._conn.execute("COMMIT")
+        except Exception:
+            self._conn.execute("ROLLBACK")
+            raise
+
+    def fail(self, job, error):
+        """Requeue a failed job, or give up on it after max_attempts"""
+        status = "failed" if job["attempts"] >= self.max_attempts else "queued"
+        self._conn.execute(
+            "UPDATE jobs SET status = ?, error = ?, finished_at = ?, lease_until = NULL WHERE id = ?",
+            (status, error, time.time() if status == "failed" else None, job["id"])
+        )
+        return status
+
+    def result(self, job_id):
+        """Result a finished job was completed with"""
+        row = self._conn.execute("SELECT payload FROM jobs WHERE id = ? AND status = 'done'", (job_id,)).fetchone()
+        return json.loads(row[0]) if row and row[0] else {}
+
+    def merge_result(self, job_id, values):
+        """Add values to a finished job's result; returns the result as it was before.
+
+        Two workers handing data to each other through one job's result see
+        each other's values, whichever of them merges second.
+        """
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = self._conn.execute("SELECT payload FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            previous = json.loads(row[0]) if row and row[0] else {}
+            self._conn.execute("UPDATE jobs SET payload = ? WHERE id = ?",
+                               (json.dumps(dict(previous, **values)), job_id))
+            self._conn.execute("COMMIT")
+        except Exception:
+            self._conn.execute("ROLLBACK")
+            raise
+        return previous
+
+    def active(self, stages):
+        """Jobs still queued or running in any of the given stages"""
+        placeholders = ",".join("?" * len(stages))
+        return self._conn.execute(
+            f"SELECT COUNT(*) FROM jobs WHERE stage IN ({placeholders}) AND status IN ('queued', 'running')",
+            list(stages)
+        ).fetchone()[0]
+
+    def stats(self, window=60.0):
+        """Per-stage queue depth, outcomes and throughput over the last window seconds"""
+        since = time.time() - window
+        stats = {}
+        for stage in QUEUE_STAGES:
+            counts = dict(self._conn.execute(
+                "SELECT status, COUNT(*) FROM jobs WHERE stage = ? GROUP BY status", (stage,)
+            ).fetchall())
+            recent, avg_seconds = self._conn.execute(
+                "SELECT COUNT(*), AVG(finished_at - started_at) FROM jobs "
+                "WHERE stage = ? AND status = 'done' AND finished_at >= ?",
+                (stage, since)
+            ).fetchone()
+            stats[stage] = {
+                "queued": counts.get("queued", 0),
+                "running": counts.get("running", 0),
+                "done": counts.get("done", 0),
+                "failed": counts.get("failed", 0),
+                "per_minute": recent * 60.0 / window,
+                "avg_seconds": avg_seconds or 0.0
+            }
+        return stats
+
+    def close(self):
+        self._conn.close()
@@ -0,0 +1,102 @@
+import os
+import re
+import sqlite3
+import threading
+
+PHRASE = re.compile(r'"([^"]+)"')
+
+
+def to_match_query(query):
+    """Turn free text into an FTS5 OR query, keeping "quoted phrases" intact"""
+    phrases = [p.strip() for p in PHRASE.findall(query) if p.strip()]
+    words = re.findall(r"\w+", PHRASE.sub(" ", query))
+    return " OR ".join(f'"{term}"' for term in phrases + words)
+
+
+class LexicalIndex:
+    """SQLite FTS5 (BM25) index of version content, kept beside the Chroma collection"""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS docs (
+                rowid INTEGER PRIMARY KEY,
+                version_id TEXT UNIQUE,
+                chapter TEXT
+            );
+            CREATE INDEX IF NOT EXISTS docs_chapter ON docs (chapter);
+            CREATE VIRTUAL TABLE IF NOT EXISTS docs_fts
+                USING fts5(content, tokenize = 'porter unicode61');
+        """)
+        self._conn.commit()
+
+    def add_many(self, documents):
+        """Index (version_id, chapter, content) tuples; IDs already indexed are skipped.
+
+        Version IDs contain the content hash, so an indexed ID never needs
+        its text replaced.
+        """
+        added = 0
+        with self._lock:
+            for version_id, chapter, content in documents:
+                cursor = self._conn.execute(
+                    "INSERT OR IGNORE INTO docs (version_id, chapter) VALUES (?, ?)",
+                    (version_id, chapter)
+                )
+                if cursor.rowcount:
+                    self._conn.execute(
+                        "INSERT INTO docs_fts (rowid, content) VALUES (?, ?)",
+                        (cursor.lastrowid, content)
+                    )
+                    added += 1
+            self._conn.commit()
+        return added
+
+    def contains(self, version_ids):
+        """Subset of version_ids that are already indexed"""
+        found = set()
+        ids = list(version_ids)
+        with self._lock:
+            for start in range(0, len(ids), 500):
+                chunk = ids[start:start + 500]
+                placeholders = ",".join("?" * len(chunk))
+                found.update(row[0] for row in self._conn.execute(
+                    f"SELECT version_id FROM docs WHERE version_id IN ({placeholders})", chunk
+                ))
+        return found
+
+    def search(self, query, chapter=None, limit=10):
+        """BM25-ranked matches as dicts with version_id, score (higher is better) and snippet"""
+        match = to_match_query(query)
+        if not match:
+            return []
+
+        sql = (
+            "SELECT docs.version_id, -bm25(docs_fts), "
+            "snippet(docs_fts, 0, '**', '**', '...', 48) "
+            "FROM docs_fts JOIN docs ON docs.rowid = docs_fts.rowid "
+            "WHERE docs_fts MATCH ?"
+        )
+        params = [match]
+        if chapter:
+            sql += " AND docs.chapter = ?"
+            params.append(chapter)
+        sql += " ORDER BY bm25(docs_fts) LIMIT ?"
+        params.append(limit)
+
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        return [{"version_id": v, "score": score, "snippet": snippet} for v, score, snippet in rows]
+
+    def count(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM docs").fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
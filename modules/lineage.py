@@ -0,0 +1,203 @@
+import json
+import os
+import sqlite3
+import threading
+import zlib
+from datetime import datetime
+from config import Config
+from utils.lru_cache import LRUCache
+from utils.text_delta import apply_delta, make_delta
+
+HISTORY_FIELDS = ["version_id", "chapter", "timestamp", "parent_id", "status", "author"]
+
+
+class LineageStore:
+    """Version history beside the Chroma collection: one row per stored version, with parent links.
+
+    The same content can be stored more than once (for example ai_rewritten
+    and then auto_approved), so a version ID can have several history rows;
+    its text is kept once in version_content, zlib-compressed and, where that
+    is smaller, as a line delta against its parent. Every
+    keyframe_interval-th version in a chain is stored whole to bound reads.
+    """
+
+    def __init__(self, path, keyframe_interval=None, cache_size=None):
+        self.path = path
+        self.keyframe_interval = keyframe_interval or Config.LINEAGE_KEYFRAME_INTERVAL
+        self.cache = LRUCache(Config.LINEAGE_CACHE_SIZE if cache_size is None else cache_size)
+        self._lock = threading.RLock()
+
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS history (
+                seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                version_id TEXT NOT NULL,
+                chapter TEXT NOT NULL,
+                timestamp REAL NOT NULL,
+                parent_id TEXT,
+                status TEXT,
+                author TEXT
+            );
+            CREATE INDEX IF NOT EXISTS history_chapter_time ON history (chapter, timestamp);
+            CREATE INDEX IF NOT EXISTS history_chapter_status ON history (chapter, status, timestamp);
+            CREATE INDEX IF NOT EXISTS history_version ON history (version_id);
+            CREATE TABLE IF NOT EXISTS version_content (
+                version_id TEXT PRIMARY KEY,
+                base_id TEXT,
+                depth INTEGER NOT NULL,
+                data BLOB NOT NULL
+            );
+        """)
+        self._conn.commit()
+
+    def record_many(self, versions):
+        """Append (version_id, content, metadata) tuples in order.
+
+        metadata may carry parent_id; otherwise the parent is the chapter's
+        most recent other version.
+        """
+        with self._lock:
+            for version_id, content, metadata in versions:
+                parent_id = metadata.get("parent_id") or self._infer_parent(metadata["chapter"], version_id)
+                self._conn.execute(
+                    "INSERT INTO history (version_id, chapter, timestamp, parent_id, status, author) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (version_id, metadata["chapter"], metadata["timestamp_epoch"], parent_id,
+                     metadata.get("status"), metadata.get("author"))
+                )
+                self._put_content(version_id, content, parent_id)
+            self._conn.commit()
+
+    def _put_content(self, version_id, content, base_id):
+        if self._conn.execute(
+            "SELECT 1 FROM version_content WHERE version_id = ?", (version_id,)
+        ).fetchone():
+            return
+
+        data = zlib.compress(content.encode())
+        base = self._conn.execute(
+            "SELECT depth FROM version_content WHERE version_id = ?", (base_id,)
+        ).fetchone() if base_id else None
+        depth = 0
+        if base is not None and base[0] + 1 < self.keyframe_interval:
+            delta = zlib.compress(json.dumps(make_delta(self.content(base_id), content)).encode())
+            # An unrelated rewrite compresses better whole than as a delta
+            if len(delta) < len(data):
+                data, depth = delta, base[0] + 1
+        self._conn.execute(
+            "INSERT INTO version_content (version_id, base_id, depth, data) VALUES (?, ?, ?, ?)",
+            (version_id, base_id if depth else None, depth, data)
+        )
+        self.cache.put(version_id, content)
+
+    def _infer_parent(self, chapter, version_id):
+        row = self._conn.execute(
+            "SELECT version_id, parent_id FROM history WHERE chapter = ? "
+            "ORDER BY timestamp DESC, seq DESC LIMIT 1",
+            (chapter,)
+        ).fetchone()
+        if row is None:
+            return None
+        # Re-storing the latest content (a status change) keeps its parent
+        return row[1] if row[0] == version_id else row[0]
+
+    def update_latest(self, version_id, status=None, author=None):
+        """Change status/author on the newest history row of a version"""
+        with self._lock:
+            self._conn.execute(
+                "UPDATE history SET status = COALESCE(?, status), author = COALESCE(?, author) "
+                "WHERE seq = (SELECT MAX(seq) FROM history WHERE version_id = ?)",
+                (status, author, version_id)
+            )
+            self._conn.commit()
+
+    def _row(self, row):
+        entry = dict(zip(HISTORY_FIELDS, row))
+        entry["timestamp"] = datetime.fromtimestamp(entry["timestamp"]).isoformat()
+        return entry
+
+    def history(self, chapter, limit=None):
+        """A chapter's history rows, oldest first (the newest limit rows if given)"""
+        sql = (
+            f"SELECT {', '.join(HISTORY_FIELDS)} FROM history WHERE chapter = ? "
+            "ORDER BY timestamp DESC, seq DESC"
+        )
+        params = [chapter]
+        if limit:
+            sql += " LIMIT ?"
+            params.append(limit)
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        return [self._row(row) for row in reversed(rows)]
+
+    def history_of(self, version_id):
+        """All history rows of one version ID, oldest first"""
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT {', '.join(HISTORY_FIELDS)} FROM history WHERE version_id = ? ORDER BY seq",
+                (version_id,)
+            ).fetchall()
+        return [self._row(row) for row in rows]
+
+    def latest(self, chapter, status=None):
+        """Newest history row of a chapter, optionally with a given status"""
+        sql = f"SELECT {', '.join(HISTORY_FIELDS)} FROM history WHERE chapter = ?"
+        params = [chapter]
+        if status:
+            sql += " AND status = ?"
+            params.append(status)
+        sql += " ORDER BY timestamp DESC, seq DESC LIMIT 1"
+        with self._lock:
+            row = self._conn.execute(sql, params).fetchone()
+        return self._row(row) if row else None
+
+    def content(self, version_id):
+        """Text of a version, rebuilt from its keyframe and the deltas after it"""
+        cached = self.cache.get(version_id)
+        if cached is not None:
+            return cached
+
+        chain = []
+        with self._lock:
+            current = version_id
+            while current is not None:
+                row = self._conn.execute(
+                    "SELECT base_id, data FROM version_content WHERE version_id = ?", (current,)
+                ).fetchone()
+                if row is None:
+                    return None
+                chain.append(row[1])
+                current = row[0]
+
+        text = zlib.decompress(chain.pop()).decode()
+        for data in reversed(chain):
+            text = apply_delta(text, json.loads(zlib.decompress(data)))
+        self.cache.put(version_id, text)
+        return text
+
+    def storage_stats(self):
+        """Stored versions, keyframes and compressed bytes"""
+        with self._lock:
+            versions, keyframes, stored = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(depth = 0), 0), COALESCE(SUM(LENGTH(data)), 0) FROM version_content"
+            ).fetchone()
+        return {"versions": versions, "keyframes": keyframes, "stored_bytes": stored}
+
+    def contains(self, version_ids):
+        """Subset of version_ids that have history rows"""
+        found = set()
+        ids = list(version_ids)
+        with self._lock:
+            for start in range(0, len(ids), 500):
+                chunk = ids[start:start + 500]
+                placeholders = ",".join("?" * len(chunk))
+                found.update(row[0] for row in self._conn.execute(
+                    f"SELECT DISTINCT version_id FROM history WHERE version_id IN ({placeholders})", chunk
+                ))
+        return found
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
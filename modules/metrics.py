@@ -0,0 +1,87 @@
+import json
+import os
+import threading
+import time
+from datetime import datetime
+from config import Config
+from utils.helpers import format_table
+from utils.logger import logger
+
+SUMMARY_FIELDS = ["calls", "cache_hits", "retries", "prompt_tokens", "output_tokens", "latency"]
+
+
+class AIMetrics:
+    """Per-call token and latency records for one run, mirrored to a JSON lines file"""
+
+    def __init__(self, path=None):
+        self.path = path if path is not None else Config.AI_METRICS_PATH
+        self.run_id = datetime.now().strftime("%Y%m%d_%H%M%S")
+        self.calls = []
+        self._lock = threading.Lock()
+        if self.path:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+
+    def record(self, kind, chapter, model, prompt_tokens, output_tokens, latency,
+               cache_hit=False, retries=0, **extra):
+        call = {
+            "run_id": self.run_id,
+            "timestamp": time.time(),
+            "kind": kind,
+            "chapter": chapter or "",
+            "model": model,
+            "prompt_tokens": prompt_tokens,
+            "output_tokens": output_tokens,
+            "latency": round(latency, 4),
+            "cache_hit": cache_hit,
+            "retries": retries,
+            **extra
+        }
+        with self._lock:
+            self.calls.append(call)
+            if self.path:
+                try:
+                    with open(self.path, "a", encoding="utf-8") as f:
+                        f.write(json.dumps(call) + "\n")
+                except OSError as e:
+                    logger.error(f"Failed to write AI metrics: {str(e)}")
+        return call
+
+    def _totals(self, calls):
+        return {
+            "calls": len(calls),
+            "cache_hits": sum(1 for c in calls if c["cache_hit"]),
+            "retries": sum(c["retries"] for c in calls),
+            "prompt_tokens": sum(c["prompt_tokens"] for c in calls),
+            "output_tokens": sum(c["output_tokens"] for c in calls),
+            "latency": round(sum(c["latency"] for c in calls), 3)
+        }
+
+    def chapter_summary(self, chapter):
+        """Totals for one chapter, for storing with its version metadata"""
+        with self._lock:
+            calls = [c for c in self.calls if c["chapter"] == chapter]
+        return self._totals(calls)
+
+    def run_summary(self):
+        with self._lock:
+            calls = list(self.calls)
+        return self._totals(calls)
+
+    def print_summary(self):
+        with self._lock:
+            calls = list(self.calls)
+        if not calls:
+            return
+
+        chapters = list(dict.fromkeys(c["chapter"] for c in calls))
+        rows = []
+        for chapter in chapters:
+            totals = self._totals([c for c in calls if c["chapter"] == chapter])
+            rows.append([chapter or "-"] + [totals[f] for f in SUMMARY_FIELDS])
+        totals = self._totals(calls)
+        rows.append(["TOTAL"] + [totals[f] for f in SUMMARY_FIELDS])
+
+        print("\nAI usage:")
+        print(format_table(["chapter"] + SUMMARY_FIELDS, rows))
+        if self.path:
+            print(f"Per-call metrics: {self.path}")
@@ -0,0 +1,261 @@
+import asyncio
+import json
+import time
+from config import Config
+from modules.version_db import BufferedVersionWriter
+from modules.workflow_state import WorkflowState
+from utils.helpers import format_table, percentile, unique_slugs
+from utils.logger import logger
+
+STAGES = ["scrape", "rewrite", "review", "human", "store"]
+
+
+def load_manifest(path):
+    """Load chapters from a JSON list or a plain text file of URLs"""
+    with open(path, encoding="utf-8") as f:
+        raw = f.read()
+
+    if path.endswith(".json"):
+        entries = json.loads(raw)
+    else:
+        entries = [line.strip() for line in raw.splitlines()
+                   if line.strip() and not line.strip().startswith("#")]
+
+    entries = [{"url": entry} if isinstance(entry, str) else entry for entry in entries]
+    # Names key checkpoints and versions, so a repeated one gets its position appended
+    names = unique_slugs(entry.get("chapter_name") or f"Chapter{i}" for i, entry in enumerate(entries, 1))
+    return [{"url": entry["url"], "chapter_name": name} for entry, name in zip(entries, names)]
+
+
+class BookPipeline:
+    """Run scrape -> rewrite -> review -> store for many chapters at once"""
+
+    def __init__(self, scraper, ai, db, interface=None, skip_human=False, regenerate=False,
+                 scrape_concurrency=None, ai_concurrency=None, store_concurrency=None,
+                 style_guidelines="Modernize language while preserving original tone",
+                 state=None, resume=False, review_queue=None):
+        self.scraper = scraper
+        self.ai = ai
+        self.db = db
+        self.interface = interface
+        self.skip_human = skip_human
+        self.regenerate = regenerate
+        self.style_guidelines = style_guidelines
+        # Checkpoints are always written; they are only read back when resuming
+        self.state = state or WorkflowState(":memory:")
+        self.resume = resume
+        # With a review queue, chapters wait there for reviewers instead of blocking the batch
+        self.review_queue = review_queue
+        self.concurrency = {
+            "scrape": scrape_concurrency or Config.BATCH_SCRAPE_CONCURRENCY,
+            "rewrite": ai_concurrency or Config.BATCH_AI_CONCURRENCY,
+            "review": ai_concurrency or Config.BATCH_AI_CONCURRENCY,
+            "human": 1,
+            "store": store_concurrency or Config.BATCH_STORE_CONCURRENCY
+        }
+
+    def run(self, chapters):
+        """Process every chapter and return per-chapter results"""
+        return asyncio.run(self.run_async(chapters))
+
+    async def run_async(self, chapters):
+        self._limits = {stage: asyncio.Semaphore(n) for stage, n in self.concurrency.items()}
+        # Versions from all chapters are embedded and written in batches
+        self.writer = BufferedVersionWriter(self.db)
+        started = time.perf_counter()
+
+        # One browser pool for the whole book, launched on first use
+        try:
+            results = await asyncio.gather(*[
+                self._process_chapter(chapter) for chapter in chapters
+            ])
+        finally:
+            await self.scraper.close()
+            await asyncio.to_thread(self.writer.close)
+
+        self.elapsed = time.perf_counter() - started
+        return results
+
+    async def _stage(self, result, stage, func, *args, **kwargs):
+        """Run a stage call under the stage's concurrency limit and time it"""
+        async with self._limits[stage]:
+            started = time.perf_counter()
+            try:
+                if asyncio.iscoroutinefunction(func):
+                    return await func(*args, **kwargs)
+                return await asyncio.to_thread(func, *args, **kwargs)
+            finally:
+                result["timings"][stage] = result["timings"].get(stage, 0.0) + (
+                    time.perf_counter() - started
+                )
+
+    async def _process_chapter(self, chapter):
+        name = chapter["chapter_name"]
+        result = {"chapter_name": name, "url": chapter["url"], "status": "pending", "timings": {}}
+        started = time.perf_counter()
+
+        checkpoint = self.state.checkpoint(name, chapter["url"], resume=self.resume)
+        if checkpoint.reached("done"):
+            # Finished in an earlier run: no browser, model or DB work at all
+            result.update({"status": "skipped", "version_id": checkpoint.data.get("version_id"), "latency": 0.0})
+            return result
+        if checkpoint.stage:
+            result["resumed_from"] = checkpoint.stage
+
+        try:
+            screenshot_task = None
+            if checkpoint.reached("scraped"):
+                chapter_data = await asyncio.to_thread(checkpoint.chapter_data, self.db.lineage.content)
+                if chapter_data is None:
+                    # The versions were still in the write buffer when the last run stopped
+                    logger.warning(f"Stored versions of {name} are missing, starting the chapter over")
+                    checkpoint = self.state.checkpoint(name, chapter["url"], resume=False)
+                    result.pop("resumed_from", None)
+            if not checkpoint.reached("scraped"):
+                scraped_data = await self._stage(result, "scrape", self.scraper.scrape_chapter_async,
+                                                 chapter["url"], name)
+                screenshot_task = scraped_data.get("screenshot_task")
+                chapter_data = {
+                    "chapter_name": name,
+                    "content": scraped_data["content"],
+                    "screenshot": scraped_data["screenshot"],
+                    "source_url": chapter["url"],
+                    "original_content": scraped_data["content"],
+                    "status": "scraped"
+                }
+                version_id = await self._store(result, chapter_data)
+                checkpoint.save("scraped", version_id=version_id, chapter_data=chapter_data)
+            original_content = chapter_data["original_content"]
+
+            if not checkpoint.reached("ai_rewritten"):
+                rewritten_content = await self._stage(result, "rewrite", self.ai.rewrite_chapter_async,
+                                                      original_content, self.style_guidelines,
+                                                      self.regenerate, chapter_name=name)
+                chapter_data.update({
+                    "content": rewritten_content,
+                    "status": "ai_rewritten",
+                    "author": "ai_writer",
+                    "ai_metrics": self.ai.metrics.chapter_summary(name)
+                })
+                version_id = await self._store(result, chapter_data)
+                checkpoint.save("ai_rewritten", version_id=version_id, chapter_data=chapter_data)
+
+            if not checkpoint.reached("ai_reviewed"):
+                ai_feedback = await self._stage(result, "review", self.ai.review_chapter_async,
+                                                chapter_data["content"], original_content,
+                                                self.regenerate, chapter_name=name)
+                chapter_data["ai_metrics"] = self.ai.metrics.chapter_summary(name)
+                checkpoint.save("ai_reviewed", chapter_data=chapter_data, ai_feedback=ai_feedback)
+            result["ai_feedback"] = checkpoint.data["ai_feedback"]
+            # Versions to fill the screenshot into, taken before "done" trims the checkpoint
+            stored = checkpoint.version_ids()
+
+            awaiting_review = not self.skip_human and self.review_queue is not None
+            if awaiting_review:
+                # Queued for reviewers below, once the screenshot path is known
+                result["version_id"] = self.db.version_id_for(chapter_data)
+            elif not self.skip_human and self.interface:
+                # The reviewer writes straight to the DB, so earlier versions must land first
+                await asyncio.to_thread(self.writer.flush)
+                result["version_id"] = await self._stage(
+                    result, "human", self.interface.start_review_session, chapter_data
+                )
+            else:
+                chapter_data.update({
+                    "status": "auto_approved",
+                    "human_feedback": "Skipped human review"
+                })
+                result["version_id"] = await self._stage(
+                    result, "store", self.writer.store_version, dict(chapter_data)
+                )
+            # A queued chapter is checkpointed as done once its review is submitted
+            if not awaiting_review:
+                checkpoint.save("done", version_id=result["version_id"])
+
+            stored.append(result["version_id"])
+            await self._attach_screenshot(result, screenshot_task, stored, checkpoint)
+            if awaiting_review:
+                chapter_data["screenshot"] = result.get("screenshot", chapter_data["screenshot"])
+                # Queueing is idempotent, so a resumed run does not queue the chapter twice
+                await self._stage(result, "human", self.review_queue.enqueue,
+                                  chapter_data, result["version_id"], result["ai_feedback"])
+            result["status"] = "awaiting_review" if awaiting_review else "done"
+        except Exception as e:
+            logger.error(f"Chapter {name} failed: {str(e)}")
+            if screenshot_task is not None and "screenshot" not in result:
+                # Keep the screenshot for the resumed run, which will not scrape again
+                try:
+                    await self._attach_screenshot(result, screenshot_task, checkpoint.version_ids(), checkpoint)
+                except Exception as attach_error:
+                    logger.error(f"Screenshot of {name} not recorded: {str(attach_error)}")
+            checkpoint.fail(str(e))
+            result.update({"status": "failed", "error": str(e)})
+
+        result["latency"] = time.perf_counter() - started
+        return result
+
+    async def _store(self, result, chapter_data):
+        """Queue a version for the batched writer and return its ID"""
+        return await self._stage(result, "store", self.writer.store_version, dict(chapter_data))
+
+    async def _attach_screenshot(self, result, task, version_ids, checkpoint):
+        """Fill the background screenshot path into the versions and checkpoint saved without it"""
+        if task is None:
+            return
+        path = await task
+        if not path:
+            return
+        result["screenshot"] = path
+        for version_id in dict.fromkeys(version_ids):
+            await self._stage(result, "store", self.writer.update_metadata, version_id, {"screenshot": path})
+        await asyncio.to_thread(checkpoint.update_chapter_data, screenshot=path)
+
+    def report(self, results):
+        """Print throughput and per-stage latency for a finished batch"""
+        done = [r for r in results if r["status"] in ("done", "awaiting_review")]
+        skipped = [r for r in results if r["status"] == "skipped"]
+        resumed = [r for r in results if "resumed_from" in r]
+        elapsed = getattr(self, "elapsed", 0.0) or 1e-9
+
+        print(f"\nProcessed {len(done)}/{len(results)} chapters in {elapsed:.1f}s "
+              f"({len(done) / elapsed:.2f} chapters/s)")
+        if skipped or resumed:
+            print(f"Skipped {len(skipped)} chapters finished earlier, resumed {len(resumed)} from a checkpoint")
+        queued = [r for r in results if r["status"] == "awaiting_review"]
+        if queued:
+            print(f"{len(queued)} chapters queued for human review (main.py review)")
+        results = [r for r in results if r["status"] != "skipped"]
+
+        rows = []
+        for stage in STAGES + ["total"]:
+            if stage == "total":
+                values = [r["latency"] for r in results]
+            else:
+                values = [r["timings"][stage] for r in results if stage in r["timings"]]
+            if values:
+                rows.append([
+                    stage,
+                    len(values),
+                    f"{sum(values) / len(values):.2f}",
+                    f"{percentile(values, 50):.2f}",
+                    f"{percentile(values, 99):.2f}",
+                    f"{max(values):.2f}"
+                ])
+        print(format_table(["stage", "count", "mean_s", "p50_s", "p99_s", "max_s"], rows))
+
+        print()
+        print(format_table(
+            ["chapter", "status", "latency_s"] + STAGES,
+            [[r["chapter_name"], r["status"], f"{r['latency']:.2f}"] +
+             [f"{r['timings'][s]:.2f}" if s in r["timings"] else "-" for s in STAGES]
+             for r in results]
+        ))
+
+        for r in results:
+            if r["status"] == "failed":
+                print(f"  {r['chapter_name']}: {r['error']}")
+
+        if getattr(self.scraper, "cache", None) is not None:
+            self.scraper.cache.log_stats()
+        if getattr(self.ai, "cache", None) is not None:
+            self.ai.cache.log_stats()
@@ -0,0 +1,80 @@
+import numpy as np
+
+# Column order of feature matrices and weight vectors
+WEIGHT_NAMES = ["content_relevance", "version_recency", "human_rating", "author_trust"]
+
+DEFAULT_WEIGHTS = {
+    "content_relevance": 1.0,
+    "version_recency": 0.8,
+    "human_rating": 1.2,
+    "author_trust": 0.9
+}
+
+
+def score_features(features, weights):
+    """Scores for an (n, 4) feature matrix.
+
+    Columns are relevance, recency and human rating, which are weighted and
+    summed, and a 0/1 human-editor flag whose rows are scaled by author_trust.
+    """
+    features = np.asarray(features, dtype=float).reshape(-1, 4)
+    linear = features[:, :3] @ weights[:3]
+    return np.where(features[:, 3] > 0, linear * weights[3], linear)
+
+
+def score_gradients(features, weights):
+    """d(score)/d(weights) for every row, shape (n, 4)"""
+    features = np.asarray(features, dtype=float).reshape(-1, 4)
+    editor = features[:, 3] > 0
+    grads = np.empty_like(features)
+    grads[:, :3] = features[:, :3] * np.where(editor, weights[3], 1.0)[:, None]
+    grads[:, 3] = np.where(editor, features[:, :3] @ weights[:3], 0.0)
+    return grads
+
+
+def _pairs(events):
+    """Stack (selected, other shown result) feature pairs from logged events"""
+    chosen, others = [], []
+    for event in events:
+        features = np.asarray(event["features"], dtype=float)
+        selected = event["shown"].index(event["selected"])
+        rest = np.delete(features, selected, axis=0)
+        chosen.append(np.repeat(features[selected:selected + 1], len(rest), axis=0))
+        others.append(rest)
+    if not chosen:
+        return np.empty((0, 4)), np.empty((0, 4))
+    return np.vstack(chosen), np.vstack(others)
+
+
+def train_weights(events, weights, learning_rate, l2=0.0, epochs=1):
+    """Mini-batch gradient descent on a pairwise logistic loss.
+
+    Every selection yields one pair per other result shown in the same
+    session; the loss is log(1 + exp(-(score(selected) - score(other)))).
+    Weights are kept non-negative.
+    """
+    weights = np.asarray(weights, dtype=float).copy()
+    chosen, others = _pairs(events)
+    if not len(chosen):
+        return weights
+
+    for _ in range(epochs):
+        margin = score_features(chosen, weights) - score_features(others, weights)
+        # d(loss)/d(margin) = -sigmoid(-margin)
+        coeff = -1 / (1 + np.exp(margin))
+        grad = (coeff[:, None] * (score_gradients(chosen, weights) - score_gradients(others, weights))).mean(axis=0)
+        weights = np.maximum(0.0, weights - learning_rate * (grad + l2 * weights))
+    return weights
+
+
+def mean_reciprocal_rank(events, weights):
+    """MRR and top-1 accuracy of the selected result under the given weights"""
+    ranks = []
+    for event in events:
+        scores = score_features(event["features"], weights)
+        selected = scores[event["shown"].index(event["selected"])]
+        ranks.append(1 + int(np.sum(scores > selected)))
+    if not ranks:
+        return 0.0, 0.0
+    ranks = np.asarray(ranks)
+    return float(np.mean(1 / ranks)), float(np.mean(ranks == 1))
@@ -0,0 +1,57 @@
+import asyncio
+import threading
+import time
+
+class TokenBucket:
+    """Refills at rate_per_minute, holds at most one minute of budget"""
+
+    def __init__(self, rate_per_minute):
+        self.capacity = float(rate_per_minute)
+        self.rate = rate_per_minute / 60.0
+        self.level = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self, amount):
+        """Take amount now (the level may go negative) and return the wait in seconds"""
+        self._refill()
+        self.level -= amount
+        return max(0.0, -self.level / self.rate)
+
+    def charge(self, amount):
+        """Charge extra usage that is only known after the call"""
+        self._refill()
+        self.level -= amount
+
+
+class RateLimiter:
+    """Requests-per-minute and tokens-per-minute quota shared by sync and async callers"""
+
+    def __init__(self, requests_per_minute, tokens_per_minute):
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+        self._lock = threading.Lock()
+
+    def _reserve(self, tokens):
+        with self._lock:
+            return max(self.requests.reserve(1), self.tokens.reserve(tokens))
+
+    def acquire(self, tokens=0):
+        wait = self._reserve(tokens)
+        if wait:
+            time.sleep(wait)
+        return wait
+
+    async def acquire_async(self, tokens=0):
+        wait = self._reserve(tokens)
+        if wait:
+            await asyncio.sleep(wait)
+        return wait
+
+    def record_usage(self, tokens):
+        with self._lock:
+            self.tokens.charge(tokens)
@@ -0,0 +1,104 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from config import Config
+from utils.logger import logger
+from utils.lru_cache import LRUCache
+
+class ResponseCache:
+    """Content-addressed cache of model responses: in-memory LRU over SQLite"""
+
+    def __init__(self, path=None, max_entries=None, memory_entries=None):
+        self.path = path or Config.AI_CACHE_PATH
+        self.max_entries = max_entries or Config.AI_CACHE_MAX_ENTRIES
+        self.memory_entries = memory_entries or Config.AI_CACHE_MEMORY_ENTRIES
+        self.stats = {"hits": 0, "memory_hits": 0, "misses": 0, "stores": 0, "evictions": 0}
+        self._memory = LRUCache(self.memory_entries)
+        self._lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                model TEXT,
+                response TEXT,
+                created_at REAL,
+                last_access REAL
+            )
+        """)
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_responses_access ON responses(last_access)"
+        )
+        self._conn.commit()
+
+    @staticmethod
+    def make_key(model_name, prompt, generation_config):
+        """Hash of everything that determines the model's output"""
+        payload = json.dumps([model_name, prompt, generation_config or {}], sort_keys=True)
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    def get(self, key):
+        with self._lock:
+            cached = self._memory.get(key)
+            if cached is not None:
+                self.stats["hits"] += 1
+                self.stats["memory_hits"] += 1
+                return cached
+
+            row = self._conn.execute(
+                "SELECT response FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                self.stats["misses"] += 1
+                return None
+
+            self._conn.execute(
+                "UPDATE responses SET last_access = ? WHERE key = ?", (time.time(), key)
+            )
+            self._conn.commit()
+            self._memory.put(key, row[0])
+            self.stats["hits"] += 1
+            return row[0]
+
+    def put(self, key, response, model_name=""):
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, model, response, created_at, last_access) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (key, model_name, response, now, now)
+            )
+            self._memory.put(key, response)
+            self.stats["stores"] += 1
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        """Drop least recently used rows once the table is over max_entries"""
+        count = self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+        excess = count - self.max_entries
+        if excess <= 0:
+            return
+        keys = [row[0] for row in self._conn.execute(
+            "SELECT key FROM responses ORDER BY last_access LIMIT ?", (excess,)
+        )]
+        self._conn.executemany("DELETE FROM responses WHERE key = ?", [(k,) for k in keys])
+        for key in keys:
+            self._memory.pop(key)
+        self.stats["evictions"] += len(keys)
+
+    def log_stats(self):
+        lookups = self.stats["hits"] + self.stats["misses"]
+        logger.info(
+            f"LLM response cache: {self.stats['hits']}/{lookups} hits "
+            f"({self.stats['memory_hits']} from memory), {self.stats['evictions']} evictions"
+        )
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,186 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from config import Config
+
+REVIEW_FIELDS = ["id", "chapter", "version_id", "chapter_data", "ai_feedback", "status", "reviewer", "lease_until",
+                 "edits"]
+
+
+class ReviewQueue:
+    """Chapters waiting for human review, shared by the pipeline and every reviewer.
+
+    Reviewers claim one chapter at a time under a lease, so several editors
+    work through the queue in parallel without picking the same chapter, and
+    a chapter left open in a closed browser tab goes back to the queue.
+    """
+
+    def __init__(self, path=None, lease_seconds=None):
+        self.path = path or Config.REVIEW_QUEUE_PATH
+        self.lease_seconds = lease_seconds or Config.REVIEW_LEASE_SECONDS
+        # One connection shared by the review server's request threads
+        self._lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS reviews (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                chapter TEXT NOT NULL,
+                version_id TEXT UNIQUE,
+                chapter_data TEXT NOT NULL,
+                ai_feedback TEXT,
+                status TEXT NOT NULL DEFAULT 'pending',
+                reviewer TEXT,
+                lease_until REAL,
+                decision TEXT,
+                result_version_id TEXT,
+                enqueued_at REAL,
+                finished_at REAL,
+                edits TEXT
+            );
+            CREATE INDEX IF NOT EXISTS reviews_claim ON reviews (status, id);
+        """)
+
+    def enqueue(self, chapter_data, version_id, ai_feedback=""):
+        """Queue an AI-finished version for review; a version already queued is not added again"""
+        with self._lock:
+            cursor = self._conn.execute(
+                "INSERT OR IGNORE INTO reviews (chapter, version_id, chapter_data, ai_feedback, enqueued_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (chapter_data["chapter_name"], version_id, json.dumps(chapter_data), ai_feedback or "", time.time())
+            )
+        return cursor.lastrowid if cursor.rowcount else None
+
+    def claim(self, reviewer):
+        """Lease the oldest unclaimed review (or one whose lease ran out) to a reviewer"""
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute(
+                    "SELECT id FROM reviews WHERE status = 'pending' "
+                    "OR (status = 'claimed' AND lease_until < ?) ORDER BY id LIMIT 1",
+                    (now,)
+                ).fetchone()
+                if row:
+                    self._conn.execute(
+                        "UPDATE reviews SET status = 'claimed', reviewer = ?, lease_until = ? WHERE id = ?",
+                        (reviewer, now + self.lease_seconds, row[0])
+                    )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return self.get(row[0]) if row else None
+
+    def get(self, review_id):
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT {', '.join(REVIEW_FIELDS)} FROM reviews WHERE id = ?", (review_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        review = dict(zip(REVIEW_FIELDS, row))
+        review["chapter_data"] = json.loads(review["chapter_data"])
+        review["edits"] = [tuple(edit) for edit in json.loads(review["edits"] or "[]")]
+        return review
+
+    def holds(self, review_id, reviewer):
+        """Whether reviewer still holds an unexpired claim on a review"""
+        with self._lock:
+            return self._conn.execute(
+                "SELECT 1 FROM reviews WHERE id = ? AND status = 'claimed' AND reviewer = ? AND lease_until >= ?",
+                (review_id, reviewer, time.time())
+            ).fetchone() is not None
+
+    def renew(self, review_id, reviewer):
+        """Restart reviewer's lease if they still hold an unexpired claim; False if they do not"""
+        now = time.time()
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE reviews SET lease_until = ? "
+                "WHERE id = ? AND reviewer = ? AND status = 'claimed' AND lease_until >= ?",
+                (now + self.lease_seconds, review_id, reviewer, now)
+            )
+        return cursor.rowcount > 0
+
+    def save_edit(self, review_id, reviewer, start, end, text):
+        """Keep a draft edit of AI-version lines start:end until the review is submitted.
+
+        Drafts replace any earlier draft of the same range; text None drops it.
+        """
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute(
+                    "SELECT edits FROM reviews WHERE id = ? AND reviewer = ? AND status = 'claimed'",
+                    (review_id, reviewer)
+                ).fetchone()
+                if row is None:
+                    raise KeyError(f"Review {review_id} is not claimed by {reviewer}")
+                edits = [e for e in json.loads(row[0] or "[]") if e[1] <= start or e[0] >= end]
+                if text is not None:
+                    edits.append([start, end, text])
+                self._conn.execute(
+                    "UPDATE reviews SET edits = ? WHERE id = ?", (json.dumps(sorted(edits)), review_id)
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def complete(self, review_id, reviewer, decision, result_version_id):
+        """Close a review; the chapter text is dropped since the reviewed version is in the DB.
+
+        Raises KeyError unless reviewer still holds an unexpired claim on it.
+        """
+        now = time.time()
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE reviews SET status = 'done', decision = ?, result_version_id = ?, "
+                "finished_at = ?, lease_until = NULL, chapter_data = '{}', edits = NULL "
+                "WHERE id = ? AND reviewer = ? AND status = 'claimed' AND lease_until >= ?",
+                (json.dumps(decision), result_version_id, now, review_id, reviewer, now)
+            )
+        if cursor.rowcount == 0:
+            raise KeyError(f"Review {review_id} is not claimed by {reviewer}")
+
+    def release(self, review_id, reviewer):
+        """Give a claimed review back to the queue"""
+        with self._lock:
+            self._conn.execute(
+                "UPDATE reviews SET status = 'pending', reviewer = NULL, lease_until = NULL "
+                "WHERE id = ? AND reviewer = ? AND status = 'claimed'",
+                (review_id, reviewer)
+            )
+
+    def open_reviews(self, limit=100):
+        """Pending and claimed reviews, oldest first, without their chapter text"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id, chapter, status, reviewer, enqueued_at FROM reviews "
+                "WHERE status != 'done' ORDER BY id LIMIT ?",
+                (limit,)
+            ).fetchall()
+        return [dict(zip(["id", "chapter", "status", "reviewer", "enqueued_at"], row)) for row in rows]
+
+    def stats(self):
+        with self._lock:
+            counts = dict(self._conn.execute("SELECT status, COUNT(*) FROM reviews GROUP BY status").fetchall())
+            reviewers = self._conn.execute(
+                "SELECT reviewer, COUNT(*) FROM reviews WHERE status = 'done' GROUP BY reviewer"
+            ).fetchall()
+        return {
+            "pending": counts.get("pending", 0),
+            "claimed": counts.get("claimed", 0),
+            "done": counts.get("done", 0),
+            "by_reviewer": dict(reviewers)
+        }
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
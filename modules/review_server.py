@@ -0,0 +1,230 @@
+import html
+import json
+import re
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, quote, urlparse
+from config import Config
+from utils.logger import logger
+from utils.lru_cache import LRUCache
+from utils.text_delta import diff_rows, page_rows, replace_lines, word_diff
+
+PAGE = """<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>{title}</title>
+<style>
+body {{ font-family: sans-serif; margin: 2em auto; max-width: 72em; }}
+table {{ border-collapse: collapse; }} td, th {{ padding: 0.2em 1em; text-align: left; vertical-align: top; }}
+table.diff {{ width: 100%; table-layout: fixed; }} table.diff td.no {{ width: 3em; color: #888; }}
+table.diff tr.skip td {{ color: #888; text-align: center; }}
+del {{ background: #fdd; }} ins {{ background: #dfd; text-decoration: none; }}
+textarea {{ width: 100%; font-family: serif; font-size: 1em; }}
+pre {{ white-space: pre-wrap; background: #f6f6f6; padding: 1em; }}
+.message {{ background: #eef6ee; padding: 0.5em 1em; }}
+</style></head>
+<body>{body}</body></html>"""
+
+
+def render(title, body):
+    return PAGE.format(title=html.escape(title), body=body).encode("utf-8")
+
+
+class ReviewHandler(BaseHTTPRequestHandler):
+    """Pages of the review web UI; the server carries the queue, interface and workflow state"""
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        params = {k: v[0] for k, v in parse_qs(url.query).items()}
+        reviewer = params.get("reviewer", "")
+        match = re.fullmatch(r"/review/(\d+)", url.path)
+        if url.path == "/":
+            self._send(200, self._index_page(reviewer, params.get("message", "")))
+        elif url.path == "/api/stats":
+            self._send(200, json.dumps(self.server.queue.stats()).encode(), "application/json")
+        elif match:
+            review = self.server.queue.get(int(match.group(1)))
+            if review is None or not self.server.queue.holds(review["id"], reviewer):
+                return self._redirect("/", reviewer, "That chapter is not claimed by you (the claim may have expired)")
+            page = int(params["page"]) if params.get("page", "").isdigit() else 1
+            self._send(200, self._review_page(review, reviewer, page, params.get("message", "")))
+        else:
+            self._send(404, render("Not found", "<p>Not found</p>"))
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        length = int(self.headers.get("Content-Length", 0))
+        form = {k: v[0] for k, v in parse_qs(self.rfile.read(length).decode("utf-8"), keep_blank_values=True).items()}
+        reviewer = form.get("reviewer", "").strip()
+        if not reviewer:
+            return self._redirect("/", "", "Enter your name first")
+
+        queue = self.server.queue
+        if url.path == "/claim":
+            review = queue.claim(reviewer)
+            if review is None:
+                return self._redirect("/", reviewer, "No chapters waiting for review")
+            return self._redirect(f"/review/{review['id']}", reviewer)
+
+        match = re.fullmatch(r"/review/(\d+)", url.path)
+        if not match:
+            return self._send(404, render("Not found", "<p>Not found</p>"))
+        review = queue.get(int(match.group(1)))
+        if review is None or not queue.holds(review["id"], reviewer):
+            return self._redirect("/", reviewer, "That chapter is not claimed by you (the claim may have expired)")
+
+        if form.get("action") == "release":
+            queue.release(review["id"], reviewer)
+            return self._redirect("/", reviewer, f"{review['chapter']} returned to the queue")
+
+        content = review["chapter_data"]["content"]
+        if form.get("action") in ("save_page", "discard_page"):
+            start, end = form.get("start", ""), form.get("end", "")
+            if not (start.isdigit() and end.isdigit()):
+                return self._send(400, render("Bad request", "<p>Missing or invalid line range</p>"))
+            start, end = int(start), int(end)
+            if not start <= end <= len(content.splitlines()):
+                return self._send(400, render("Bad request", "<p>Line range outside the chapter</p>"))
+            text = form.get("content", "").replace("\r\n", "\n")
+            unchanged = text.strip() == "".join(content.splitlines(keepends=True)[start:end]).strip()
+            keep = form["action"] == "save_page" and not unchanged
+            queue.save_edit(review["id"], reviewer, start, end, text if keep else None)
+            message = f"Saved edits to lines {start + 1}-{end}" if keep else f"No edits kept for lines {start + 1}-{end}"
+            return self._redirect(f"/review/{review['id']}", reviewer, message, page=form.get("page", "1"))
+
+        # Page drafts are applied to the AI version; the stored review keeps only a patch
+        edited = replace_lines(content, review["edits"])
+        needs_edit = edited != content
+        feedback = {
+            "rating": form.get("rating", ""),
+            "general_feedback": form.get("comments", ""),
+            "needs_edit": needs_edit,
+            "reviewer": reviewer,
+            "timestamp": datetime.now().isoformat()
+        }
+        if needs_edit:
+            feedback["edits"] = edited
+        try:
+            version_id = self.server.interface.complete_review(queue, review, feedback, self.server.state)
+        except KeyError:
+            return self._redirect("/", reviewer, "That chapter is not claimed by you (the claim may have expired)")
+        except Exception as e:
+            return self._send(500, render("Review failed", f"<p>Storing the review failed: {html.escape(str(e))}</p>"))
+        self._redirect("/", reviewer, f"{review['chapter']} reviewed as {version_id}")
+
+    def _index_page(self, reviewer, message):
+        stats = self.server.queue.stats()
+        rows = "".join(
+            f"<tr><td>{r['id']}</td><td>{html.escape(r['chapter'])}</td><td>{r['status']}</td>"
+            f"<td>{html.escape(r['reviewer'] or '')}</td></tr>"
+            for r in self.server.queue.open_reviews()
+        )
+        body = (
+            "<h1>Review queue</h1>"
+            + (f"<p class='message'>{html.escape(message)}</p>" if message else "")
+            + f"<p>{stats['pending']} waiting, {stats['claimed']} in review, {stats['done']} reviewed</p>"
+            + "<form method='post' action='/claim'>"
+            + f"<input name='reviewer' placeholder='Your name' value='{html.escape(reviewer, quote=True)}' required> "
+            + "<button>Review next chapter</button></form>"
+            + "<table><tr><th>#</th><th>chapter</th><th>status</th><th>reviewer</th></tr>" + rows + "</table>"
+        )
+        return render("Review queue", body)
+
+    def _review_page(self, review, reviewer, page, message):
+        """One page of the side-by-side diff, an editor for the AI lines it covers, and the review form"""
+        chapter_data = review["chapter_data"]
+        content = chapter_data["content"]
+        rows = self.server.diff_cache.get(review["id"])
+        if rows is None:
+            rows = diff_rows(chapter_data["original_content"], content, context=Config.REVIEW_DIFF_CONTEXT)
+            self.server.diff_cache.put(review["id"], rows)
+        lines = content.splitlines(keepends=True)
+        shown, page, pages, (start, end) = page_rows(rows, page, Config.REVIEW_PAGE_ROWS, len(lines))
+
+        drafts = {(s, e): text for s, e, text in review["edits"]}
+        draft = drafts.get((start, end))
+        base = f"/review/{review['id']}?reviewer={quote(reviewer)}"
+        pager = " ".join(
+            f"<b>{n}</b>" if n == page else f"<a href='{base}&page={n}'>{n}</a>" for n in range(1, pages + 1)
+        )
+        reviewer_field = f"<input type='hidden' name='reviewer' value='{html.escape(reviewer, quote=True)}'>"
+        ratings = "".join(
+            f"<label><input type='radio' name='rating' value='{n}'{' checked' if n == 3 else ''}> {n}</label> "
+            for n in range(1, 6)
+        )
+        body = (
+            f"<h1>{html.escape(review['chapter'])}</h1>"
+            + (f"<p class='message'>{html.escape(message)}</p>" if message else "")
+            + f"<p><a href='/?reviewer={quote(reviewer)}'>Back to the queue</a></p>"
+            + "<h2>AI reviewer feedback</h2>"
+            + f"<pre>{html.escape(review['ai_feedback'] or '')}</pre>"
+            + f"<h2>Original vs rewritten, page {page} of {pages}</h2><p>Pages: {pager}</p>"
+            + "<table class='diff'>" + "".join(self._diff_row(row) for row in shown) + "</table>"
+            + f"<form method='post' action='/review/{review['id']}'>{reviewer_field}"
+            + f"<input type='hidden' name='start' value='{start}'><input type='hidden' name='end' value='{end}'>"
+            + f"<input type='hidden' name='page' value='{page}'>"
+            + f"<h3>Edit rewritten lines {start + 1}-{end}{' (draft saved)' if draft is not None else ''}</h3>"
+            # Browsers drop a newline right after <textarea>, which would eat a leading blank line
+            + f"<textarea name='content' rows='{min(30, max(4, end - start + 2))}'>\n"
+            + html.escape(draft if draft is not None else "".join(lines[start:end])) + "</textarea>"
+            + "<p><button name='action' value='save_page'>Save page edits</button> "
+            + "<button name='action' value='discard_page'>Discard page edits</button></p></form>"
+            + f"<h2>Decision</h2><p>{len(drafts)} pages edited.</p>"
+            + f"<form method='post' action='/review/{review['id']}'>{reviewer_field}"
+            + f"<p>Rating: {ratings}</p>"
+            + "<p><textarea name='comments' rows='3' placeholder='Comments'></textarea></p>"
+            + "<button name='action' value='submit'>Submit review</button> "
+            + "<button name='action' value='release'>Return to queue</button>"
+            + "</form>"
+        )
+        return render(f"Review {review['chapter']}", body)
+
+    def _diff_row(self, row):
+        if row["tag"] == "skip":
+            return f"<tr class='skip'><td colspan='4'>... {row['count']} unchanged lines ...</td></tr>"
+        old, new = html.escape(row["old"] or ""), html.escape(row["new"] or "")
+        if row["tag"] == "replace":
+            segments = word_diff(row["old"], row["new"])
+            old = "".join(f"<del>{html.escape(t)}</del>" if tag == "delete" else html.escape(t)
+                          for tag, t in segments if tag != "insert")
+            new = "".join(f"<ins>{html.escape(t)}</ins>" if tag == "insert" else html.escape(t)
+                          for tag, t in segments if tag != "delete")
+        elif row["tag"] == "delete":
+            old = f"<del>{old}</del>"
+        elif row["tag"] == "insert":
+            new = f"<ins>{new}</ins>"
+        old_no = row["old_no"] + 1 if row["old"] is not None else ""
+        new_no = row["new_no"] + 1 if row["new"] is not None else ""
+        return f"<tr><td class='no'>{old_no}</td><td>{old}</td><td class='no'>{new_no}</td><td>{new}</td></tr>"
+
+    def _redirect(self, path, reviewer, message="", page=None):
+        query = f"?reviewer={quote(reviewer)}" + (f"&message={quote(message)}" if message else "")
+        query += f"&page={quote(str(page))}" if page else ""
+        self.send_response(303)
+        self.send_header("Location", path + query)
+        self.end_headers()
+
+    def _send(self, status, body, content_type="text/html; charset=utf-8"):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        logger.debug(f"Review server: {format % args}")
+
+
+def serve_reviews(queue, interface, state=None, host="127.0.0.1", port=8080):
+    """Serve the review queue to reviewers' browsers until interrupted"""
+    server = ThreadingHTTPServer((host, port), ReviewHandler)
+    server.queue = queue
+    server.interface = interface
+    server.state = state
+    # Diff rows per review, so paging through a chapter diffs it once
+    server.diff_cache = LRUCache(32)
+    logger.info(f"Review server on http://{host}:{port}/")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
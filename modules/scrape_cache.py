@@ -0,0 +1,144 @@
+import os
+import sqlite3
+import threading
+import time
+from config import Config
+from utils.logger import logger
+
+class ScrapeCache:
+    """On-disk cache of scraped chapters keyed by URL, with HTTP validators"""
+
+    def __init__(self, path=None, ttl=None, max_entries=None, max_bytes=None):
+        self.path = path or Config.SCRAPE_CACHE_PATH
+        self.ttl = ttl if ttl is not None else Config.SCRAPE_CACHE_TTL
+        self.max_entries = max_entries or Config.SCRAPE_CACHE_MAX_ENTRIES
+        self.max_bytes = max_bytes or Config.SCRAPE_CACHE_MAX_BYTES
+        self.stats = {"hits": 0, "misses": 0, "revalidated": 0, "stores": 0, "evictions": 0}
+        self._lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS scrape_cache (
+                url TEXT PRIMARY KEY,
+                etag TEXT,
+                last_modified TEXT,
+                body_hash TEXT,
+                content TEXT,
+                screenshot TEXT,
+                size INTEGER,
+                fetched_at REAL,
+                last_access REAL
+            )
+        """)
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_scrape_cache_access ON scrape_cache(last_access)"
+        )
+        self._conn.commit()
+
+    def get(self, url):
+        """Return the cached entry for url, dropping it if past its TTL"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT url, etag, last_modified, body_hash, content, screenshot, fetched_at "
+                "FROM scrape_cache WHERE url = ?", (url,)
+            ).fetchone()
+            if row is None:
+                return None
+            if self.ttl and time.time() - row[6] > self.ttl:
+                self._conn.execute("DELETE FROM scrape_cache WHERE url = ?", (url,))
+                self._conn.commit()
+                self.stats["evictions"] += 1
+                return None
+            return dict(zip(
+                ["url", "etag", "last_modified", "body_hash", "content", "screenshot", "fetched_at"], row
+            ))
+
+    def record_hit(self, url, validators=None, revalidated=False):
+        """Count a hit and refresh the entry's access time (and validators)"""
+        now = time.time()
+        with self._lock:
+            self.stats["hits"] += 1
+            if revalidated:
+                self.stats["revalidated"] += 1
+            if validators:
+                self._conn.execute(
+                    "UPDATE scrape_cache SET etag = ?, last_modified = ?, body_hash = ?, "
+                    "fetched_at = ?, last_access = ? WHERE url = ?",
+                    (validators.get("etag"), validators.get("last_modified"),
+                     validators.get("body_hash"), now, now, url)
+                )
+            else:
+                self._conn.execute(
+                    "UPDATE scrape_cache SET fetched_at = ?, last_access = ? WHERE url = ?",
+                    (now, now, url)
+                )
+            self._conn.commit()
+
+    def record_miss(self):
+        with self._lock:
+            self.stats["misses"] += 1
+
+    def put(self, url, content, screenshot="", validators=None):
+        """Store a freshly scraped chapter and evict down to the size limits"""
+        validators = validators or {}
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO scrape_cache "
+                "(url, etag, last_modified, body_hash, content, screenshot, size, fetched_at, last_access) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (url, validators.get("etag"), validators.get("last_modified"),
+                 validators.get("body_hash", ""), content, screenshot or "",
+                 len(content.encode()), now, now)
+            )
+            self.stats["stores"] += 1
+            self._evict()
+            self._conn.commit()
+
+    def set_screenshot(self, url, screenshot):
+        with self._lock:
+            self._conn.execute(
+                "UPDATE scrape_cache SET screenshot = ? WHERE url = ?", (screenshot or "", url)
+            )
+            self._conn.commit()
+
+    def _evict(self):
+        """Drop expired entries, then least recently used ones over the limits"""
+        if self.ttl:
+            cursor = self._conn.execute(
+                "DELETE FROM scrape_cache WHERE fetched_at < ?", (time.time() - self.ttl,)
+            )
+            self.stats["evictions"] += cursor.rowcount
+
+        count, total = self._conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM scrape_cache"
+        ).fetchone()
+        if count <= self.max_entries and total <= self.max_bytes:
+            return
+
+        for url, size in self._conn.execute(
+            "SELECT url, size FROM scrape_cache ORDER BY last_access"
+        ).fetchall():
+            if count <= self.max_entries and total <= self.max_bytes:
+                break
+            self._conn.execute("DELETE FROM scrape_cache WHERE url = ?", (url,))
+            count -= 1
+            total -= size
+            self.stats["evictions"] += 1
+
+    def hit_rate(self):
+        lookups = self.stats["hits"] + self.stats["misses"]
+        return self.stats["hits"] / lookups if lookups else 0.0
+
+    def log_stats(self):
+        logger.info(
+            f"Scrape cache: {self.stats['hits']} hits ({self.stats['revalidated']} via 304), "
+            f"{self.stats['misses']} misses, {self.stats['evictions']} evictions, "
+            f"hit rate {self.hit_rate():.0%}"
+        )
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
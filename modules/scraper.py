@@ -1,62 +1,484 @@
-from playwright.sync_api import sync_playwright
+import asyncio
+import hashlib
+import importlib.util
+import io
 import os
+import threading
+import urllib.error
+import urllib.request
 from datetime import datetime
+from urllib.parse import urljoin, urlparse
 from config import Config
+from modules.scrape_cache import ScrapeCache
+from utils.helpers import unique_slugs
+from utils.html_text import extract_text
 from utils.logger import logger
 
+async def _filter_request(route):
+    """Abort requests that the text extraction never needs"""
+    request = route.request
+    host = urlparse(request.url).netloc
+    if (request.resource_type in Config.SCRAPER_BLOCKED_RESOURCES or
+            any(host == h or host.endswith("." + h) for h in Config.SCRAPER_BLOCKED_HOSTS)):
+        await route.abort()
+    else:
+        await route.continue_()
+
+class BrowserPool:
+    """Long-lived Chromium with a fixed pool of recyclable browser contexts"""
+
+    def __init__(self, size, recycle_after, headless=True, block_resources=True):
+        self.size = size
+        self.recycle_after = recycle_after
+        self.headless = headless
+        self.block_resources = block_resources
+        self.browser = None
+        self._playwright = None
+        self._idle = None
+
+    async def start(self):
+        from playwright.async_api import async_playwright
+        self._playwright = await async_playwright().start()
+        self.browser = await self._playwright.chromium.launch(headless=self.headless)
+        self._idle = asyncio.Queue()
+        for _ in range(self.size):
+            await self._idle.put(await self._new_slot())
+        logger.info(f"Browser pool started with {self.size} contexts")
+
+    async def close(self):
+        if self._idle is not None:
+            while not self._idle.empty():
+                slot = self._idle.get_nowait()
+                await self._close_slot(slot)
+        if self.browser is not None:
+            await self.browser.close()
+        if self._playwright is not None:
+            await self._playwright.stop()
+        self.browser = self._playwright = self._idle = None
+
+    async def _new_slot(self):
+        context = await self.browser.new_context()
+        if self.block_resources:
+            await context.route("**/*", _filter_request)
+        return {"context": context, "pages_served": 0}
+
+    async def _close_slot(self, slot):
+        try:
+            await slot["context"].close()
+        except Exception as e:
+            logger.error(f"Closing browser context failed: {str(e)}")
+
+    async def acquire(self):
+        """Wait for a free context and open a fresh page in it"""
+        slot = await self._idle.get()
+        try:
+            slot["page"] = await slot["context"].new_page()
+        except Exception:
+            # The context died underneath us - replace it
+            await self._close_slot(slot)
+            slot = await self._new_slot()
+            slot["page"] = await slot["context"].new_page()
+        return slot
+
+    async def release(self, slot, healthy=True):
+        """Close the page and return the context, recycling it when worn out"""
+        page = slot.pop("page", None)
+        slot["pages_served"] += 1
+        try:
+            if page is not None:
+                await page.close()
+        except Exception:
+            healthy = False
+
+        if not healthy or slot["pages_served"] >= self.recycle_after:
+            await self._close_slot(slot)
+            slot = await self._new_slot()
+        await self._idle.put(slot)
+
+
 class ChapterScraper:
-    def __init__(self):
+    CONTENT_SELECTORS = [
+        "#content",
+        ".chapter",
+        "div.mw-parser-output",
+        "article"
+    ]
+
+    def __init__(self, pool_size=None, per_host_limit=None, recycle_after=None, fetch_mode=None,
+                 use_cache=None):
         os.makedirs(Config.SCREENSHOT_DIR, exist_ok=True)
-        
+        self.pool_size = pool_size or Config.SCRAPER_POOL_SIZE
+        self.per_host_limit = per_host_limit or Config.SCRAPER_PER_HOST_LIMIT
+        self.recycle_after = recycle_after or Config.SCRAPER_RECYCLE_AFTER
+        self.fetch_mode = fetch_mode or Config.SCRAPER_FETCH_MODE
+        use_cache = Config.SCRAPE_CACHE_ENABLED if use_cache is None else use_cache
+        self.cache = ScrapeCache() if use_cache else None
+        self.pool = None
+        self._host_limits = {}
+        self._start_lock = None
+        self._background = set()
+
+    async def start(self):
+        """Launch the browser pool (idempotent)"""
+        if self._start_lock is None:
+            self._start_lock = asyncio.Lock()
+        async with self._start_lock:
+            if self.pool is None:
+                pool = BrowserPool(self.pool_size, self.recycle_after, Config.HEADLESS,
+                                   Config.SCRAPER_BLOCK_RESOURCES)
+                await pool.start()
+                self.pool = pool
+        return self
+
+    async def close(self):
+        if self._background:
+            await asyncio.gather(*self._background, return_exceptions=True)
+        if self.pool is not None:
+            await self.pool.close()
+        self.pool = None
+        self._host_limits = {}
+        self._start_lock = None
+
+    async def __aenter__(self):
+        return await self.start()
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
     def scrape_chapter(self, url, chapter_name):
-        """Scrape chapter content and take screenshot"""
-        try:
-            with sync_playwright() as p:
-                browser = p.chromium.launch(headless=Config.HEADLESS)
-                page = browser.new_page()
-                
-                logger.info(f"Scraping chapter from {url}")
-                page.goto(url, timeout=10000)
-                
-                # Extract content
-                content = self._extract_content(page)
-                
-                # Take screenshot
-                screenshot_path = self._take_screenshot(page, chapter_name)
-                
-                browser.close()
-                
-                return {
-                    "content": content,
-                    "screenshot": screenshot_path,
-                    "timestamp": datetime.now().isoformat(),
-                    "source_url": url
-                }
-                
+        """Scrape a single chapter with a short-lived browser.
+
+        Returns as soon as the text is extracted. The screenshot is finished
+        on a background thread: result["screenshot_task"] is a
+        concurrent.futures.Future for its path, and the browser is closed
+        once it resolves.
+        """
+        loop = asyncio.new_event_loop()
+        threading.Thread(target=self._run_loop, args=(loop,), daemon=True).start()
+        scraper = self._one_shot()
+        task = None
+        try:
+            result = asyncio.run_coroutine_threadsafe(scraper.scrape_chapter_async(url, chapter_name), loop).result()
+            task = result.get("screenshot_task")
+        finally:
+            finished = asyncio.run_coroutine_threadsafe(self._finish_once(scraper, task), loop)
+            finished.add_done_callback(lambda _: loop.call_soon_threadsafe(loop.stop))
+        result["screenshot_task"] = finished
+        return result
+
+    def scrape_toc(self, url):
+        """Collect chapter links from a table of contents page"""
+        return asyncio.run(self._run_once(url))
+
+    def _one_shot(self):
+        # The browser is only launched if the call actually needs it
+        scraper = ChapterScraper(1, self.per_host_limit, self.recycle_after, self.fetch_mode,
+                                 use_cache=False)
+        scraper.cache = self.cache
+        return scraper
+
+    async def _run_once(self, url):
+        scraper = self._one_shot()
+        try:
+            return await scraper.scrape_toc_async(url)
+        finally:
+            await scraper.close()
+
+    @staticmethod
+    async def _finish_once(scraper, task):
+        """Wait for a background screenshot, then close the short-lived browser"""
+        try:
+            return await task if task is not None else ""
+        finally:
+            await scraper.close()
+
+    @staticmethod
+    def _run_loop(loop):
+        asyncio.set_event_loop(loop)
+        try:
+            loop.run_forever()
+        finally:
+            loop.close()
+
+    def _host_limit(self, url):
+        host = urlparse(url).netloc
+        if host not in self._host_limits:
+            self._host_limits[host] = asyncio.Semaphore(self.per_host_limit)
+        return self._host_limits[host]
+
+    async def _with_page(self, url, work, background=None):
+        """Borrow a pooled page, navigate to url and run work(page, response).
+
+        work is also given the navigation response (None for same-document
+        navigations). If background is given it runs on the same page after
+        work returns, as a task that also hands the page back to the pool.
+        Returns (work result, background task or None).
+        """
+        await self.start()
+        async with self._host_limit(url):
+            slot = await self.pool.acquire()
+            try:
+                response = await slot["page"].goto(url, timeout=10000)
+                result = await work(slot["page"], response)
+            except Exception:
+                await self.pool.release(slot, healthy=False)
+                raise
+
+        if background is None:
+            await self.pool.release(slot)
+            return result, None
+
+        task = asyncio.create_task(self._run_background(slot, background))
+        self._background.add(task)
+        task.add_done_callback(self._background.discard)
+        return result, task
+
+    async def _run_background(self, slot, background):
+        healthy = True
+        try:
+            return await background(slot["page"])
+        except Exception as e:
+            healthy = False
+            logger.error(f"Background page task failed: {str(e)}")
+            return ""
+        finally:
+            await self.pool.release(slot, healthy)
+
+    async def scrape_chapter_async(self, url, chapter_name):
+        """Scrape chapter content and take screenshot using the shared pool"""
+        try:
+            logger.info(f"Scraping chapter from {url}")
+
+            validators, html = {}, None
+            if self.cache is not None:
+                entry, validators, html = await asyncio.to_thread(self._revalidate, url)
+                if entry is not None:
+                    logger.info(f"Source unchanged, using cached chapter for {url}")
+                    return {
+                        "content": entry["content"],
+                        "screenshot": entry["screenshot"],
+                        "screenshot_task": None,
+                        "timestamp": datetime.now().isoformat(),
+                        "source_url": url,
+                        "cached": True
+                    }
+
+            if self.fetch_mode == "http":
+                content, validators = await asyncio.to_thread(self._scrape_http, url, html, validators)
+                if content:
+                    self._cache_put(url, content, validators, None)
+                    return {
+                        "content": content,
+                        "screenshot": "",
+                        "screenshot_task": None,
+                        "timestamp": datetime.now().isoformat(),
+                        "source_url": url
+                    }
+                logger.info(f"No content found over plain HTTP for {url}, falling back to the browser")
+
+            async def extract(page, response):
+                # Validators come from the document the browser loaded, so the
+                # cached entry describes exactly what was extracted
+                return await self._extract_content(page), await self._response_validators(response)
+
+            async def screenshot(page):
+                return await self._take_screenshot(page, chapter_name)
+
+            # Text is returned as soon as it is extracted; the screenshot is
+            # captured afterwards and its path delivered via screenshot_task
+            (content, validators), screenshot_task = await self._with_page(
+                url, extract,
+                background=screenshot if Config.SCREENSHOT_POLICY != "off" else None
+            )
+            self._cache_put(url, content, validators, screenshot_task)
+            return {
+                "content": content,
+                "screenshot": "",
+                "screenshot_task": screenshot_task,
+                "timestamp": datetime.now().isoformat(),
+                "source_url": url
+            }
+
         except Exception as e:
             logger.error(f"Scraping failed: {str(e)}")
             raise
 
-    def _extract_content(self, page):
+    def _http_get(self, url, headers=None):
+        """Plain HTTP GET returning (status, headers, decoded body)"""
+        request = urllib.request.Request(url, headers={
+            "User-Agent": Config.SCRAPER_USER_AGENT,
+            **(headers or {})
+        })
+        with urllib.request.urlopen(request, timeout=10) as response:
+            charset = response.headers.get_content_charset() or "utf-8"
+            body = response.read().decode(charset, errors="replace")
+            return response.status, response.headers, body
+
+    def _revalidate(self, url):
+        """Check the cached copy of url with a conditional request.
+
+        Returns (cached entry or None, fresh validators, fresh HTML or None).
+        The cached entry is only returned when the source is unchanged. With
+        nothing cached there is nothing to check, and no request is made.
+        """
+        entry = self.cache.get(url)
+        if entry is None:
+            self.cache.record_miss()
+            return None, {}, None
+        headers = {}
+        if entry["etag"]:
+            headers["If-None-Match"] = entry["etag"]
+        if entry["last_modified"]:
+            headers["If-Modified-Since"] = entry["last_modified"]
+
+        try:
+            _, response_headers, html = self._http_get(url, headers)
+        except urllib.error.HTTPError as e:
+            if e.code == 304:
+                self.cache.record_hit(url, revalidated=True)
+                return entry, {}, None
+            logger.warning(f"Cache revalidation failed for {url}: {str(e)}")
+            self.cache.record_miss()
+            return None, {}, None
+        except Exception as e:
+            logger.warning(f"Cache revalidation failed for {url}: {str(e)}")
+            self.cache.record_miss()
+            return None, {}, None
+
+        validators = self._validators(response_headers, html)
+        if entry["body_hash"] == validators["body_hash"]:
+            self.cache.record_hit(url, validators)
+            return entry, validators, None
+
+        self.cache.record_miss()
+        return None, validators, html
+
+    def _validators(self, headers, html):
+        """Cache validators for a fetched document; header lookups are case-insensitive"""
+        return {
+            "etag": headers.get("etag"),
+            "last_modified": headers.get("last-modified"),
+            "body_hash": hashlib.md5(html.encode()).hexdigest()
+        }
+
+    async def _response_validators(self, response):
+        """Validators for the browser's navigation response, or none if its body is unavailable"""
+        if response is None or self.cache is None:
+            return {}
+        try:
+            return self._validators(response.headers, await response.text())
+        except Exception as e:
+            logger.warning(f"No cache validators for {response.url}: {str(e)}")
+            return {}
+
+    def _cache_put(self, url, content, validators, screenshot_task):
+        """Remember a fresh scrape; the screenshot path is added once it is written"""
+        if self.cache is None or not content:
+            return
+        self.cache.put(url, content, "", validators)
+        if screenshot_task is not None:
+            screenshot_task.add_done_callback(
+                lambda task: task.cancelled() or self.cache.set_screenshot(url, task.result())
+            )
+
+    def _scrape_http(self, url, html=None, validators=None):
+        """Fetch without a browser and run the selector chain over the raw HTML.
+
+        Returns (content, validators for the HTML it came from).
+        """
+        try:
+            if html is None:
+                _, headers, html = self._http_get(url)
+                validators = self._validators(headers, html)
+            return extract_text(html, self.CONTENT_SELECTORS), validators or {}
+        except Exception as e:
+            logger.error(f"Plain HTTP fetch failed: {str(e)}")
+            return "", {}
+
+    async def scrape_many(self, chapters):
+        """Scrape many chapters in parallel; failures are returned as exceptions"""
+        return await asyncio.gather(*[
+            self.scrape_chapter_async(chapter["url"], chapter["chapter_name"])
+            for chapter in chapters
+        ], return_exceptions=True)
+
+    async def scrape_toc_async(self, url):
+        try:
+            logger.info(f"Reading table of contents from {url}")
+            links, _ = await self._with_page(url, lambda page, response: self._extract_links(page))
+            return self._links_to_chapters(url, links)
+
+        except Exception as e:
+            logger.error(f"Table of contents scraping failed: {str(e)}")
+            raise
+
+    async def _extract_links(self, page):
+        """Return (text, href) pairs from the main content area"""
+        for selector in self.CONTENT_SELECTORS:
+            if await page.locator(selector).count() > 0:
+                break
+        else:
+            selector = "body"
+
+        return await page.eval_on_selector_all(
+            f"{selector} a[href]",
+            "els => els.map(e => [e.innerText.trim(), e.getAttribute('href')])"
+        )
+
+    def _links_to_chapters(self, toc_url, links):
+        """Turn raw links into an ordered, de-duplicated chapter list with unique names"""
+        host = urlparse(toc_url).netloc
+        found = []
+        seen = set()
+
+        for text, href in links:
+            if not text or not href or href.startswith(("#", "javascript:", "mailto:")):
+                continue
+            absolute = urljoin(toc_url, href).split("#")[0]
+            if urlparse(absolute).netloc != host or absolute in seen or absolute == toc_url:
+                continue
+            seen.add(absolute)
+            found.append((text, absolute))
+
+        # Link texts such as "Next" or "Part 1" repeat; names key checkpoints and versions
+        names = unique_slugs(text for text, _ in found)
+        return [{"chapter_name": name, "url": url} for name, (_, url) in zip(names, found)]
+
+    async def _extract_content(self, page):
         """Extract main content using smart selectors"""
         # Try multiple selectors for robustness
-        selectors = [
-            "#content",
-            ".chapter",
-            "div.mw-parser-output",
-            "article"
-        ]
-        
-        for selector in selectors:
-            if page.locator(selector).count() > 0:
-                return page.locator(selector).inner_text()
-        
-        return page.inner_text("body")
-
-    def _take_screenshot(self, page, chapter_name):
-        """Take full page screenshot with timestamp"""
+        for selector in self.CONTENT_SELECTORS:
+            if await page.locator(selector).count() > 0:
+                return await page.locator(selector).inner_text()
+
+        return await page.inner_text("body")
+
+    async def _take_screenshot(self, page, chapter_name):
+        """Capture a compressed screenshot according to the screenshot policy"""
+        image_format = Config.SCREENSHOT_FORMAT
+        # Pillow is optional - only needed for WebP screenshots
+        if image_format == "webp" and importlib.util.find_spec("PIL") is None:
+            logger.warning("Pillow is not installed - saving screenshot as JPEG instead of WebP")
+            image_format = "jpeg"
+
+        options = {"full_page": Config.SCREENSHOT_POLICY == "full"}
+        if image_format == "jpeg":
+            options.update(type="jpeg", quality=Config.SCREENSHOT_QUALITY)
+        else:
+            # WebP is encoded from a lossless PNG capture
+            options["type"] = "png"
+        data = await page.screenshot(**options)
+
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        filename = f"{chapter_name}_{timestamp}.png"
-        path = os.path.join(Config.SCREENSHOT_DIR, filename)
-        page.screenshot(path=path, full_page=True)
-        return path
\ No newline at end of file
+        extension = "jpg" if image_format == "jpeg" else image_format
+        path = os.path.join(Config.SCREENSHOT_DIR, f"{chapter_name}_{timestamp}.{extension}")
+        await asyncio.to_thread(self._write_screenshot, data, path, image_format)
+        return path
+
+    def _write_screenshot(self, data, path, image_format):
+        if image_format == "webp":
+            from PIL import Image
+            Image.open(io.BytesIO(data)).save(path, "WEBP", quality=Config.SCREENSHOT_QUALITY)
+        else:
+            with open(path, "wb") as f:
+                f.write(data)
\ No newline at end of file
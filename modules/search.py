@@ -1,114 +1,215 @@
+import json
 import numpy as np
+import os
+import time
+from collections import deque
 from datetime import datetime
 from config import Config
+from modules.ranking import DEFAULT_WEIGHTS, WEIGHT_NAMES, score_features, train_weights
 from utils.logger import logger
+from utils.lru_cache import LRUCache
 import random
 
 class RLSearchEnhancer:
-    def __init__(self, version_db):
+    def __init__(self, version_db, events_path=None, weights_path=None):
         self.db = version_db
         self.learning_rate = Config.SEARCH_LEARNING_RATE
-        self.memory = []
-        self.weights = {
-            "content_relevance": 1.0,
-            "version_recency": 0.8,
-            "human_rating": 1.2,
-            "author_trust": 0.9
-        }
+        # Recent search sessions, and the latest session each result ID appeared in
+        self.memory = deque(maxlen=Config.SEARCH_MEMORY_SIZE)
+        self._sessions_by_result = {}
+        self.result_cache = LRUCache(Config.SEARCH_RESULT_CACHE_SIZE)
+        self._cache_generation = None
+        self.weights = dict(DEFAULT_WEIGHTS)
+
+        # Selections are logged durably and learned in mini-batches; the
+        # weights checkpoint records how much of the log has been learned
+        self.events_path = events_path if events_path is not None else Config.SEARCH_EVENTS_PATH
+        self.weights_path = weights_path if weights_path is not None else Config.SEARCH_WEIGHTS_PATH
+        for path in (self.events_path, self.weights_path):
+            if path:
+                os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.pending_events = []
+        self._log_offset = 0
+        self._trained_offset = 0
+        self._load_state()
 
-    def search(self, query, chapter_name=None, limit=5):
-        """Enhanced search with RL adjustments"""
+    def search(self, query, chapter_name=None, limit=5, mode=None):
+        """Enhanced search with RL adjustments (mode: hybrid, vector or lexical)"""
         try:
-            results = self.db.search_versions(query, chapter_name, limit*2)
+            results = self._retrieve(query, chapter_name, limit*2, mode or Config.SEARCH_MODE)
             if not results:
                 return []
                 
-            scored_results = [
-                (self._calculate_score(result), result)
-                for result in results
-            ]
-            scored_results.sort(reverse=True, key=lambda x: x[0])
-            
-            final_results = [r[1] for r in scored_results[:limit]]
-            self._store_in_memory(query, final_results)
+            features = self._feature_matrix(results)
+            scores = score_features(features, self._weight_vector())
+            order = np.argsort(-scores, kind="stable")[:limit]
+            final_results = [results[i] for i in order]
+            self._store_in_memory(query, final_results, features[order])
             return final_results
             
         except Exception as e:
             logger.error(f"RL search failed: {str(e)}")
             return []
     
-    def _calculate_score(self, result):
-        """Calculate weighted score for a result"""
-        metadata = result.get("metadata", {})
-        
-        # Base score from embedding distance (inverted)
-        base_score = 1 - result.get("distance", 1)
-        
-        # Apply weights
-        weighted_score = base_score * self.weights["content_relevance"]
-        
-        # Version recency (newer is better)
-        timestamp = metadata.get("timestamp", "")
-        if timestamp:
-            days_old = (datetime.now() - datetime.fromisoformat(timestamp)).days
-            recency_factor = max(0, 1 - (days_old / 365))
-            weighted_score += recency_factor * self.weights["version_recency"]
-        
-        # Human rating if available
-        if "human_rating" in metadata:
-            weighted_score += metadata["human_rating"] * self.weights["human_rating"]
-        
-        # Author trust factor
-        if metadata.get("author") == "human_editor":
-            weighted_score *= self.weights["author_trust"]
-            
-        return weighted_score
-    
-    def _store_in_memory(self, query, results):
+    def _retrieve(self, query, chapter_name, limit, mode):
+        """search_versions results, cached until the database is next written to"""
+        generation = self.db.generation
+        if generation != self._cache_generation:
+            self.result_cache.clear()
+            self._cache_generation = generation
+
+        key = (query, chapter_name, limit, mode, generation)
+        results = self.result_cache.get(key)
+        if results is None:
+            results = self.db.search_versions(query, chapter_name, limit, mode=mode)
+            if results:
+                self.result_cache.put(key, results)
+        return list(results)
+
+    def cache_stats(self):
+        """Hit rates of the query embedding and result caches"""
+        return {
+            name: dict(cache.stats, hit_rate=round(cache.hit_rate(), 3), size=len(cache))
+            for name, cache in [("query_embeddings", self.db.query_cache), ("results", self.result_cache)]
+        }
+
+    def log_stats(self):
+        stats = self.cache_stats()
+        logger.info(
+            f"Search cache: results {stats['results']['hit_rate']:.0%} hit rate, "
+            f"query embeddings {stats['query_embeddings']['hit_rate']:.0%} hit rate, "
+            f"{stats['results']['invalidations']} invalidations"
+        )
+
+    def _feature_matrix(self, results):
+        """Ranking features of the candidate set, one row per result (see modules.ranking)"""
+        n = len(results)
+        features = np.zeros((n, 4))
+        timestamps = np.full(n, np.nan)
+
+        for i, result in enumerate(results):
+            metadata = result.get("metadata", {})
+            features[i, 0] = self._relevance(result)
+            timestamps[i] = self._timestamp(metadata)
+            # Human rating if available
+            if "human_rating" in metadata:
+                features[i, 2] = float(metadata["human_rating"])
+            features[i, 3] = metadata.get("author") == "human_editor"
+
+        # Version recency (newer is better), where known
+        days_old = np.floor((time.time() - timestamps) / 86400)
+        features[:, 1] = np.nan_to_num(np.maximum(0, 1 - days_old / 365))
+        return features
+
+    def _timestamp(self, metadata):
+        """Epoch seconds, parsed at ingest; older versions only have the ISO string"""
+        if "timestamp_epoch" in metadata:
+            return float(metadata["timestamp_epoch"])
+        if metadata.get("timestamp"):
+            return datetime.fromisoformat(metadata["timestamp"]).timestamp()
+        return np.nan
+
+    def _weight_vector(self):
+        return np.array([self.weights[name] for name in WEIGHT_NAMES])
+
+    def _relevance(self, result):
+        """Lexical and hybrid results carry a relevance; vector ones only a distance"""
+        if result.get("relevance") is not None:
+            return result["relevance"]
+        distance = result.get("distance")
+        return 1 - (distance if distance is not None else 1)
+
+    def _store_in_memory(self, query, results, features):
         """Store search session in memory for learning"""
-        if len(self.memory) >= Config.SEARCH_MEMORY_SIZE:
-            self.memory.pop(0)
-            
-        self.memory.append({
+        if len(self.memory) == self.memory.maxlen:
+            oldest = self.memory.popleft()
+            for result_id in oldest["results"]:
+                if self._sessions_by_result.get(result_id) is oldest:
+                    del self._sessions_by_result[result_id]
+
+        session = {
             "query": query,
-            "results": results,
+            "results": [r["id"] for r in results],
+            # Kept so a later selection can be logged with what was shown
+            "features": features.tolist(),
             "selected": None  # To be filled when user selects a result
-        })
+        }
+        self.memory.append(session)
+        for result_id in session["results"]:
+            self._sessions_by_result[result_id] = session
     
     def update_weights(self, selected_result):
-        """Update weights based on user selection"""
+        """Log a selection; weights are retrained once SEARCH_BATCH_SIZE selections are pending"""
         try:
             # Find the search session where this result was shown
-            for session in self.memory:
-                if selected_result in session["results"]:
-                    session["selected"] = selected_result
-                    
-                    # Get features of selected result
-                    selected_features = self._extract_features(selected_result)
-                    
-                    # Update weights
-                    for feature, value in selected_features.items():
-                        if feature in self.weights:
-                            self.weights[feature] += self.learning_rate * value
-                    
-                    break
-                    
-            # Normalize weights
-            total = sum(self.weights.values())
-            self.weights = {k: v/total for k, v in self.weights.items()}
+            session = self._sessions_by_result.get(selected_result.get("id"))
+            if session is None or len(session["results"]) < 2:
+                return
+            session["selected"] = selected_result["id"]
+
+            event = {
+                "timestamp": time.time(),
+                "query": session["query"],
+                "shown": session["results"],
+                "selected": session["selected"],
+                "features": session["features"]
+            }
+            self._log_event(event)
+            self.pending_events.append(event)
+            if len(self.pending_events) >= Config.SEARCH_BATCH_SIZE:
+                self.train()
             
         except Exception as e:
             logger.error(f"Weight update failed: {str(e)}")
-    
-    def _extract_features(self, result):
-        """Extract features from a result for RL"""
-        metadata = result.get("metadata", {})
-        
-        return {
-            "content_relevance": 1 - result.get("distance", 1),
-            "version_recency": 1 - min(1, (datetime.now() - datetime.fromisoformat(
-                metadata.get("timestamp", datetime.now().isoformat())
-            )).days / 365),
-            "human_rating": metadata.get("human_rating", 0.5),
-            "author_trust": 1 if metadata.get("author") == "human_editor" else 0.5
-        }
\ No newline at end of file
+
+    def train(self):
+        """Run one mini-batch update over the pending selections and checkpoint the weights"""
+        if not self.pending_events:
+            return self.weights
+        weights = train_weights(
+            self.pending_events, self._weight_vector(), self.learning_rate,
+            l2=Config.SEARCH_L2, epochs=Config.SEARCH_EPOCHS
+        )
+        self.weights = dict(zip(WEIGHT_NAMES, weights.tolist()))
+        self.pending_events = []
+        self._trained_offset = self._log_offset
+        self._save_checkpoint()
+        return self.weights
+
+    def _log_event(self, event):
+        if not self.events_path:
+            return
+        with open(self.events_path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(event) + "\n")
+            self._log_offset = f.tell()
+
+    def _save_checkpoint(self):
+        if not self.weights_path:
+            return
+        checkpoint = {
+            "weights": self.weights,
+            # Events before this byte offset of the event log are already learned
+            "events_offset": self._trained_offset,
+            "updated_at": datetime.now().isoformat()
+        }
+        tmp_path = f"{self.weights_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(checkpoint, f, indent=2)
+        os.replace(tmp_path, self.weights_path)
+
+    def _load_state(self):
+        """Restore checkpointed weights and re-queue events logged after the checkpoint"""
+        try:
+            if self.weights_path and os.path.exists(self.weights_path):
+                with open(self.weights_path, encoding="utf-8") as f:
+                    checkpoint = json.load(f)
+                self.weights.update(checkpoint["weights"])
+                self._trained_offset = checkpoint.get("events_offset", 0)
+
+            if self.events_path and os.path.exists(self.events_path):
+                with open(self.events_path, encoding="utf-8") as f:
+                    f.seek(self._trained_offset)
+                    self.pending_events = [json.loads(line) for line in f if line.strip()]
+                    self._log_offset = f.tell()
+        except (OSError, ValueError, KeyError) as e:
+            logger.error(f"Failed to load search ranking state: {str(e)}")
@@ -103,81 +103,670 @@
 #             raise
 
 
-import chromadb
-from chromadb.utils import embedding_functions
 from config import Config
+from modules.chunking import passages_with_offsets
+from utils.helpers import highlight_terms
 from utils.logger import logger
+from utils.lru_cache import LRUCache
+import difflib
 import hashlib
+import os
+import re
+import threading
 from datetime import datetime
 
+SNIPPET_CHARS = 300
+
 class VersionDB:
-    def __init__(self):
-        self.client = chromadb.PersistentClient(path=Config.DB_PATH)
-        self.embedding_func = embedding_functions.SentenceTransformerEmbeddingFunction(
-            model_name="all-MiniLM-L6-v2"
-        )
-        self.collection = self.client.get_or_create_collection(
-            name=Config.COLLECTION_NAME,
-            embedding_function=self.embedding_func
-        )
+    def __init__(self, path=None, collection_name=None, passage_collection_name=None, embedding_func=None,
+                 embedding_cache_path=None):
+        self.path = path or Config.DB_PATH
+        self.embedding_cache_path = embedding_cache_path
+        self.collection_name = collection_name or Config.COLLECTION_NAME
+        self.passage_collection_name = passage_collection_name or Config.PASSAGE_COLLECTION_NAME
+        if embedding_func is None and Config.EMBEDDING_BACKEND == "hashing":
+            from modules.fake_embeddings import HashingEmbeddingFunction
+            embedding_func = HashingEmbeddingFunction()
+        # Cached vectors are keyed by model name, so a stand-in never mixes with real embeddings
+        self.embedding_model = getattr(embedding_func, "model_name", "all-MiniLM-L6-v2")
+        # Chroma, the embedding model (PyTorch) and the caches load on first use
+        self._client = None
+        self._collection = None
+        self._passages = None
+        self._lexical = None
+        self._lineage = None
+        self._embedding_func = embedding_func
+        self._embedding_cache = None
+        self._init_lock = threading.RLock()
+        # Bumped on every write so search result caches can tell when they are stale
+        self.generation = 0
+        self.query_cache = LRUCache(Config.SEARCH_QUERY_CACHE_SIZE)
+
+    @property
+    def client(self):
+        with self._init_lock:
+            if self._client is None:
+                import chromadb
+                self._client = chromadb.PersistentClient(path=self.path)
+            return self._client
+
+    @property
+    def collection(self):
+        with self._init_lock:
+            if self._collection is None:
+                # Embeddings are always computed here (see _embed), so the
+                # collection itself never needs the model
+                self._collection = self.client.get_or_create_collection(
+                    name=self.collection_name,
+                    embedding_function=None
+                )
+            return self._collection
+
+    @property
+    def passages(self):
+        """Passage-level index: overlapping chunks of each version, linked by version_id"""
+        with self._init_lock:
+            if self._passages is None:
+                self._passages = self.client.get_or_create_collection(
+                    name=self.passage_collection_name,
+                    embedding_function=None
+                )
+            return self._passages
+
+    @property
+    def lexical(self):
+        """BM25 index of whole versions; needs neither Chroma nor the embedding model"""
+        with self._init_lock:
+            if self._lexical is None:
+                from modules.lexical_index import LexicalIndex
+                self._lexical = LexicalIndex(os.path.join(self.path, "lexical.sqlite3"))
+            return self._lexical
+
+    @property
+    def lineage(self):
+        """Version history with parent links, for queries that don't need the vector index"""
+        with self._init_lock:
+            if self._lineage is None:
+                from modules.lineage import LineageStore
+                self._lineage = LineageStore(os.path.join(self.path, "lineage.sqlite3"))
+            return self._lineage
+
+    @property
+    def embedding_func(self):
+        with self._init_lock:
+            if self._embedding_func is None:
+                from chromadb.utils import embedding_functions
+                logger.info(f"Loading embedding model {self.embedding_model}")
+                self._embedding_func = embedding_functions.SentenceTransformerEmbeddingFunction(
+                    model_name=self.embedding_model
+                )
+            return self._embedding_func
+
+    @property
+    def embedding_cache(self):
+        with self._init_lock:
+            if self._embedding_cache is None:
+                from modules.embedding_cache import EmbeddingCache
+                self._embedding_cache = EmbeddingCache(self.embedding_cache_path)
+            return self._embedding_cache
+
+    def _prepare(self, chapter_data):
+        """Build the version ID, content hash and validated metadata for a chapter version"""
+        content_hash = hashlib.md5(chapter_data["content"].encode()).hexdigest()
+        version_id = f"{chapter_data['chapter_name']}_{content_hash}"
+        
+        metadata = {
+            "chapter": str(chapter_data.get("chapter_name", "unknown")),
+            "version": str(chapter_data.get("version", "1.0")),
+            "status": str(chapter_data.get("status", "draft")),
+            "author": str(chapter_data.get("author", "ai_writer")),
+            "timestamp": str(chapter_data.get("timestamp", datetime.now().isoformat())),
+            "source_url": str(chapter_data.get("source_url", "")),
+            "screenshot": str(chapter_data.get("screenshot", "")),
+            "human_feedback": str(chapter_data.get("human_feedback", ""))
+        }
+
+        # Reviewer rating scaled to 0-1, a search ranking feature
+        if chapter_data.get("human_rating") is not None:
+            metadata["human_rating"] = float(chapter_data["human_rating"])
+
+        # Parsed once here so search ranking never has to parse ISO strings
+        metadata["timestamp_epoch"] = datetime.fromisoformat(metadata["timestamp"]).timestamp()
+
+        # Token/latency totals from AIProcessor.metrics, kept numeric
+        for key, value in (chapter_data.get("ai_metrics") or {}).items():
+            metadata[f"ai_{key}"] = value
+        return version_id, content_hash, metadata
+
+    def version_id_for(self, chapter_data):
+        return self._prepare(chapter_data)[0]
+
+    def _embed(self, documents, hashes):
+        """Embed documents, reusing cached vectors for content seen before"""
+        vectors = self.embedding_cache.get_many(hashes, self.embedding_model)
+        missing = {h: doc for h, doc in zip(hashes, documents) if h not in vectors}
+        if missing:
+            fresh = dict(zip(missing, self.embedding_func(list(missing.values()))))
+            self.embedding_cache.put_many(fresh, self.embedding_model)
+            vectors.update(fresh)
+        return [vectors[h] for h in hashes]
+
+    def _documents(self, ids, documents):
+        """Version texts; Chroma only holds them for versions stored before delta storage"""
+        return [
+            doc if doc is not None else self.lineage.content(version_id)
+            for version_id, doc in zip(ids, documents)
+        ]
+
+    def _bump_generation(self):
+        with self._init_lock:
+            self.generation += 1
+
+    def _query_embeddings(self, query):
+        """Embedding of a search query, from the LRU when it was asked before"""
+        vector = self.query_cache.get(query)
+        if vector is None:
+            vector = self.embedding_func([query])[0]
+            self.query_cache.put(query, vector)
+        return [vector]
+
+    def _index_passages(self, versions):
+        """Chunk and embed (version_id, content, metadata) tuples into the passage index.
+
+        Returns {version_id: passage_count}.
+        """
+        ids, documents, hashes, metadatas = [], [], [], []
+        counts = {}
+        for version_id, content, metadata in versions:
+            passages = passages_with_offsets(
+                content, Config.PASSAGE_TOKENS, Config.PASSAGE_OVERLAP_TOKENS
+            )
+            counts[version_id] = len(passages)
+            for i, (start, end, passage) in enumerate(passages):
+                ids.append(f"{version_id}:{i}")
+                documents.append(passage)
+                hashes.append(hashlib.md5(passage.encode()).hexdigest())
+                metadatas.append({
+                    "version_id": version_id,
+                    "chapter": metadata["chapter"],
+                    "start": start,
+                    "end": end
+                })
+
+        for start in range(0, len(ids), Config.DB_BATCH_SIZE):
+            end = start + Config.DB_BATCH_SIZE
+            self.passages.upsert(
+                ids=ids[start:end],
+                embeddings=self._embed(documents[start:end], hashes[start:end]),
+                metadatas=metadatas[start:end]
+            )
+        return counts
 
     def store_version(self, chapter_data):
         """Store/update a chapter version with metadata"""
+        return self.store_versions([chapter_data])[0]
+
+    def store_versions(self, batch):
+        """Store/update many chapter versions with one batched embedding pass"""
         try:
-            content_hash = hashlib.md5(chapter_data["content"].encode()).hexdigest()
-            version_id = f"{chapter_data['chapter_name']}_{content_hash}"
-            
-            metadata = {
-                "chapter": str(chapter_data.get("chapter_name", "unknown")),
-                "version": str(chapter_data.get("version", "1.0")),
-                "status": str(chapter_data.get("status", "draft")),
-                "author": str(chapter_data.get("author", "ai_writer")),
-                "timestamp": str(chapter_data.get("timestamp", datetime.now().isoformat())),
-                "source_url": str(chapter_data.get("source_url", "")),
-                "screenshot": str(chapter_data.get("screenshot", "")),
-                "human_feedback": str(chapter_data.get("human_feedback", ""))
-            }
-            
-            self.collection.upsert(
-                documents=[chapter_data["content"]],
-                metadatas=[metadata],
-                ids=[version_id]
-            )
-            return version_id
+            prepared = {}
+            version_ids = []
+            history = []
+            for chapter_data in batch:
+                version_id, content_hash, metadata = self._prepare(chapter_data)
+                # Later entries for the same version win, as with repeated upserts
+                prepared.pop(version_id, None)
+                prepared[version_id] = (chapter_data["content"], content_hash, metadata)
+                version_ids.append(version_id)
+                # ...but every entry is a step in the chapter's history
+                history.append((
+                    version_id, chapter_data["content"],
+                    dict(metadata, parent_id=chapter_data.get("parent_id"))
+                ))
+
+            # Text lives only in the lineage store (delta-compressed), so it
+            # is written before anything in Chroma can point at it
+            self.lineage.record_many(history)
+
+            ids = list(prepared)
+            for start in range(0, len(ids), Config.DB_BATCH_SIZE):
+                chunk = ids[start:start + Config.DB_BATCH_SIZE]
+
+                # The ID contains the content hash, so an existing ID means
+                # only the metadata changed and the embedding can stay as is
+                existing = set(self.collection.get(ids=chunk, include=[])["ids"])
+                updates = [i for i in chunk if i in existing]
+                if updates:
+                    self.collection.update(
+                        ids=updates,
+                        metadatas=[prepared[i][2] for i in updates]
+                    )
+
+                new = [i for i in chunk if i not in existing]
+                if new:
+                    # Passages go in first, so a version carrying passage_count
+                    # is always fully searchable
+                    counts = self._index_passages(
+                        [(i, prepared[i][0], prepared[i][2]) for i in new]
+                    )
+                    for i in new:
+                        prepared[i][2]["passage_count"] = counts[i]
+                    documents = [prepared[i][0] for i in new]
+                    self.collection.upsert(
+                        ids=new,
+                        embeddings=self._embed(documents, [prepared[i][1] for i in new]),
+                        metadatas=[prepared[i][2] for i in new]
+                    )
+                    self.lexical.add_many(
+                        [(i, prepared[i][2]["chapter"], prepared[i][0]) for i in new]
+                    )
+            return version_ids
             
         except Exception as e:
             logger.error(f"Failed to store version: {str(e)}")
             raise
+        finally:
+            # Also after a partial failure, since some chunks may have been written
+            self._bump_generation()
 
-    def search_versions(self, query, chapter_name=None, limit=5):
-        """Search versions with optional chapter filter"""
+    def update_metadata(self, version_id, updates):
+        """Merge metadata fields into an existing version without re-embedding"""
         try:
-            results = self.collection.query(
-                query_texts=[query],
-                n_results=limit,
-                where={"chapter": chapter_name} if chapter_name else None
-            )
-            return [{
-                "content": doc,
-                "metadata": meta,
+            existing = self.collection.get(ids=[version_id], include=["metadatas"])
+            if not existing["ids"]:
+                logger.warning(f"Version {version_id} not found - metadata not updated")
+                return None
+
+            metadata = dict(existing["metadatas"][0])
+            metadata.update({k: str(v) for k, v in updates.items()})
+            if "timestamp" in updates:
+                metadata["timestamp_epoch"] = datetime.fromisoformat(metadata["timestamp"]).timestamp()
+            self.collection.update(ids=[version_id], metadatas=[metadata])
+            if "status" in updates or "author" in updates:
+                self.lineage.update_latest(version_id, metadata.get("status"), metadata.get("author"))
+            self._bump_generation()
+            return version_id
+
+        except Exception as e:
+            logger.error(f"Failed to update metadata: {str(e)}")
+            raise
+
+    def build_passage_index(self, page_size=None):
+        """Backfill the passage index for versions stored before it existed"""
+        try:
+            page_size = page_size or Config.DB_BATCH_SIZE
+            indexed = 0
+            offset = 0
+            while True:
+                page = self.collection.get(
+                    include=["documents", "metadatas"], limit=page_size, offset=offset
+                )
+                if not page["ids"]:
+                    break
+                offset += len(page["ids"])
+
+                pending = [
+                    (version_id, doc, meta)
+                    for version_id, doc, meta in zip(
+                        page["ids"], self._documents(page["ids"], page["documents"]), page["metadatas"]
+                    )
+                    if "passage_count" not in meta
+                ]
+                if not pending:
+                    continue
+                counts = self._index_passages(pending)
+                self.collection.update(
+                    ids=list(counts),
+                    metadatas=[{"passage_count": count} for count in counts.values()]
+                )
+                indexed += len(counts)
+
+            logger.info(f"Passage index built for {indexed} versions")
+            if indexed:
+                self._bump_generation()
+            return indexed
+
+        except Exception as e:
+            logger.error(f"Failed to build passage index: {str(e)}")
+            raise
+
+    def build_lexical_index(self, page_size=None):
+        """Backfill the lexical index for versions stored before it existed"""
+        try:
+            page_size = page_size or Config.DB_BATCH_SIZE
+            indexed = 0
+            offset = 0
+            while True:
+                page = self.collection.get(
+                    include=["documents", "metadatas"], limit=page_size, offset=offset
+                )
+                if not page["ids"]:
+                    break
+                offset += len(page["ids"])
+                indexed += self.lexical.add_many([
+                    (version_id, meta.get("chapter", ""), doc)
+                    for version_id, doc, meta in zip(
+                        page["ids"], self._documents(page["ids"], page["documents"]), page["metadatas"]
+                    )
+                ])
+
+            logger.info(f"Lexical index built for {indexed} versions")
+            if indexed:
+                self._bump_generation()
+            return indexed
+
+        except Exception as e:
+            logger.error(f"Failed to build lexical index: {str(e)}")
+            raise
+
+    def build_lineage(self, page_size=None):
+        """Backfill history rows for versions stored before the lineage table existed.
+
+        Parents are inferred from timestamp order within each chapter.
+        """
+        try:
+            page_size = page_size or Config.DB_BATCH_SIZE
+            missing = []
+            offset = 0
+            while True:
+                page = self.collection.get(
+                    include=["documents", "metadatas"], limit=page_size, offset=offset
+                )
+                if not page["ids"]:
+                    break
+                offset += len(page["ids"])
+                known = self.lineage.contains(page["ids"])
+                for version_id, doc, meta in zip(page["ids"], page["documents"], page["metadatas"]):
+                    if version_id in known:
+                        continue
+                    meta = dict(meta)
+                    if "timestamp_epoch" not in meta:
+                        meta["timestamp_epoch"] = datetime.fromisoformat(meta["timestamp"]).timestamp()
+                    missing.append((version_id, doc, meta))
+
+            missing.sort(key=lambda v: (v[2]["chapter"], v[2]["timestamp_epoch"]))
+            self.lineage.record_many(missing)
+            logger.info(f"Lineage built for {len(missing)} versions")
+            return len(missing)
+
+        except Exception as e:
+            logger.error(f"Failed to build lineage: {str(e)}")
+            raise
+
+    def get_history(self, chapter_name, limit=None):
+        """A chapter's stored versions in order, oldest first (no content)"""
+        try:
+            return self.lineage.history(chapter_name, limit)
+        except Exception as e:
+            logger.error(f"Failed to load history: {str(e)}")
+            raise
+
+    def get_latest(self, chapter_name, status=None):
+        """Newest version of a chapter, optionally the newest with a given status"""
+        try:
+            entry = self.lineage.latest(chapter_name, status)
+            if entry:
+                entry["content"] = self.lineage.content(entry["version_id"])
+            return entry
+        except Exception as e:
+            logger.error(f"Failed to load latest version: {str(e)}")
+            raise
+
+    def diff(self, old_version_id, new_version_id=None, context=3):
+        """Unified diff between two versions; against its parent if only one is given"""
+        try:
+            if new_version_id is None:
+                new_version_id = old_version_id
+                parents = [h for h in self.lineage.history_of(new_version_id) if h["parent_id"]]
+                if not parents:
+                    return ""
+                old_version_id = parents[-1]["parent_id"]
+
+            old = self.lineage.content(old_version_id)
+            new = self.lineage.content(new_version_id)
+            if old is None or new is None:
+                missing = old_version_id if old is None else new_version_id
+                raise KeyError(f"Version {missing} not found")
+            return "".join(difflib.unified_diff(
+                old.splitlines(keepends=True), new.splitlines(keepends=True),
+                fromfile=old_version_id, tofile=new_version_id, n=context
+            ))
+        except Exception as e:
+            logger.error(f"Diff failed: {str(e)}")
+            raise
+
+    def _snippet(self, text, query):
+        """Highlighted excerpt of a passage, centred on the first query term"""
+        terms = [t for t in re.findall(r"\w+", query.lower()) if len(t) > 2]
+        match = re.search(r"\b(" + "|".join(map(re.escape, terms)) + r")\b", text, re.IGNORECASE) if terms else None
+        start = max(0, match.start() - SNIPPET_CHARS // 3) if match else 0
+        excerpt = text[start:start + SNIPPET_CHARS]
+        prefix = "..." if start > 0 else ""
+        suffix = "..." if start + SNIPPET_CHARS < len(text) else ""
+        return prefix + highlight_terms(excerpt, query) + suffix
+
+    def _search_passages(self, query, query_embeddings, chapter_name, limit):
+        """Rank versions by their best-matching passages"""
+        if not self.passages.count():
+            return []
+        results = self.passages.query(
+            query_embeddings=query_embeddings,
+            n_results=limit * Config.PASSAGE_CANDIDATES,
+            where={"chapter": chapter_name} if chapter_name else None
+        )
+
+        hits = {}
+        for meta, dist in zip(results["metadatas"][0], results["distances"][0]):
+            hits.setdefault(meta["version_id"], []).append({
+                "start": meta["start"],
+                "end": meta["end"],
                 "distance": dist
-            } for doc, meta, dist in zip(
-                results["documents"][0],
-                results["metadatas"][0],
-                results["distances"][0]
-            )]
+            })
+        # Closest passage first; more matching passages breaks ties
+        ranked = sorted(
+            hits, key=lambda v: (min(p["distance"] for p in hits[v]), -len(hits[v]))
+        )[:limit]
+        if not ranked:
+            return []
+
+        parents = self.collection.get(ids=ranked, include=["documents", "metadatas"])
+        by_id = dict(zip(parents["ids"], zip(
+            self._documents(parents["ids"], parents["documents"]), parents["metadatas"]
+        )))
+        found = []
+        for version_id in ranked:
+            if version_id not in by_id:
+                continue
+            content, metadata = by_id[version_id]
+            passages = sorted(hits[version_id], key=lambda p: p["distance"])
+            best = passages[0]
+            found.append({
+                "id": version_id,
+                "content": content,
+                "metadata": metadata,
+                "distance": best["distance"],
+                "snippet": self._snippet(content[best["start"]:best["end"]], query),
+                "passages": passages
+            })
+        return found
+
+    def search_versions(self, query, chapter_name=None, limit=5, mode=None):
+        """Search versions with optional chapter filter.
+
+        mode is "vector", "lexical" (BM25 only, never loads the embedding
+        model) or "hybrid" (both, fused by reciprocal rank); defaults to
+        Config.SEARCH_MODE.
+        """
+        mode = mode or Config.SEARCH_MODE
+        searches = {
+            "vector": self._vector_search,
+            "lexical": self._lexical_search,
+            "hybrid": self._hybrid_search
+        }
+        if mode not in searches:
+            raise ValueError(f"Unknown search mode: {mode}")
+        try:
+            return searches[mode](query, chapter_name, limit)
         except Exception as e:
             logger.error(f"Search failed: {str(e)}")
             return []
 
+    def _lexical_search(self, query, chapter_name, limit):
+        hits = self.lexical.search(query, chapter_name, limit)
+        if not hits:
+            return []
+
+        parents = self.collection.get(
+            ids=[h["version_id"] for h in hits], include=["documents", "metadatas"]
+        )
+        by_id = dict(zip(parents["ids"], zip(
+            self._documents(parents["ids"], parents["documents"]), parents["metadatas"]
+        )))
+        best = hits[0]["score"] or 1.0
+        found = []
+        for hit in hits:
+            if hit["version_id"] not in by_id:
+                continue
+            content, metadata = by_id[hit["version_id"]]
+            found.append({
+                "id": hit["version_id"],
+                "content": content,
+                "metadata": metadata,
+                "distance": None,
+                # BM25 relative to the best match, in (0, 1]
+                "relevance": hit["score"] / best,
+                "snippet": hit["snippet"],
+                "passages": []
+            })
+        return found
+
+    def _hybrid_search(self, query, chapter_name, limit):
+        """Reciprocal rank fusion of the lexical and vector rankings"""
+        candidates = limit * 2
+        rankings = [
+            self._lexical_search(query, chapter_name, candidates),
+            self._vector_search(query, chapter_name, candidates)
+        ]
+        k = Config.SEARCH_RRF_K
+
+        fused = {}
+        for ranking in rankings:
+            for rank, result in enumerate(ranking, 1):
+                entry = fused.setdefault(result["id"], dict(result, rrf_score=0.0))
+                entry["rrf_score"] += 1 / (k + rank)
+                # Keep the vector distance and passages, and the lexical snippet
+                # since it marks exact term matches
+                if result["distance"] is not None:
+                    entry["distance"] = result["distance"]
+                    entry["passages"] = result["passages"]
+                else:
+                    entry["snippet"] = result["snippet"]
+
+        ranked = sorted(fused.values(), key=lambda r: r["rrf_score"], reverse=True)[:limit]
+        for result in ranked:
+            # First place in every ranking scores 1
+            result["relevance"] = result["rrf_score"] * (k + 1) / len(rankings)
+        return ranked
+
+    def _vector_search(self, query, chapter_name, limit):
+        query_embeddings = self._query_embeddings(query)
+        found = self._search_passages(query, query_embeddings, chapter_name, limit)
+        if found:
+            return found
+
+        # Versions stored before the passage index existed are only
+        # reachable through their whole-document embedding
+        results = self.collection.query(
+            query_embeddings=query_embeddings,
+            n_results=limit,
+            where={"chapter": chapter_name} if chapter_name else None
+        )
+        return [{
+            "id": version_id,
+            "content": doc,
+            "metadata": meta,
+            "distance": dist,
+            "snippet": self._snippet(doc, query),
+            "passages": []
+        } for version_id, doc, meta, dist in zip(
+            results["ids"][0],
+            self._documents(results["ids"][0], results["documents"][0]),
+            results["metadatas"][0],
+            results["distances"][0]
+        )]
+
     def get_version(self, version_id):
         """Retrieve a specific version"""
         try:
-            result = self.collection.get(ids=[version_id])
+            result = self.collection.get(ids=[version_id], include=["documents", "metadatas"])
             return {
-                "content": result["documents"][0],
+                "content": self._documents(result["ids"], result["documents"])[0],
                 "metadata": result["metadatas"][0]
-            } if result["documents"] else None
+            } if result["ids"] else None
         except Exception as e:
             logger.error(f"Failed to retrieve version: {str(e)}")
-            raise
\ No newline at end of file
+            raise
+
+
+class BufferedVersionWriter:
+    """Collects versions and writes them through store_versions in batches.
+
+    A batch is flushed when it reaches max_size or max_delay seconds after
+    its first version was added, and on close().
+    """
+
+    def __init__(self, db, max_size=None, max_delay=None):
+        self.db = db
+        self.max_size = max_size or Config.DB_FLUSH_SIZE
+        self.max_delay = max_delay if max_delay is not None else Config.DB_FLUSH_INTERVAL
+        self._buffer = []
+        self._lock = threading.RLock()
+        self._timer = None
+
+    def store_version(self, chapter_data):
+        """Queue a version and return the ID it will be stored under"""
+        version_id = self.db.version_id_for(chapter_data)
+        with self._lock:
+            self._buffer.append(dict(chapter_data))
+            if len(self._buffer) >= self.max_size:
+                self.flush()
+            elif self._timer is None and self.max_delay:
+                self._timer = threading.Timer(self.max_delay, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+        return version_id
+
+    def update_metadata(self, version_id, updates):
+        """Patch a still-buffered version in place, otherwise update the stored one"""
+        with self._lock:
+            pending = [c for c in self._buffer if self.db.version_id_for(c) == version_id]
+            for chapter_data in pending:
+                chapter_data.update(updates)
+        if pending:
+            return version_id
+        return self.db.update_metadata(version_id, updates)
+
+    def flush(self):
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            batch, self._buffer = self._buffer, []
+            if not batch:
+                return
+            try:
+                self.db.store_versions(batch)
+            except Exception:
+                # Keep the versions so the next flush retries them
+                self._buffer = batch + self._buffer
+                raise
+            logger.info(f"Flushed {len(batch)} versions")
+
+    def close(self):
+        self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
\ No newline at end of file
@@ -0,0 +1,238 @@
+import asyncio
+import concurrent.futures
+import multiprocessing
+import threading
+import time
+from config import Config
+from modules.job_queue import QUEUE_STAGES, JobQueue
+from utils.helpers import format_table
+from utils.logger import logger
+
+STYLE_GUIDELINES = "Modernize language while preserving original tone"
+
+
+class ScrapeStage:
+    """Fetch a chapter and hand the scraped version to the AI stage.
+
+    The text goes on as soon as it is extracted. Screenshots finish on the
+    worker's event loop thread, and their paths reach the index stage
+    through the scrape job's result.
+    """
+    batch_size = 1
+
+    def __init__(self, options):
+        from modules.scraper import ChapterScraper
+        self.queue_path = options["queue_path"]
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self.loop.run_forever, daemon=True)
+        self._thread.start()
+        self._handoffs = set()
+        # One browser pool per worker process, reused across jobs
+        self.scraper = ChapterScraper(pool_size=1, fetch_mode=options["fetch_mode"],
+                                      use_cache=options["use_scrape_cache"])
+
+    def process(self, queue, jobs):
+        for job in jobs:
+            url = job["payload"]["url"]
+            scraped_data = asyncio.run_coroutine_threadsafe(
+                self.scraper.scrape_chapter_async(url, job["chapter"]), self.loop
+            ).result()
+            chapter_data = {
+                "chapter_name": job["chapter"],
+                "content": scraped_data["content"],
+                "screenshot": scraped_data["screenshot"],
+                "source_url": url,
+                "original_content": scraped_data["content"],
+                "status": "scraped"
+            }
+            queue.complete(job, "ai", dict(job["payload"], chapter_data=chapter_data, scrape_job=job["id"]),
+                           result={"chars": len(scraped_data["content"])})
+
+            task = scraped_data.get("screenshot_task")
+            if task is not None:
+                handoff = asyncio.run_coroutine_threadsafe(self._hand_off_screenshot(job, task), self.loop)
+                self._handoffs.add(handoff)
+                handoff.add_done_callback(self._handoffs.discard)
+
+    async def _hand_off_screenshot(self, job, task):
+        path = await task
+        if not path:
+            return
+        try:
+            await asyncio.to_thread(self._record_screenshot, job, path)
+        except Exception as e:
+            logger.error(f"Recording screenshot of {job['chapter']} failed: {str(e)}")
+
+    def _record_screenshot(self, job, path):
+        # Runs off the worker's main thread, so it needs a connection of its own
+        queue = JobQueue(self.queue_path)
+        try:
+            previous = queue.merge_result(job["id"], {"screenshot": path})
+            if "version_ids" in previous:
+                # The index stage stored the chapter first; have it fill the path in
+                queue.enqueue("index", job["chapter"], {"screenshot": path, "version_ids": previous["version_ids"]})
+        finally:
+            queue.close()
+
+    def close(self):
+        concurrent.futures.wait(list(self._handoffs))
+        asyncio.run_coroutine_threadsafe(self.scraper.close(), self.loop).result()
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self._thread.join()
+        self.loop.close()
+
+
+class AIStage:
+    """Rewrite and review a chapter, then hand its versions to the index stage"""
+    batch_size = 1
+
+    def __init__(self, options):
+        # Every AI worker process has its own limiter, so they split the quota
+        from modules.ai_processor import AIProcessor
+        self.ai = AIProcessor(
+            requests_per_minute=max(1, Config.AI_REQUESTS_PER_MINUTE // options["ai_workers"]),
+            tokens_per_minute=max(1, Config.AI_TOKENS_PER_MINUTE // options["ai_workers"])
+        )
+        self.regenerate = options["regenerate"]
+
+    def process(self, queue, jobs):
+        for job in jobs:
+            name = job["chapter"]
+            scraped = job["payload"]["chapter_data"]
+            rewritten = dict(scraped, status="ai_rewritten", author="ai_writer")
+            rewritten["content"] = self.ai.rewrite_chapter(
+                scraped["original_content"], STYLE_GUIDELINES,
+                regenerate=self.regenerate, chapter_name=name
+            )
+            ai_feedback = self.ai.review_chapter(
+                rewritten["content"], scraped["original_content"],
+                regenerate=self.regenerate, chapter_name=name
+            )
+            rewritten["ai_metrics"] = self.ai.metrics.chapter_summary(name)
+
+            versions = [scraped, rewritten]
+            skip_human = job["payload"].get("skip_human")
+            if skip_human:
+                versions.append(dict(rewritten, status="auto_approved", human_feedback="Skipped human review"))
+            queue.complete(job, "index", {"versions": versions, "ai_feedback": ai_feedback, "review": not skip_human,
+                                          "scrape_job": job["payload"].get("scrape_job")},
+                           result=self.ai.metrics.chapter_summary(name))
+
+    def close(self):
+        pass
+
+
+class IndexStage:
+    """Embed and store the versions of several chapters in one batch, then queue them for review"""
+
+    def __init__(self, options):
+        from modules.version_db import VersionDB
+        from modules.review_queue import ReviewQueue
+        self.db = VersionDB()
+        self.reviews = ReviewQueue(options["review_queue_path"])
+        self.batch_size = Config.WORKER_INDEX_BATCH
+
+    def process(self, queue, jobs):
+        for job in jobs:
+            if "screenshot" in job["payload"]:
+                # A screenshot that finished after its chapter was stored
+                for version_id in job["payload"]["version_ids"]:
+                    self.db.update_metadata(version_id, {"screenshot": job["payload"]["screenshot"]})
+                queue.complete(job)
+        jobs = [job for job in jobs if "versions" in job["payload"]]
+        if not jobs:
+            return
+
+        # Screenshots usually finish while the chapter is with the AI stage
+        screenshots = {}
+        for job in jobs:
+            scrape_job = job["payload"].get("scrape_job")
+            screenshots[job["id"]] = queue.result(scrape_job).get("screenshot") if scrape_job else ""
+            if screenshots[job["id"]]:
+                for version in job["payload"]["versions"]:
+                    version["screenshot"] = screenshots[job["id"]]
+
+        versions = [v for job in jobs for v in job["payload"]["versions"]]
+        version_ids = self.db.store_versions(versions)
+        for job in jobs:
+            count = len(job["payload"]["versions"])
+            ids, version_ids = version_ids[:count], version_ids[count:]
+            if screenshots[job["id"]] is None:
+                # Still being taken: whichever side hands over second fills the path in
+                path = queue.merge_result(job["payload"]["scrape_job"], {"version_ids": ids}).get("screenshot")
+                for version_id in ids if path else []:
+                    self.db.update_metadata(version_id, {"screenshot": path})
+            if job["payload"].get("review"):
+                self.reviews.enqueue(job["payload"]["versions"][-1], ids[-1], job["payload"]["ai_feedback"])
+            queue.complete(job, result={"version_ids": ids})
+
+    def close(self):
+        self.reviews.close()
+
+
+STAGE_CLASSES = {"scrape": ScrapeStage, "ai": AIStage, "index": IndexStage}
+
+
+def run_worker(stage, name, options):
+    """Worker process main loop: claim jobs for one stage until stopped (or idle)"""
+    queue = JobQueue(options["queue_path"])
+    handler = STAGE_CLASSES[stage](options)
+    upstream = QUEUE_STAGES[:QUEUE_STAGES.index(stage) + 1]
+    logger.info(f"Worker {name} started")
+    try:
+        while True:
+            jobs = queue.claim(stage, name, limit=handler.batch_size)
+            if not jobs:
+                if options["exit_when_idle"] and not queue.active(upstream):
+                    break
+                time.sleep(options["poll_interval"])
+                continue
+            try:
+                handler.process(queue, jobs)
+            except Exception as e:
+                logger.error(f"Worker {name} failed on {', '.join(j['chapter'] for j in jobs)}: {str(e)}")
+                for job in jobs:
+                    queue.fail(job, str(e))
+    finally:
+        handler.close()
+        queue.close()
+        logger.info(f"Worker {name} stopped")
+
+
+def start_workers(sizes, options):
+    """Launch sizes[stage] processes per stage; returns the processes"""
+    # spawn, not fork: Chromium, PyTorch and SQLite handles don't survive fork
+    ctx = multiprocessing.get_context("spawn")
+    options = dict(options, ai_workers=max(1, sizes.get("ai", 1)))
+    processes = []
+    for stage in QUEUE_STAGES:
+        for i in range(sizes.get(stage, 0)):
+            process = ctx.Process(target=run_worker, args=(stage, f"{stage}-{i + 1}", options),
+                                  name=f"{stage}-{i + 1}")
+            process.start()
+            processes.append(process)
+    return processes
+
+
+def format_queue_stats(stats):
+    return format_table(
+        ["stage", "queued", "running", "done", "failed", "per_min", "avg_s"],
+        [[stage, s["queued"], s["running"], s["done"], s["failed"],
+          f"{s['per_minute']:.1f}", f"{s['avg_seconds']:.2f}"] for stage, s in stats.items()]
+    )
+
+
+def supervise(processes, queue, interval):
+    """Print queue depth and throughput every interval seconds until all workers exit"""
+    try:
+        while any(p.is_alive() for p in processes):
+            for p in processes:
+                p.join(timeout=interval / max(1, len(processes)))
+            print(f"\n{time.strftime('%H:%M:%S')}  {sum(p.is_alive() for p in processes)} workers alive")
+            print(format_queue_stats(queue.stats()))
+    except KeyboardInterrupt:
+        logger.info("Stopping workers; unfinished jobs return to the queue when their lease expires")
+        for p in processes:
+            p.terminate()
+        for p in processes:
+            p.join()
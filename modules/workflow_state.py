@@ -0,0 +1,148 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from config import Config
+
+# Checkpoints in the order a chapter reaches them
+CHECKPOINTS = ["scraped", "ai_rewritten", "ai_reviewed", "done"]
+# Chapter text stays in the version store; checkpoints keep the version IDs instead
+TEXT_FIELDS = ("content", "original_content")
+
+
+class ChapterCheckpoint:
+    """Saved progress of one chapter: the last completed checkpoint and its outputs"""
+
+    def __init__(self, state, chapter, url, stage=None, data=None):
+        self.state = state
+        self.chapter = chapter
+        self.url = url
+        self.stage = stage
+        self.data = data or {}
+
+    def reached(self, stage):
+        return self.stage is not None and CHECKPOINTS.index(self.stage) >= CHECKPOINTS.index(stage)
+
+    def save(self, stage, version_id=None, **data):
+        """Record a completed stage; data is merged into what earlier stages saved.
+
+        version_id is the version the stage stored. chapter_data is saved
+        without its text, which chapter_data() reads back by those IDs. A
+        "done" checkpoint keeps only the final version_id.
+        """
+        self.stage = stage
+        if stage == "done":
+            self.data = {"version_id": version_id}
+        else:
+            if version_id:
+                self.data["version_ids"] = dict(self.data.get("version_ids", {}), **{stage: version_id})
+            if "chapter_data" in data:
+                data["chapter_data"] = {k: v for k, v in data["chapter_data"].items() if k not in TEXT_FIELDS}
+            self.data.update(data)
+        self.state._write(self.chapter, self.url, stage, "done" if stage == "done" else "running", self.data)
+
+    def chapter_data(self, content):
+        """Saved chapter_data with its text read back through content(version_id).
+
+        The original text is the first stored version and the current text
+        the latest. Returns None if either is missing from the store.
+        """
+        version_ids = self.data.get("version_ids", {})
+        stored = [version_ids[stage] for stage in CHECKPOINTS if stage in version_ids]
+        if not stored or "chapter_data" not in self.data:
+            return None
+        original, latest = content(stored[0]), content(stored[-1])
+        if original is None or latest is None:
+            return None
+        return dict(self.data["chapter_data"], original_content=original, content=latest)
+
+    def update_chapter_data(self, **fields):
+        """Patch saved chapter_data fields that become known after their stage (e.g. a screenshot path)"""
+        if self.stage is None or self.stage == "done" or "chapter_data" not in self.data:
+            return
+        self.data["chapter_data"].update(fields)
+        self.state._write(self.chapter, self.url, self.stage, "running", self.data)
+
+    def version_ids(self):
+        return list(self.data.get("version_ids", {}).values())
+
+    def fail(self, error):
+        self.state._write(self.chapter, self.url, self.stage, "failed", self.data, error)
+
+
+class WorkflowState:
+    """Durable per-chapter checkpoints, so a re-run resumes from the last completed stage"""
+
+    def __init__(self, path=None):
+        self.path = path or Config.WORKFLOW_STATE_PATH
+        self._lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS chapters (
+                chapter TEXT PRIMARY KEY,
+                url TEXT,
+                stage TEXT,
+                status TEXT,
+                data TEXT,
+                error TEXT,
+                attempts INTEGER DEFAULT 0,
+                updated_at REAL
+            );
+            CREATE TABLE IF NOT EXISTS tocs (
+                url TEXT PRIMARY KEY,
+                chapters TEXT,
+                updated_at REAL
+            );
+        """)
+        self._conn.commit()
+
+    def checkpoint(self, chapter, url, resume=True):
+        """Checkpoint for a chapter; a fresh one unless resuming the same chapter URL"""
+        if resume:
+            with self._lock:
+                row = self._conn.execute(
+                    "SELECT url, stage, data FROM chapters WHERE chapter = ?", (chapter,)
+                ).fetchone()
+            if row and row[0] == url:
+                return ChapterCheckpoint(self, chapter, url, row[1], json.loads(row[2] or "{}"))
+        return ChapterCheckpoint(self, chapter, url)
+
+    def _write(self, chapter, url, stage, status, data, error=None):
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO chapters (chapter, url, stage, status, data, error, attempts, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT(chapter) DO UPDATE SET url = excluded.url, stage = excluded.stage, "
+                "status = excluded.status, data = excluded.data, error = excluded.error, "
+                "attempts = chapters.attempts + (excluded.status = 'failed'), "
+                "updated_at = excluded.updated_at",
+                (chapter, url, stage, status, json.dumps(data), error, int(status == "failed"), time.time())
+            )
+            self._conn.commit()
+
+    def save_toc(self, url, chapters):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO tocs (url, chapters, updated_at) VALUES (?, ?, ?)",
+                (url, json.dumps(chapters), time.time())
+            )
+            self._conn.commit()
+
+    def load_toc(self, url):
+        """Chapter list saved for a table of contents, so a resumed run need not fetch it"""
+        with self._lock:
+            row = self._conn.execute("SELECT chapters FROM tocs WHERE url = ?", (url,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def summary(self):
+        """Chapter counts by status"""
+        with self._lock:
+            return dict(self._conn.execute("SELECT status, COUNT(*) FROM chapters GROUP BY status").fetchall())
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
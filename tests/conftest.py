@@ -0,0 +1,33 @@
+import os
+import sys
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import Config
+
+
+@pytest.fixture(autouse=True)
+def isolated_config(tmp_path, monkeypatch):
+    """Keep caches, logs and state out of the working tree, and make the fake model instant"""
+    for name, relative in [
+        ("SCREENSHOT_DIR", "screenshots"),
+        ("SCRAPE_CACHE_PATH", "cache/scrape_cache.sqlite3"),
+        ("AI_PARTIAL_DIR", "cache/partials"),
+        ("AI_METRICS_PATH", "logs/ai_metrics.jsonl"),
+        ("AI_CACHE_PATH", "cache/llm_responses.sqlite3"),
+        ("DB_PATH", "chroma_db"),
+        ("EMBEDDING_CACHE_PATH", "cache/embeddings.sqlite3"),
+        ("SEARCH_EVENTS_PATH", "state/search_events.jsonl"),
+        ("SEARCH_WEIGHTS_PATH", "state/search_weights.json"),
+        ("WORKFLOW_STATE_PATH", "state/workflow.sqlite3"),
+        ("JOB_QUEUE_PATH", "state/jobs.sqlite3"),
+        ("REVIEW_QUEUE_PATH", "state/reviews.sqlite3"),
+    ]:
+        monkeypatch.setattr(Config, name, str(tmp_path / relative))
+    monkeypatch.setattr(Config, "AI_BACKEND", "fake")
+    monkeypatch.setattr(Config, "EMBEDDING_BACKEND", "hashing")
+    monkeypatch.setattr(Config, "FAKE_MODEL_LATENCY", 0.0)
+    monkeypatch.setattr(Config, "FAKE_MODEL_FAILURE_RATE", 0.0)
+    monkeypatch.setattr(Config, "SCREENSHOT_POLICY", "off")
+    return tmp_path
@@ -0,0 +1,134 @@
+import asyncio
+import os
+import threading
+import pytest
+from config import Config
+from modules.ai_processor import AIProcessor, is_retryable
+from modules.fake_model import FakeChunk, FakeGenerativeModel, FakeQuotaError
+
+TEXT = " ".join(f"word{i}" for i in range(100))
+
+
+class CutOffModel(FakeGenerativeModel):
+    """Fake model whose first stream breaks after a few chunks"""
+
+    def __init__(self, error, after_chunks=2):
+        super().__init__()
+        self.error = error
+        self.after_chunks = after_chunks
+        self.prompts = []
+
+    def generate_content(self, prompt, generation_config=None, stream=False):
+        self.prompts.append(prompt)
+        response = super().generate_content(prompt, generation_config, stream)
+        if len(self.prompts) > 1:
+            return response
+        return self._cut(response)
+
+    def _cut(self, response):
+        for i, chunk in enumerate(response):
+            if i == self.after_chunks:
+                raise self.error
+            yield FakeChunk(chunk.text)
+
+
+def processor(model):
+    ai = AIProcessor(use_cache=False)
+    ai._models[ai.writer_model_name] = model
+    return ai
+
+
+def partial_files():
+    return os.listdir(Config.AI_PARTIAL_DIR) if os.path.isdir(Config.AI_PARTIAL_DIR) else []
+
+
+def test_stream_cut_off_mid_way_is_continued_not_repeated(monkeypatch):
+    monkeypatch.setattr(Config, "AI_BACKOFF_BASE", 0.0)
+    model = CutOffModel(FakeQuotaError("429 (fake)"))
+    chunks = list(processor(model).rewrite_chapter_stream(TEXT, chapter_name="Chapter1"))
+
+    assert "".join(chunks) == TEXT
+    assert len(model.prompts) == 2
+    assert "Continuation:" in model.prompts[1]
+    assert partial_files() == []
+
+
+def test_stream_cut_off_by_the_end_of_a_run_continues_in_the_next(monkeypatch):
+    model = CutOffModel(RuntimeError("connection lost"))
+    with pytest.raises(RuntimeError):
+        list(processor(model).rewrite_chapter_stream(TEXT, chapter_name="Chapter1"))
+    assert len(partial_files()) == 1
+
+    resumed = CutOffModel(None)
+    resumed.prompts.append("first run")
+    chunks = list(processor(resumed).rewrite_chapter_stream(TEXT, chapter_name="Chapter1"))
+
+    assert chunks[0] == " ".join(TEXT.split(" ")[:40]) + " "
+    assert "".join(chunks) == TEXT
+    assert "Continuation:" in resumed.prompts[1]
+    assert partial_files() == []
+
+
+def test_non_streamed_rewrite_finishes_a_cut_off_stream():
+    with pytest.raises(RuntimeError):
+        list(processor(CutOffModel(RuntimeError("connection lost"))).rewrite_chapter_stream(
+            TEXT, chapter_name="Chapter1"
+        ))
+    resumed = CutOffModel(None)
+    resumed.prompts.append("first run")
+
+    assert processor(resumed).rewrite_chapter(TEXT, chapter_name="Chapter1") == TEXT
+    assert "Continuation:" in resumed.prompts[1]
+
+
+def test_sync_and_async_calls_share_the_in_flight_limit(monkeypatch):
+    monkeypatch.setattr(Config, "AI_MAX_CONCURRENCY", 2)
+    model = FakeGenerativeModel(latency=0.05)
+    ai = processor(model)
+
+    threads = [threading.Thread(target=ai.rewrite_chapter, args=(TEXT,)) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+
+    async def rewrite_all():
+        await asyncio.gather(*[ai.rewrite_chapter_async(TEXT) for _ in range(3)])
+
+    asyncio.run(rewrite_all())
+    for thread in threads:
+        thread.join()
+    assert model.calls == 6
+    assert model.max_in_flight == 2
+
+
+def test_cancelled_async_waiter_gives_its_slot_back(monkeypatch):
+    monkeypatch.setattr(Config, "AI_MAX_CONCURRENCY", 1)
+    ai = processor(FakeGenerativeModel())
+
+    async def cancel_a_waiter():
+        ai._in_flight.acquire()
+        waiter = asyncio.create_task(ai._acquire_async())
+        await asyncio.sleep(0.01)
+        waiter.cancel()
+        ai._in_flight.release()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        await asyncio.sleep(0.05)
+
+    asyncio.run(cancel_a_waiter())
+    assert ai._in_flight.acquire(blocking=False)
+
+
+class ConnectionError(Exception):
+    """Unrelated error that happens to share the built-in's name"""
+
+
+@pytest.mark.parametrize("error, retryable", [
+    (FakeQuotaError("429"), True),
+    (ConnectionResetError("reset by peer"), True),
+    (TimeoutError("read timed out"), True),
+    (asyncio.TimeoutError(), True),
+    (ConnectionError("not a network error"), False),
+    (ValueError("bad prompt"), False),
+])
+def test_retryable_errors(error, retryable):
+    assert is_retryable(error) == retryable
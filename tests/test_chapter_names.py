@@ -0,0 +1,32 @@
+import json
+from modules.pipeline import load_manifest
+from modules.scraper import ChapterScraper
+from utils.helpers import unique_slugs
+
+TOC = "http://books.example/toc.html"
+
+
+def test_repeated_slugs_get_their_position_appended():
+    assert unique_slugs(["Part 1", "Part 1", "Intro", "Part 1"]) == ["Part_1", "Part_1_2", "Intro", "Part_1_4"]
+    assert unique_slugs(["A_2", "A", "A"]) == ["A_2", "A", "A_3"]
+    assert unique_slugs(["B", "B", "B_2"]) == ["B", "B_2", "B_2_3"]
+
+
+def test_table_of_contents_chapters_have_unique_names():
+    links = [("Chapter 1", "c1.html"), ("Next", "c2.html"), ("Next", "c3.html"), ("Next", "c2.html#top")]
+    chapters = ChapterScraper(use_cache=False)._links_to_chapters(TOC, links)
+    assert chapters == [
+        {"chapter_name": "Chapter_1", "url": "http://books.example/c1.html"},
+        {"chapter_name": "Next", "url": "http://books.example/c2.html"},
+        {"chapter_name": "Next_3", "url": "http://books.example/c3.html"},
+    ]
+
+
+def test_manifest_chapters_have_unique_names(tmp_path):
+    path = tmp_path / "book.json"
+    path.write_text(json.dumps([
+        {"url": "http://books.example/a.html", "chapter_name": "Prologue"},
+        {"url": "http://books.example/b.html", "chapter_name": "Prologue"},
+        "http://books.example/c.html",
+    ]))
+    assert [c["chapter_name"] for c in load_manifest(str(path))] == ["Prologue", "Prologue_2", "Chapter3"]
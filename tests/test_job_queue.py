@@ -0,0 +1,56 @@
+import time
+import pytest
+from modules.job_queue import JobQueue
+
+
+@pytest.fixture
+def jobs(tmp_path):
+    return JobQueue(str(tmp_path / "jobs.sqlite3"), lease_seconds=0.2, max_attempts=2)
+
+
+def test_job_claims_do_not_overlap(jobs):
+    jobs.enqueue_many("scrape", [(f"c{i}", {"n": i}) for i in range(5)])
+    first = jobs.claim("scrape", "w1", limit=3)
+    second = jobs.claim("scrape", "w2", limit=3)
+    assert [job["payload"]["n"] for job in first] == [0, 1, 2]
+    assert [job["payload"]["n"] for job in second] == [3, 4]
+    assert jobs.claim("scrape", "w3") == []
+
+
+def test_expired_job_lease_is_reclaimed(jobs):
+    jobs.enqueue("scrape", "c1", {})
+    job, = jobs.claim("scrape", "w1")
+    assert jobs.claim("scrape", "w2") == []
+    time.sleep(0.25)
+    reclaimed, = jobs.claim("scrape", "w2")
+    assert reclaimed["id"] == job["id"]
+    assert reclaimed["attempts"] == 2
+
+
+def test_complete_hands_the_job_to_the_next_stage(jobs):
+    jobs.enqueue("scrape", "c1", {"url": "u"})
+    job, = jobs.claim("scrape", "w1")
+    jobs.complete(job, "ai", {"chapter_data": {"content": "text"}}, result={"ok": True})
+    time.sleep(0.25)
+    assert jobs.claim("scrape", "w2") == []
+    next_job, = jobs.claim("ai", "w2")
+    assert next_job["chapter"] == "c1"
+    assert next_job["payload"] == {"chapter_data": {"content": "text"}}
+
+
+def test_failed_job_is_retried_until_max_attempts(jobs):
+    jobs.enqueue("scrape", "c1", {})
+    job, = jobs.claim("scrape", "w1")
+    assert jobs.fail(job, "boom") == "queued"
+    job, = jobs.claim("scrape", "w1")
+    assert jobs.fail(job, "boom") == "failed"
+    assert jobs.claim("scrape", "w1") == []
+
+
+def test_merged_results_reach_whichever_side_hands_over_second(jobs):
+    jobs.enqueue("scrape", "c1", {})
+    job, = jobs.claim("scrape", "w1")
+    jobs.complete(job, result={"chars": 4})
+    assert jobs.merge_result(job["id"], {"version_ids": ["v1"]}) == {"chars": 4}
+    assert jobs.merge_result(job["id"], {"screenshot": "c1.jpg"})["version_ids"] == ["v1"]
+    assert jobs.result(job["id"]) == {"chars": 4, "version_ids": ["v1"], "screenshot": "c1.jpg"}
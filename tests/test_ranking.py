@@ -0,0 +1,63 @@
+import random
+import numpy as np
+from modules.ranking import DEFAULT_WEIGHTS, WEIGHT_NAMES, mean_reciprocal_rank, train_weights
+
+START = np.array([DEFAULT_WEIGHTS[name] for name in WEIGHT_NAMES])
+RELEVANCE, RECENCY, RATING, TRUST = range(4)
+
+
+def make_events(pick, count=200, seed=0):
+    """Sessions of five results each, where the user selects the result pick(features) chooses"""
+    rng = random.Random(seed)
+    events = []
+    for n in range(count):
+        features = [[rng.random(), rng.random(), rng.random(), float(rng.random() < 0.3)] for _ in range(5)]
+        shown = [f"s{n}_r{i}" for i in range(5)]
+        events.append({"features": features, "shown": shown, "selected": shown[pick(features)]})
+    return events
+
+
+def by(column):
+    return lambda features: max(range(len(features)), key=lambda i: features[i][column])
+
+
+def test_selections_by_rating_raise_its_weight_relative_to_relevance():
+    events = make_events(by(RATING))
+    weights = train_weights(events, START, learning_rate=0.5, epochs=50)
+    assert weights[RATING] > START[RATING]
+    assert weights[RELEVANCE] < START[RELEVANCE]
+    assert weights[RATING] / weights[RELEVANCE] > START[RATING] / START[RELEVANCE]
+
+
+def test_selections_by_relevance_raise_its_weight():
+    events = make_events(by(RELEVANCE))
+    weights = train_weights(events, START, learning_rate=0.5, epochs=50)
+    assert weights[RELEVANCE] > START[RELEVANCE]
+    assert weights[RECENCY] < START[RECENCY]
+
+
+def test_preferring_human_edits_raises_author_trust():
+    def editor_first(features):
+        editors = [i for i, row in enumerate(features) if row[TRUST]]
+        return editors[0] if editors else by(RELEVANCE)(features)
+
+    weights = train_weights(make_events(editor_first), START, learning_rate=0.5, epochs=50)
+    assert weights[TRUST] > START[TRUST]
+
+
+def test_training_improves_ranking_of_selected_results():
+    events = make_events(by(RATING))
+    before, _ = mean_reciprocal_rank(events, START)
+    after, _ = mean_reciprocal_rank(events, train_weights(events, START, learning_rate=0.5, epochs=50))
+    assert after > before
+
+
+def test_weights_stay_non_negative_and_input_is_not_modified():
+    start = START.copy()
+    weights = train_weights(make_events(by(RATING)), start, learning_rate=5.0, l2=1.0, epochs=20)
+    assert (weights >= 0).all()
+    assert (start == START).all()
+
+
+def test_no_events_leaves_weights_unchanged():
+    assert (train_weights([], START, learning_rate=0.5) == START).all()
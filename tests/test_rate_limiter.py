@@ -0,0 +1,50 @@
+import asyncio
+import time
+from modules.rate_limiter import RateLimiter
+
+
+def test_burst_within_the_quota_does_not_wait():
+    limiter = RateLimiter(requests_per_minute=60, tokens_per_minute=10 ** 6)
+    started = time.monotonic()
+    waits = [limiter.acquire(100) for _ in range(60)]
+    assert waits == [0.0] * 60
+    assert time.monotonic() - started < 0.5
+
+
+def test_requests_beyond_the_quota_are_spaced_at_the_refill_rate():
+    # 600 requests/min refill one every 0.1s once the minute's burst is spent
+    limiter = RateLimiter(requests_per_minute=600, tokens_per_minute=10 ** 9)
+    for _ in range(600):
+        limiter.acquire()
+    started = time.monotonic()
+    for _ in range(3):
+        limiter.acquire()
+    assert 0.25 <= time.monotonic() - started < 0.6
+
+
+def test_token_quota_limits_large_prompts():
+    limiter = RateLimiter(requests_per_minute=10 ** 6, tokens_per_minute=6000)
+    assert limiter.acquire(6000) == 0.0
+    # The next 100 tokens refill at 100 per second
+    wait = limiter.acquire(100)
+    assert 0.9 <= wait <= 1.0
+
+
+def test_usage_recorded_after_the_call_delays_later_requests():
+    limiter = RateLimiter(requests_per_minute=10 ** 6, tokens_per_minute=6000)
+    limiter.record_usage(6000)
+    assert limiter.acquire(0) == 0.0
+    assert limiter.acquire(50) > 0.4
+
+
+def test_async_callers_share_the_quota():
+    limiter = RateLimiter(requests_per_minute=600, tokens_per_minute=10 ** 9)
+    for _ in range(600):
+        limiter.acquire()
+
+    async def burst():
+        started = time.monotonic()
+        await asyncio.gather(*[limiter.acquire_async() for _ in range(3)])
+        return time.monotonic() - started
+
+    assert 0.25 <= asyncio.run(burst()) < 0.6
@@ -0,0 +1,219 @@
+import argparse
+import asyncio
+import concurrent.futures
+import pytest
+
+# Needs the real Chroma client from requirements.txt; a stub package has no __version__
+pytest.importorskip("chromadb", minversion="0.4.22")
+
+from main import run_chapter
+from modules.ai_processor import AIProcessor
+from modules.pipeline import BookPipeline
+from modules.version_db import VersionDB
+from modules.workflow_state import WorkflowState
+
+URL = "http://books.example/chapter-1.html"
+TEXT = "It was a dark and stormy night.\n\nThe ship sailed at dawn and nobody saw it go.\n"
+
+
+class CountingScraper:
+    def __init__(self):
+        self.calls = 0
+
+    def _scraped(self, url):
+        self.calls += 1
+        return {"content": TEXT, "screenshot": "", "screenshot_task": None, "source_url": url}
+
+    def scrape_chapter(self, url, chapter_name):
+        return self._scraped(url)
+
+    async def scrape_chapter_async(self, url, chapter_name):
+        return self._scraped(url)
+
+    async def close(self):
+        pass
+
+
+class NoSearch:
+    def search(self, query, chapter_name=None):
+        return []
+
+    def log_stats(self):
+        pass
+
+
+def single_args(resume):
+    return argparse.Namespace(url=URL, chapter_name="Chapter1", resume=resume, skip_human=True,
+                              review_queue=False, regenerate=False)
+
+
+@pytest.fixture
+def db(tmp_path):
+    return VersionDB(path=str(tmp_path / "db"), embedding_cache_path=str(tmp_path / "embeddings.sqlite3"))
+
+
+def test_batch_mode_resumes_a_single_url_checkpoint(tmp_path, db, monkeypatch):
+    state = WorkflowState(str(tmp_path / "workflow.sqlite3"))
+    scraper = CountingScraper()
+    ai = AIProcessor(use_cache=False)
+
+    def quota_error(*args, **kwargs):
+        raise RuntimeError("quota exceeded")
+
+    with monkeypatch.context() as m:
+        m.setattr(ai, "rewrite_chapter", quota_error)
+        with pytest.raises(RuntimeError):
+            run_chapter(single_args(resume=False), scraper, ai, db, NoSearch(), None, state)
+    assert state.checkpoint("Chapter1", URL).stage == "scraped"
+
+    pipeline = BookPipeline(scraper, ai, db, skip_human=True, state=state, resume=True)
+    result, = pipeline.run([{"url": URL, "chapter_name": "Chapter1"}])
+
+    assert result["status"] == "done"
+    assert result["resumed_from"] == "scraped"
+    assert scraper.calls == 1
+    assert state.checkpoint("Chapter1", URL).stage == "done"
+    statuses = [row["status"] for row in db.lineage.history("Chapter1")]
+    assert statuses == ["scraped", "ai_rewritten", "auto_approved"]
+
+
+def test_single_url_mode_resumes_a_batch_checkpoint(tmp_path, db, monkeypatch):
+    state = WorkflowState(str(tmp_path / "workflow.sqlite3"))
+    scraper = CountingScraper()
+    ai = AIProcessor(use_cache=False)
+
+    async def quota_error(*args, **kwargs):
+        raise RuntimeError("quota exceeded")
+
+    with monkeypatch.context() as m:
+        m.setattr(ai, "review_chapter_async", quota_error)
+        pipeline = BookPipeline(scraper, ai, db, skip_human=True, state=state)
+        result, = pipeline.run([{"url": URL, "chapter_name": "Chapter1"}])
+    assert result["status"] == "failed"
+    assert state.checkpoint("Chapter1", URL).stage == "ai_rewritten"
+
+    rewrites = []
+    monkeypatch.setattr(ai, "rewrite_chapter", lambda *args, **kwargs: rewrites.append(args))
+    run_chapter(single_args(resume=True), scraper, ai, db, NoSearch(), None, state)
+
+    assert scraper.calls == 1
+    assert rewrites == []
+    checkpoint = state.checkpoint("Chapter1", URL)
+    assert checkpoint.stage == "done"
+    assert db.get_version(checkpoint.data["version_id"])["metadata"]["status"] == "auto_approved"
+
+
+def test_finished_chapter_is_skipped_when_resumed_in_either_mode(tmp_path, db):
+    state = WorkflowState(str(tmp_path / "workflow.sqlite3"))
+    scraper = CountingScraper()
+    ai = AIProcessor(use_cache=False)
+    run_chapter(single_args(resume=False), scraper, ai, db, NoSearch(), None, state)
+    version_id = state.checkpoint("Chapter1", URL).data["version_id"]
+
+    result, = BookPipeline(scraper, ai, db, skip_human=True, state=state, resume=True).run(
+        [{"url": URL, "chapter_name": "Chapter1"}]
+    )
+    run_chapter(single_args(resume=True), scraper, ai, db, NoSearch(), None, state)
+
+    assert result["status"] == "skipped"
+    assert result["version_id"] == version_id
+    assert scraper.calls == 1
+
+
+def test_checkpoints_keep_version_ids_instead_of_text(tmp_path, db, monkeypatch):
+    state = WorkflowState(str(tmp_path / "workflow.sqlite3"))
+    ai = AIProcessor(use_cache=False)
+
+    async def quota_error(*args, **kwargs):
+        raise RuntimeError("quota exceeded")
+
+    with monkeypatch.context() as m:
+        m.setattr(ai, "review_chapter_async", quota_error)
+        BookPipeline(CountingScraper(), ai, db, skip_human=True, state=state).run(
+            [{"url": URL, "chapter_name": "Chapter1"}]
+        )
+    checkpoint = state.checkpoint("Chapter1", URL)
+    assert "content" not in checkpoint.data["chapter_data"]
+    assert "original_content" not in checkpoint.data["chapter_data"]
+    assert set(checkpoint.data["version_ids"]) == {"scraped", "ai_rewritten"}
+    assert checkpoint.chapter_data(db.lineage.content)["original_content"] == TEXT
+
+    BookPipeline(CountingScraper(), ai, db, skip_human=True, state=state, resume=True).run(
+        [{"url": URL, "chapter_name": "Chapter1"}]
+    )
+    checkpoint = state.checkpoint("Chapter1", URL)
+    assert checkpoint.stage == "done"
+    assert list(checkpoint.data) == ["version_id"]
+
+
+def test_checkpoint_whose_versions_were_lost_starts_over(tmp_path, db):
+    state = WorkflowState(str(tmp_path / "workflow.sqlite3"))
+    # As if the run stopped before the write buffer was flushed
+    state.checkpoint("Chapter1", URL).save(
+        "ai_rewritten", version_id="Chapter1_missing",
+        chapter_data={"chapter_name": "Chapter1", "source_url": URL, "screenshot": "", "status": "ai_rewritten"}
+    )
+    scraper = CountingScraper()
+    result, = BookPipeline(scraper, AIProcessor(use_cache=False), db, skip_human=True, state=state,
+                           resume=True).run([{"url": URL, "chapter_name": "Chapter1"}])
+
+    assert result["status"] == "done"
+    assert "resumed_from" not in result
+    assert scraper.calls == 1
+
+
+class ScreenshotScraper(CountingScraper):
+    """Scrapes like CountingScraper, with a screenshot that finishes after the text"""
+
+    def scrape_chapter(self, url, chapter_name):
+        future = concurrent.futures.Future()
+        future.set_result("screenshots/Chapter1.jpg")
+        return dict(self._scraped(url), screenshot_task=future)
+
+    async def scrape_chapter_async(self, url, chapter_name):
+        async def screenshot():
+            await asyncio.sleep(0.01)
+            return "screenshots/Chapter1.jpg"
+        return dict(self._scraped(url), screenshot_task=asyncio.create_task(screenshot()))
+
+
+def test_screenshot_finished_after_a_failure_is_kept_for_the_resumed_run(tmp_path, db, monkeypatch):
+    state = WorkflowState(str(tmp_path / "workflow.sqlite3"))
+    ai = AIProcessor(use_cache=False)
+
+    async def quota_error(*args, **kwargs):
+        raise RuntimeError("quota exceeded")
+
+    with monkeypatch.context() as m:
+        m.setattr(ai, "rewrite_chapter_async", quota_error)
+        result, = BookPipeline(ScreenshotScraper(), ai, db, skip_human=True, state=state).run(
+            [{"url": URL, "chapter_name": "Chapter1"}]
+        )
+    assert result["status"] == "failed"
+    checkpoint = state.checkpoint("Chapter1", URL)
+    assert checkpoint.data["chapter_data"]["screenshot"] == "screenshots/Chapter1.jpg"
+    scraped_id = checkpoint.version_ids()[0]
+    assert db.get_version(scraped_id)["metadata"]["screenshot"] == "screenshots/Chapter1.jpg"
+
+    run_chapter(single_args(resume=True), CountingScraper(), ai, db, NoSearch(), None, state)
+    final_id = state.checkpoint("Chapter1", URL).data["version_id"]
+    assert db.get_version(final_id)["metadata"]["screenshot"] == "screenshots/Chapter1.jpg"
+
+
+def test_single_url_mode_fills_in_the_screenshot_taken_in_the_background(tmp_path, db):
+    state = WorkflowState(str(tmp_path / "workflow.sqlite3"))
+    run_chapter(single_args(resume=False), ScreenshotScraper(), AIProcessor(use_cache=False), db,
+                NoSearch(), None, state)
+    for row in db.lineage.history("Chapter1"):
+        assert db.get_version(row["version_id"])["metadata"]["screenshot"] == "screenshots/Chapter1.jpg"
+
+
+def test_chapter_queued_for_review_is_not_streamed_to_the_terminal(tmp_path, db):
+    from modules.review_queue import ReviewQueue
+    state = WorkflowState(str(tmp_path / "workflow.sqlite3"))
+    args = single_args(resume=False)
+    args.skip_human, args.review_queue = False, True
+    # No interface: streaming the rewrite would fail on it
+    run_chapter(args, CountingScraper(), AIProcessor(use_cache=False), db, NoSearch(), None, state)
+
+    assert ReviewQueue().stats()["pending"] == 1
@@ -0,0 +1,115 @@
+import time
+import pytest
+from modules.interface import HumanReviewInterface
+from modules.review_queue import ReviewQueue
+
+
+def chapter(name):
+    return {"chapter_name": name, "content": f"{name} rewritten\n", "original_content": f"{name}\n"}
+
+
+@pytest.fixture
+def reviews(tmp_path):
+    queue = ReviewQueue(str(tmp_path / "reviews.sqlite3"), lease_seconds=0.2)
+    yield queue
+    queue.close()
+
+
+def test_review_claims_are_exclusive_and_oldest_first(reviews):
+    first = reviews.enqueue(chapter("One"), "One_1")
+    second = reviews.enqueue(chapter("Two"), "Two_1")
+    assert reviews.claim("ann")["id"] == first
+    assert reviews.claim("bob")["id"] == second
+    assert reviews.claim("cat") is None
+
+
+def test_review_enqueue_is_idempotent(reviews):
+    assert reviews.enqueue(chapter("One"), "One_1") is not None
+    assert reviews.enqueue(chapter("One"), "One_1") is None
+    assert reviews.stats()["pending"] == 1
+
+
+def test_expired_review_lease_goes_to_the_next_reviewer(reviews):
+    review_id = reviews.enqueue(chapter("One"), "One_1")
+    reviews.claim("ann")
+    assert reviews.claim("bob") is None
+    time.sleep(0.25)
+    assert not reviews.holds(review_id, "ann")
+    assert reviews.claim("bob")["id"] == review_id
+    assert reviews.holds(review_id, "bob")
+
+
+def test_complete_requires_a_live_claim(reviews):
+    review_id = reviews.enqueue(chapter("One"), "One_1")
+    reviews.claim("ann")
+    with pytest.raises(KeyError):
+        reviews.complete(review_id, "bob", {"rating": "5"}, "One_2")
+
+    time.sleep(0.25)
+    with pytest.raises(KeyError):
+        reviews.complete(review_id, "ann", {"rating": "5"}, "One_2")
+
+    reviews.claim("bob")
+    reviews.complete(review_id, "bob", {"rating": "4"}, "One_2")
+    assert reviews.stats() == {"pending": 0, "claimed": 0, "done": 1, "by_reviewer": {"bob": 1}}
+    assert reviews.get(review_id)["chapter_data"] == {}
+    with pytest.raises(KeyError):
+        reviews.complete(review_id, "bob", {"rating": "4"}, "One_2")
+
+
+def test_released_review_is_claimable_again(reviews):
+    review_id = reviews.enqueue(chapter("One"), "One_1")
+    reviews.claim("ann")
+    reviews.release(review_id, "ann")
+    assert reviews.claim("bob")["id"] == review_id
+
+
+def test_saved_edits_replace_overlapping_drafts(reviews):
+    review_id = reviews.enqueue(chapter("One"), "One_1")
+    reviews.claim("ann")
+    reviews.save_edit(review_id, "ann", 0, 5, "first")
+    reviews.save_edit(review_id, "ann", 5, 10, "second")
+    reviews.save_edit(review_id, "ann", 3, 6, "overlap")
+    assert reviews.get(review_id)["edits"] == [(3, 6, "overlap")]
+    reviews.save_edit(review_id, "ann", 3, 6, None)
+    assert reviews.get(review_id)["edits"] == []
+    with pytest.raises(KeyError):
+        reviews.save_edit(review_id, "bob", 0, 1, "not mine")
+
+
+def test_renew_extends_only_a_live_claim(reviews):
+    review_id = reviews.enqueue(chapter("One"), "One_1")
+    reviews.claim("ann")
+    time.sleep(0.15)
+    assert reviews.renew(review_id, "ann")
+    time.sleep(0.15)
+    # Still held thanks to the renewal, so nobody else can claim it
+    assert reviews.claim("bob") is None
+    assert not reviews.renew(review_id, "bob")
+    time.sleep(0.25)
+    assert not reviews.renew(review_id, "ann")
+
+
+class RecordingDB:
+    def __init__(self):
+        self.stored = []
+
+    def store_version(self, chapter_data):
+        self.stored.append(chapter_data)
+        return f"{chapter_data['chapter_name']}_{len(self.stored)}"
+
+
+def test_expired_claim_stores_no_review(reviews):
+    db = RecordingDB()
+    interface = HumanReviewInterface(None, db)
+    reviews.enqueue(chapter("One"), "One_1")
+    review = reviews.claim("ann")
+    time.sleep(0.25)
+    with pytest.raises(KeyError):
+        interface.complete_review(reviews, review, {"reviewer": "ann", "rating": "5"})
+    assert db.stored == []
+
+    review = reviews.claim("bob")
+    assert interface.complete_review(reviews, review, {"reviewer": "bob", "rating": "5"}) == "One_1"
+    assert db.stored[0]["parent_id"] == "One_1"
+    assert reviews.stats()["by_reviewer"] == {"bob": 1}
@@ -0,0 +1,81 @@
+import random
+import pytest
+from utils.text_delta import apply_delta, diff_rows, make_delta, page_rows, replace_lines
+
+WORDS = ["the", "ship", "sailed", "at", "dawn", "and", "nobody", "saw", "it", "go"]
+
+
+def random_text(rng, lines):
+    return "".join(" ".join(rng.choice(WORDS) for _ in range(rng.randint(0, 8))) + "\n" for _ in range(lines))
+
+
+def edit(rng, text):
+    lines = text.splitlines(keepends=True)
+    for _ in range(rng.randint(1, 6)):
+        position = rng.randint(0, len(lines))
+        action = rng.choice(["insert", "delete", "replace"])
+        if action == "insert" or not lines:
+            lines.insert(position, "inserted " + rng.choice(WORDS) + "\n")
+        elif action == "delete":
+            del lines[min(position, len(lines) - 1)]
+        else:
+            lines[min(position, len(lines) - 1)] = "replaced " + rng.choice(WORDS) + "\n"
+    return "".join(lines)
+
+
+@pytest.mark.parametrize("old, new", [
+    ("", ""),
+    ("", "new text\n"),
+    ("old text\n", ""),
+    ("one\ntwo\nthree\n", "one\n2\nthree\n"),
+    ("no trailing newline", "no trailing newline\nmore"),
+    ("a\nb\n", "b\na\n"),
+    ("crlf\r\nlines\r\n", "crlf\r\nchanged\r\n"),
+])
+def test_delta_round_trip(old, new):
+    assert apply_delta(old, make_delta(old, new)) == new
+
+
+def test_delta_round_trip_random_edits():
+    rng = random.Random(7)
+    for _ in range(200):
+        old = random_text(rng, rng.randint(0, 40))
+        new = edit(rng, old)
+        assert apply_delta(old, make_delta(old, new)) == new
+
+
+def test_delta_copies_unchanged_lines():
+    old = "".join(f"line {i}\n" for i in range(100))
+    new = old.replace("line 50\n", "line fifty\n")
+    ops = make_delta(old, new)
+    assert ops == [["c", 0, 50], ["i", "line fifty\n"], ["c", 51, 100]]
+
+
+def test_replace_lines_keeps_line_breaks():
+    assert replace_lines("a\nb\nc\n", [(1, 2, "B")]) == "a\nB\nc\n"
+    assert replace_lines("a\nb\nc\n", [(0, 1, "A\n"), (2, 3, "")]) == "A\nb\n"
+
+
+def covered_new_lines(rows, page_size, new_line_count):
+    """New line indexes covered by each page's (start, end) range, page by page"""
+    _, _, pages, _ = page_rows(rows, 1, page_size, new_line_count)
+    return [list(range(*page_rows(rows, page, page_size, new_line_count)[3])) for page in range(1, pages + 1)]
+
+
+@pytest.mark.parametrize("page_size", [1, 3, 7, 40])
+def test_page_rows_cover_each_new_line_once(page_size):
+    rng = random.Random(page_size)
+    for _ in range(50):
+        old = random_text(rng, rng.randint(0, 60))
+        new = edit(rng, old)
+        new_line_count = len(new.splitlines())
+        rows = diff_rows(old, new, context=2)
+        covered = [line for page in covered_new_lines(rows, page_size, new_line_count) for line in page]
+        assert covered == list(range(new_line_count))
+
+
+def test_page_rows_clamps_page_number():
+    rows = diff_rows("a\nb\n", "a\nc\n")
+    assert page_rows(rows, 0, 1, 2)[1] == 1
+    assert page_rows(rows, 99, 1, 2)[1] == len(rows)
+    assert page_rows([], 1, 10, 0) == ([], 1, 1, (0, 0))
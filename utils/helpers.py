@@ -0,0 +1,58 @@
+import math
+import re
+
+
+def slugify(text, default="chapter"):
+    """Turn free text into a name that is safe for ids and file names"""
+    slug = re.sub(r"[^A-Za-z0-9_-]+", "_", str(text)).strip("_")
+    return slug or default
+
+
+def unique_slugs(names):
+    """Slugify a list of names, suffixing the 1-based position of any slug that repeats"""
+    slugs, seen = [], set()
+    for i, name in enumerate(names, 1):
+        slug = slugify(name)
+        while slug in seen:
+            slug = f"{slug}_{i}"
+        seen.add(slug)
+        slugs.append(slug)
+    return slugs
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a list of numbers (0 for an empty list)"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, math.ceil(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def format_table(headers, rows):
+    """Render rows as a plain-text table for terminal summaries"""
+    rows = [[str(cell) for cell in row] for row in rows]
+    widths = [
+        max([len(str(header))] + [len(row[i]) for row in rows])
+        for i, header in enumerate(headers)
+    ]
+    lines = [
+        "  ".join(str(h).ljust(w) for h, w in zip(headers, widths)),
+        "  ".join("-" * w for w in widths)
+    ]
+    lines.extend("  ".join(cell.ljust(w) for cell, w in zip(row, widths)) for row in rows)
+    return "\n".join(line.rstrip() for line in lines)
+
+
+def estimate_tokens(text):
+    """Rough token count (about four characters per token)"""
+    return max(1, len(text or "") // 4)
+
+
+def highlight_terms(text, query, marker="**"):
+    """Wrap whole-word matches of the query's terms in marker"""
+    terms = sorted({t for t in re.findall(r"\w+", query.lower()) if len(t) > 2}, key=len, reverse=True)
+    if not terms:
+        return text
+    pattern = re.compile(r"\b(" + "|".join(map(re.escape, terms)) + r")\b", re.IGNORECASE)
+    return pattern.sub(lambda m: f"{marker}{m.group(0)}{marker}", text)
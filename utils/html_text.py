@@ -0,0 +1,99 @@
+import re
+from html.parser import HTMLParser
+
+VOID_TAGS = {
+    "area", "base", "br", "col", "embed", "hr", "img", "input",
+    "link", "meta", "param", "source", "track", "wbr"
+}
+SKIP_TAGS = {"script", "style", "noscript", "template", "head", "title"}
+PARAGRAPH_TAGS = {"p", "h1", "h2", "h3", "h4", "h5", "h6", "blockquote", "pre"}
+BLOCK_TAGS = PARAGRAPH_TAGS | {
+    "div", "section", "article", "main", "header", "footer", "nav", "aside",
+    "ul", "ol", "li", "dl", "dt", "dd", "table", "tr", "center", "poem", "br", "hr"
+}
+
+
+def parse_selector(selector):
+    """Split a simple CSS selector (tag, #id, .class, tag.class) into parts"""
+    match = re.fullmatch(r"([a-zA-Z0-9]*)(?:#([\w-]+))?(?:\.([\w-]+))?", selector.strip())
+    if not match:
+        raise ValueError(f"Unsupported selector: {selector}")
+    tag, element_id, css_class = match.groups()
+    return (tag or "").lower(), element_id, css_class
+
+
+class SelectorTextExtractor(HTMLParser):
+    """Collect the visible text of the first element matching each selector"""
+
+    def __init__(self, selectors):
+        super().__init__(convert_charrefs=True)
+        self.selectors = [(s, parse_selector(s)) for s in selectors]
+        self.captures = {}
+        self._stack = []
+        self._active = []
+        self._skip_depth = 0
+
+    def _matches(self, tag, attrs, parsed):
+        want_tag, want_id, want_class = parsed
+        if want_tag and tag != want_tag:
+            return False
+        if want_id and attrs.get("id") != want_id:
+            return False
+        if want_class and want_class not in (attrs.get("class") or "").split():
+            return False
+        return True
+
+    def _emit(self, text):
+        for selector, _ in self._active:
+            self.captures[selector].append(text)
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        if tag in BLOCK_TAGS:
+            self._emit("\n\n" if tag in PARAGRAPH_TAGS else "\n")
+        if tag in VOID_TAGS:
+            return
+
+        self._stack.append(tag)
+        if tag in SKIP_TAGS:
+            self._skip_depth += 1
+        for selector, parsed in self.selectors:
+            if selector not in self.captures and self._matches(tag, attrs, parsed):
+                self.captures[selector] = []
+                self._active.append((selector, len(self._stack)))
+
+    def handle_endtag(self, tag):
+        if tag not in self._stack:
+            return
+        # Pop until the matching tag, closing anything left open inside it
+        while self._stack:
+            open_tag = self._stack.pop()
+            if open_tag in SKIP_TAGS:
+                self._skip_depth -= 1
+            if open_tag in BLOCK_TAGS:
+                self._emit("\n\n" if open_tag in PARAGRAPH_TAGS else "\n")
+            self._active = [(s, depth) for s, depth in self._active if depth <= len(self._stack)]
+            if open_tag == tag:
+                break
+
+    def handle_data(self, data):
+        if self._skip_depth == 0 and self._active:
+            self._emit(re.sub(r"\s+", " ", data))
+
+    def text_for(self, selector):
+        raw = "".join(self.captures.get(selector, []))
+        lines = [line.strip() for line in raw.split("\n")]
+        return re.sub(r"\n{3,}", "\n\n", "\n".join(lines)).strip()
+
+
+def extract_text(html, selectors):
+    """Return text for the first selector that yields any, or '' if none do"""
+    parser = SelectorTextExtractor(selectors)
+    parser.feed(html)
+    parser.close()
+
+    for selector in selectors:
+        text = parser.text_for(selector)
+        if text:
+            return text
+    return ""
@@ -0,0 +1,49 @@
+import threading
+from collections import OrderedDict
+
+
+class LRUCache:
+    """Thread-safe in-memory LRU map with hit/miss counters (max_entries 0 disables it)"""
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0, "invalidations": 0}
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.stats["hits"] += 1
+                return self._entries[key]
+            self.stats["misses"] += 1
+            return None
+
+    def put(self, key, value):
+        if not self.max_entries:
+            return
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.stats["evictions"] += 1
+
+    def pop(self, key):
+        """Drop one entry, e.g. when its backing row is deleted"""
+        with self._lock:
+            return self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            if self._entries:
+                self.stats["invalidations"] += 1
+            self._entries.clear()
+
+    def hit_rate(self):
+        lookups = self.stats["hits"] + self.stats["misses"]
+        return self.stats["hits"] / lookups if lookups else 0.0
+
+    def __len__(self):
+        return len(self._entries)
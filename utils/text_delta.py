@@ -0,0 +1,122 @@
+import difflib
+import re
+
+
+def make_delta(old, new):
+    """Line-level delta that turns old into new.
+
+    A list of ["c", start, end] (copy old lines start:end) and ["i", text]
+    (insert text) operations, small enough to JSON-encode.
+    """
+    old_lines = old.splitlines(keepends=True)
+    new_lines = new.splitlines(keepends=True)
+    ops = []
+    matcher = difflib.SequenceMatcher(None, old_lines, new_lines, autojunk=False)
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == "equal":
+            ops.append(["c", i1, i2])
+        elif tag in ("replace", "insert"):
+            ops.append(["i", "".join(new_lines[j1:j2])])
+    return ops
+
+
+def apply_delta(old, ops):
+    old_lines = old.splitlines(keepends=True)
+    parts = []
+    for op in ops:
+        if op[0] == "c":
+            parts.extend(old_lines[op[1]:op[2]])
+        else:
+            parts.append(op[1])
+    return "".join(parts)
+
+
+def replace_lines(text, edits):
+    """Replace line ranges of text: edits are (start, end, replacement) with non-overlapping ranges"""
+    lines = text.splitlines(keepends=True)
+    parts = []
+    position = 0
+    for start, end, replacement in sorted(edits):
+        parts.extend(lines[position:start])
+        # Keep the line break that ended the replaced range
+        if replacement and end > start and lines[end - 1].endswith("\n") and not replacement.endswith("\n"):
+            replacement += "\n"
+        parts.append(replacement)
+        position = end
+    parts.extend(lines[position:])
+    return "".join(parts)
+
+
+WORD_PATTERN = re.compile(r"\w+|\s+|[^\w\s]+")
+
+
+def word_diff(old, new):
+    """Word-level changes between two lines as (tag, text) pairs; tag is equal, delete or insert"""
+    old_words = WORD_PATTERN.findall(old)
+    new_words = WORD_PATTERN.findall(new)
+    segments = []
+    matcher = difflib.SequenceMatcher(None, old_words, new_words, autojunk=False)
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == "equal":
+            segments.append(("equal", "".join(old_words[i1:i2])))
+            continue
+        if i2 > i1:
+            segments.append(("delete", "".join(old_words[i1:i2])))
+        if j2 > j1:
+            segments.append(("insert", "".join(new_words[j1:j2])))
+    return segments
+
+
+def diff_rows(old, new, context=2):
+    """Side-by-side rows of a line diff between old and new.
+
+    Each row is a dict with tag (equal, replace, delete, insert or skip),
+    old_no/new_no (line indexes, or insertion points) and old/new lines.
+    Unchanged runs longer than 2 * context are collapsed into one skip row
+    with a count, so a long chapter with few edits yields few rows. Word
+    diffs are left to the caller, for the rows actually shown.
+    """
+    old_lines = old.splitlines()
+    new_lines = new.splitlines()
+    rows = []
+    matcher = difflib.SequenceMatcher(None, old_lines, new_lines, autojunk=False)
+    opcodes = matcher.get_opcodes()
+    for n, (tag, i1, i2, j1, j2) in enumerate(opcodes):
+        if tag == "equal":
+            head = 0 if n == 0 else context
+            tail = 0 if n == len(opcodes) - 1 else context
+            if i2 - i1 > head + tail:
+                keep = [(i1 + k, j1 + k) for k in range(head)]
+                skip = (i1 + head, j1 + head, i2 - i1 - head - tail)
+                after = [(i2 - tail + k, j2 - tail + k) for k in range(tail)]
+            else:
+                keep, skip, after = [(i1 + k, j1 + k) for k in range(i2 - i1)], None, []
+            rows.extend({"tag": "equal", "old_no": i, "old": old_lines[i], "new_no": j, "new": new_lines[j]}
+                        for i, j in keep)
+            if skip:
+                rows.append({"tag": "skip", "old_no": skip[0], "old": None, "new_no": skip[1], "new": None,
+                             "count": skip[2]})
+            rows.extend({"tag": "equal", "old_no": i, "old": old_lines[i], "new_no": j, "new": new_lines[j]}
+                        for i, j in after)
+            continue
+        for k in range(max(i2 - i1, j2 - j1)):
+            i, j = i1 + k, j1 + k
+            row = {"tag": tag, "old_no": min(i, i2), "old": old_lines[i] if i < i2 else None,
+                   "new_no": min(j, j2), "new": new_lines[j] if j < j2 else None}
+            if tag == "replace" and row["old"] is None:
+                row["tag"] = "insert"
+            elif tag == "replace" and row["new"] is None:
+                row["tag"] = "delete"
+            rows.append(row)
+    return rows
+
+
+def page_rows(rows, page, page_size, new_line_count):
+    """One page of diff rows, the page count, and the range of new lines the page covers"""
+    pages = max(1, -(-len(rows) // page_size))
+    page = min(max(page, 1), pages)
+    shown = rows[(page - 1) * page_size:page * page_size]
+    start = shown[0]["new_no"] if shown else 0
+    following = rows[page * page_size:page * page_size + 1]
+    end = following[0]["new_no"] if following else new_line_count
+    return shown, page, pages, (start, end)